@@ -1,14 +1,35 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import json
+import random
+import time
 from dotenv import load_dotenv
 from datetime import datetime
-from market import get_share_price
-from database import write_account, read_account, write_log
+from market import get_share_price, get_share_prices
+from valuation import PortfolioValuation, apply_trade, value_portfolio
+from database import (
+    read_account_info,
+    create_account_info,
+    update_account_info,
+    VersionConflict,
+    read_positions,
+    read_transactions,
+    read_transaction_page,
+    read_transaction_stats,
+    record_trade,
+    append_portfolio_value,
+    read_portfolio_values,
+    reset_account,
+    migrate_legacy_account,
+    write_log,
+)
 
 load_dotenv(override=True)
 
 INITIAL_BALANCE = 10_000.0
 SPREAD = 0.002
+MAX_UPDATE_ATTEMPTS = 8
+RECENT_TRANSACTIONS = 10
+TRANSACTION_PAGE_SIZE = 20
 
 
 class Transaction(BaseModel):
@@ -26,79 +47,149 @@ class Transaction(BaseModel):
 
 
 class Account(BaseModel):
+    """
+    An account's balance, strategy and holdings.
+    Transactions and the portfolio value time series are append-only history stored in their
+    own tables; they are only read from the database when the properties below are accessed.
+    The running totals net_spend and cost_basis are kept up to date on every trade,
+    so valuation and profit and loss never need to read the transaction history.
+
+    Writes are optimistic: each one is checked against the version the account was read at, and if
+    another process has changed the account since, the account is re-read and the change tried again
+    on the latest state. Readers never wait on a lock held by a trade.
+    """
     name: str
     balance: float
     strategy: str
     holdings: dict[str, int]
-    transactions: list[Transaction]
-    portfolio_value_time_series: list[tuple[str, float]]
+    net_spend: float = Field(default=0.0, exclude=True)
+    cost_basis: dict[str, float] = Field(default_factory=dict, exclude=True)
+    version: int = Field(default=0, exclude=True)
 
     @classmethod
     def get(cls, name: str):
-        fields = read_account(name.lower())
+        fields = read_account_info(name)
+        if not fields and migrate_legacy_account(name):
+            fields = read_account_info(name)
         if not fields:
-            fields = {
-                "name": name.lower(),
-                "balance": INITIAL_BALANCE,
-                "strategy": "",
-                "holdings": {},
-                "transactions": [],
-                "portfolio_value_time_series": []
-            }
-            write_account(name, fields)
-        return cls(**fields)
-    
-    
+            create_account_info(name, INITIAL_BALANCE, "")
+            fields = read_account_info(name)
+        # Positions are read after the version, so if a trade lands in between the version is stale
+        # and the next write is refused rather than made from a mix of old and new state
+        positions = read_positions(name)
+        return cls(
+            name=fields["name"],
+            balance=fields["balance"],
+            strategy=fields["strategy"],
+            holdings={symbol: quantity for symbol, (quantity, _) in positions.items()},
+            net_spend=fields["net_spend"],
+            cost_basis={symbol: cost for symbol, (_, cost) in positions.items()},
+            version=fields["version"],
+        )
+
+    def refresh(self):
+        """ Re-read the account from the database. """
+        latest = Account.get(self.name)
+        for field in type(self).model_fields:
+            setattr(self, field, getattr(latest, field))
+
+    def _retry(self, attempt):
+        """
+        Run attempt, which checks the change against the account as read, writes it at self.version
+        and then applies it to self. When another writer got there first, back off for a moment,
+        re-read the account and run attempt again against the latest state.
+        """
+        for attempts in range(MAX_UPDATE_ATTEMPTS):
+            try:
+                return attempt()
+            except VersionConflict:
+                time.sleep(random.uniform(0, 0.002 * 2 ** attempts))
+                self.refresh()
+        raise ValueError(f"Account {self.name} is being changed by too many traders at once; try again.")
+
+    def _apply_trade(self, balance: float, net_spend: float, symbol: str, held: int, cost: float):
+        self.balance, self.net_spend = balance, net_spend
+        if held:
+            self.holdings[symbol], self.cost_basis[symbol] = held, cost
+        else:
+            self.holdings.pop(symbol, None)
+            self.cost_basis.pop(symbol, None)
+        self.version += 1
+
+    @property
+    def transactions(self) -> list[Transaction]:
+        return [Transaction(**row) for row in read_transactions(self.name)]
+
+    @property
+    def portfolio_value_time_series(self) -> list[tuple[str, float]]:
+        return read_portfolio_values(self.name)
+
     def save(self):
-        write_account(self.name.lower(), self.model_dump())
+        """ Write the balance and strategy, raising VersionConflict if the account changed since it was read. """
+        update_account_info(self.name, self.version, self.balance, self.strategy)
+        self.version += 1
 
     def reset(self, strategy: str):
         self.balance = INITIAL_BALANCE
         self.strategy = strategy
         self.holdings = {}
-        self.transactions = []
-        self.portfolio_value_time_series = []
-        self.save()
+        self.net_spend = 0.0
+        self.cost_basis = {}
+        reset_account(self.name, self.balance, self.strategy)
+        self.version = read_account_info(self.name)["version"]
 
     def deposit(self, amount: float):
         """ Deposit funds into the account. """
         if amount <= 0:
             raise ValueError("Deposit amount must be positive.")
-        self.balance += amount
+
+        def attempt():
+            update_account_info(self.name, self.version, self.balance + amount, self.strategy)
+            self.balance += amount
+            self.version += 1
+
+        self._retry(attempt)
         print(f"Deposited ${amount}. New balance: ${self.balance}")
-        self.save()
 
     def withdraw(self, amount: float):
         """ Withdraw funds from the account, ensuring it doesn't go negative. """
-        if amount > self.balance:
-            raise ValueError("Insufficient funds for withdrawal.")
-        self.balance -= amount
+        def attempt():
+            if amount > self.balance:
+                raise ValueError("Insufficient funds for withdrawal.")
+            update_account_info(self.name, self.version, self.balance - amount, self.strategy)
+            self.balance -= amount
+            self.version += 1
+
+        self._retry(attempt)
         print(f"Withdrew ${amount}. New balance: ${self.balance}")
-        self.save()
 
     def buy_shares(self, symbol: str, quantity: int, rationale: str) -> str:
         """ Buy shares of a stock if sufficient funds are available. """
         price = get_share_price(symbol)
         buy_price = price * (1 + SPREAD)
         total_cost = buy_price * quantity
-        
-        if total_cost > self.balance:
-            raise ValueError("Insufficient funds to buy shares.")
-        elif price==0:
-            raise ValueError(f"Unrecognized symbol {symbol}")
-        
-        # Update holdings
-        self.holdings[symbol] = self.holdings.get(symbol, 0) + quantity
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Record transaction
-        transaction = Transaction(symbol=symbol, quantity=quantity, price=buy_price, timestamp=timestamp, rationale=rationale)
-        self.transactions.append(transaction)
-        
-        # Update balance
-        self.balance -= total_cost
-        self.save()
+
+        def attempt():
+            if total_cost > self.balance:
+                raise ValueError("Insufficient funds to buy shares.")
+            elif price==0:
+                raise ValueError(f"Unrecognized symbol {symbol}")
+
+            # New holdings and cost basis
+            held, cost = apply_trade(self.holdings.get(symbol, 0), self.cost_basis.get(symbol, 0.0), quantity, buy_price)
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            # Record transaction
+            transaction = Transaction(symbol=symbol, quantity=quantity, price=buy_price, timestamp=timestamp, rationale=rationale)
+
+            # New balance
+            balance = self.balance - total_cost
+            net_spend = self.net_spend + transaction.total()
+            record_trade(self.name, self.version, balance, net_spend, symbol, held, cost, transaction.model_dump())
+            self._apply_trade(balance, net_spend, symbol, held, cost)
+
+        self._retry(attempt)
         write_log(self.name, "account", f"Bought {quantity} of {symbol}")
-        return "Completed. Latest details:\n" + self.report()
+        return "Completed. Latest details:\n" + self.summary()
 
     def sell_shares(self, symbol: str, quantity: int, rationale: str) -> str:
         """ Sell shares of a stock if the user has enough shares. """
@@ -108,35 +199,41 @@ class Account(BaseModel):
         price = get_share_price(symbol)
         sell_price = price * (1 - SPREAD)
         total_proceeds = sell_price * quantity
-        
-        # Update holdings
-        self.holdings[symbol] -= quantity
-        
-        # If shares are completely sold, remove from holdings
-        if self.holdings[symbol] == 0:
-            del self.holdings[symbol]
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Record transaction
-        transaction = Transaction(symbol=symbol, quantity=-quantity, price=sell_price, timestamp=timestamp, rationale=rationale)  # negative quantity for sell
-        self.transactions.append(transaction)
-
-        # Update balance
-        self.balance += total_proceeds
-        self.save()
+
+        def attempt():
+            # Checked again on every attempt, as another trade may have sold the shares meanwhile
+            if self.holdings.get(symbol, 0) < quantity:
+                raise ValueError(f"Cannot sell {quantity} shares of {symbol}. Not enough shares held.")
+
+            # New holdings and cost basis; the holding is removed when the shares are completely sold
+            held, cost = apply_trade(self.holdings[symbol], self.cost_basis.get(symbol, 0.0), -quantity, sell_price)
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            # Record transaction
+            transaction = Transaction(symbol=symbol, quantity=-quantity, price=sell_price, timestamp=timestamp, rationale=rationale)  # negative quantity for sell
+
+            # New balance
+            balance = self.balance + total_proceeds
+            net_spend = self.net_spend + transaction.total()
+            record_trade(self.name, self.version, balance, net_spend, symbol, held, cost, transaction.model_dump())
+            self._apply_trade(balance, net_spend, symbol, held, cost)
+
+        self._retry(attempt)
         write_log(self.name, "account", f"Sold {quantity} of {symbol}")
-        return "Completed. Latest details:\n" + self.report()
+        return "Completed. Latest details:\n" + self.summary()
+
+    def valuation(self, prices: dict[str, float] | None = None) -> PortfolioValuation:
+        """ Value the portfolio against a snapshot of prices, fetching one if not provided. """
+        if prices is None:
+            prices = get_share_prices(list(self.holdings))
+        return value_portfolio(self.balance, self.net_spend, self.holdings, self.cost_basis, prices)
 
     def calculate_portfolio_value(self):
         """ Calculate the total value of the user's portfolio. """
-        total_value = self.balance
-        for symbol, quantity in self.holdings.items():
-            total_value += get_share_price(symbol) * quantity
-        return total_value
+        return self.valuation().portfolio_value
 
     def calculate_profit_loss(self, portfolio_value: float):
         """ Calculate profit or loss from the initial spend. """
-        initial_spend = sum(transaction.total() for transaction in self.transactions)
-        return portfolio_value - initial_spend - self.balance
+        return portfolio_value - self.net_spend - self.balance
 
     def get_holdings(self):
         """ Report the current holdings of the user. """
@@ -144,7 +241,7 @@ class Account(BaseModel):
 
     def get_profit_loss(self):
         """ Report the user's profit or loss at any point in time. """
-        return self.calculate_profit_loss()
+        return self.valuation().profit_loss
 
     def list_transactions(self):
         """ List all transactions made by the user. """
@@ -152,16 +249,65 @@ class Account(BaseModel):
     
     def report(self) -> str:
         """ Return a json string representing the account.  """
-        portfolio_value = self.calculate_portfolio_value()
-        self.portfolio_value_time_series.append((datetime.now().strftime("%Y-%m-%d %H:%M:%S"), portfolio_value))
-        self.save()
-        pnl = self.calculate_profit_loss(portfolio_value)
+        valuation = self.valuation()
+        portfolio_value = valuation.portfolio_value
+        append_portfolio_value(self.name, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), portfolio_value)
+        pnl = valuation.profit_loss
         data = self.model_dump()
+        data["transactions"] = self.list_transactions()
+        data["portfolio_value_time_series"] = self.portfolio_value_time_series
         data["total_portfolio_value"] = portfolio_value
         data["total_profit_loss"] = pnl
         write_log(self.name, "account", f"Retrieved account details")
         return json.dumps(data)
     
+    def summary(self, recent: int = RECENT_TRANSACTIONS) -> str:
+        """
+        Return a json string of the account for the trader's prompt: the current positions with their cost
+        basis and value, totals, aggregate statistics over the whole history and only the most recent
+        transactions, so its size stays the same however long the account has been trading.
+        Older transactions are paged through with transaction_page, starting from older_transactions_before.
+        """
+        prices = get_share_prices(list(self.holdings))
+        valuation = self.valuation(prices)
+        append_portfolio_value(self.name, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), valuation.portfolio_value)
+        positions = {}
+        for symbol, quantity in self.holdings.items():
+            price = prices.get(symbol, 0.0)
+            cost = self.cost_basis.get(symbol, 0.0)
+            positions[symbol] = {
+                "quantity": quantity,
+                "cost_basis": round(cost, 2),
+                "price": price,
+                "market_value": round(quantity * price, 2),
+                "unrealized_profit_loss": round(quantity * price - cost, 2),
+            }
+        transactions = read_transaction_page(self.name, limit=recent + 1)
+        stats = read_transaction_stats(self.name)
+        stats["traded_value"] = round(stats["traded_value"], 2)
+        data = {
+            "name": self.name,
+            "balance": round(self.balance, 2),
+            "positions": positions,
+            "total_portfolio_value": round(valuation.portfolio_value, 2),
+            "total_profit_loss": round(valuation.profit_loss, 2),
+            "unrealized_profit_loss": round(valuation.unrealized_profit_loss, 2),
+            "transaction_stats": stats,
+            "recent_transactions": transactions[:recent],
+            "older_transactions_before": transactions[recent]["id"] + 1 if len(transactions) > recent else None,
+        }
+        write_log(self.name, "account", f"Retrieved account summary")
+        return json.dumps(data)
+
+    def transaction_page(self, before_id: int | None = None, limit: int = TRANSACTION_PAGE_SIZE) -> str:
+        """ Return a json string of up to limit transactions older than before_id, newest first, and the cursor for the next page. """
+        transactions = read_transaction_page(self.name, before_id, limit + 1)
+        data = {
+            "transactions": transactions[:limit],
+            "next_before": transactions[limit]["id"] + 1 if len(transactions) > limit else None,
+        }
+        return json.dumps(data)
+
     def get_strategy(self) -> str:
         """ Return the strategy of the account """
         write_log(self.name, "account", f"Retrieved strategy")
@@ -169,8 +315,12 @@ class Account(BaseModel):
     
     def change_strategy(self, strategy: str) -> str:
         """ At your discretion, if you choose to, call this to change your investment strategy for the future """
-        self.strategy = strategy
-        self.save()
+        def attempt():
+            update_account_info(self.name, self.version, self.balance, strategy)
+            self.strategy = strategy
+            self.version += 1
+
+        self._retry(attempt)
         write_log(self.name, "account", f"Changed strategy")
         return "Changed strategy"
 
@@ -1,39 +1,141 @@
+import asyncio
+import anyio
 import mcp
+from datetime import timedelta
 from mcp.client.stdio import stdio_client
 from mcp import StdioServerParameters
+from mcp.types import CONNECTION_CLOSED
 from agents import FunctionTool
 import json
 
 params = StdioServerParameters(command="uv", args=["run", "accounts_server.py"], env=None)
 
+REQUEST_TIMEOUT_SECONDS = 60
+REQUEST_TIMEOUT = 408
+
+
+class AccountsClient:
+    """
+    One long-lived session with the accounts server, shared by every caller in the process.
+
+    The server is spawned and initialized on first use and then kept running, so each call is a
+    single JSON-RPC round trip. Concurrent calls are multiplexed over the same session by request id.
+    The tool list is cached after the first listing. If the server dies or stops answering, the
+    session is dropped and the next call starts a new one; reads are retried once straight away,
+    but tool calls are not, since a trade may already have gone through.
+    """
+
+    def __init__(self, server_params: StdioServerParameters = params, timeout: float = REQUEST_TIMEOUT_SECONDS):
+        self.server_params = server_params
+        self.timeout = timedelta(seconds=timeout)
+        self.session: mcp.ClientSession | None = None
+        self.tools = None
+        self.connects = 0
+        self._loop = None
+        self._lock = None
+        self._task = None
+        self._stop = None
+
+    async def _session(self) -> mcp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A session belongs to the event loop it was started on, e.g. one asyncio.run()
+            self._loop, self._lock, self._task, self.session = loop, asyncio.Lock(), None, None
+        async with self._lock:
+            if self.session is None or self._task.done():
+                await self._connect()
+            return self.session
+
+    async def _connect(self) -> None:
+        ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run(ready, self._stop))
+        await ready.wait()
+        if self._task.done():
+            await self._task
+            raise ConnectionError("Accounts server closed before the session was ready")
+        self.connects += 1
+
+    async def _run(self, ready: asyncio.Event, stop: asyncio.Event) -> None:
+        # The stdio client has to be entered and exited in the same task, so this task owns it
+        try:
+            async with stdio_client(self.server_params) as streams:
+                async with mcp.ClientSession(*streams, read_timeout_seconds=self.timeout) as session:
+                    await session.initialize()
+                    self.session = session
+                    ready.set()
+                    await stop.wait()
+        finally:
+            self.session = None
+            ready.set()
+
+    async def _disconnect(self) -> None:
+        task = self._task
+        if task and not task.done():
+            self._stop.set()
+            try:
+                await task
+            except Exception:
+                pass
+        self.session = None
+
+    async def _request(self, method, *args, retry: bool = True):
+        session = await self._session()
+        try:
+            return await getattr(session, method)(*args)
+        except (mcp.McpError, anyio.ClosedResourceError, anyio.BrokenResourceError) as e:
+            if isinstance(e, mcp.McpError) and e.error.code not in (CONNECTION_CLOSED, REQUEST_TIMEOUT):
+                raise
+            await self._disconnect()
+            if not retry:
+                raise
+            print(f"Reconnecting to the accounts server after {e!r}")
+            session = await self._session()
+            return await getattr(session, method)(*args)
+
+    async def list_tools(self, refresh: bool = False):
+        if self.tools is None or refresh:
+            self.tools = (await self._request("list_tools")).tools
+        return self.tools
+
+    async def call_tool(self, tool_name, tool_args):
+        return await self._request("call_tool", tool_name, tool_args, retry=False)
+
+    async def read_resource(self, uri: str) -> str:
+        result = await self._request("read_resource", uri)
+        return result.contents[0].text
+
+    async def close(self) -> None:
+        if self._loop is asyncio.get_running_loop():
+            await self._disconnect()
+
+
+accounts_client = AccountsClient()
+
 
 async def list_accounts_tools():
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            tools_result = await session.list_tools()
-            return tools_result.tools
-        
+    return await accounts_client.list_tools()
+
+
 async def call_accounts_tool(tool_name, tool_args):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.call_tool(tool_name, tool_args)
-            return result
-            
+    return await accounts_client.call_tool(tool_name, tool_args)
+
+
 async def read_accounts_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://accounts_server/{name}")
-            return result.contents[0].text
-        
+    return await accounts_client.read_resource(f"accounts://accounts_server/{name}")
+
+
+async def read_account_summary_resource(name):
+    return await accounts_client.read_resource(f"accounts://summary/{name}")
+
+
+async def read_transactions_resource(name, before_id=None):
+    return await accounts_client.read_resource(f"accounts://transactions/{name}/{before_id or 'latest'}")
+
+
 async def read_strategy_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://strategy/{name}")
-            return result.contents[0].text
+    return await accounts_client.read_resource(f"accounts://strategy/{name}")
+
 
 async def get_accounts_tools_openai():
     openai_tools = []
@@ -44,7 +146,7 @@ async def get_accounts_tools_openai():
             description=tool.description,
             params_json_schema=schema,
             on_invoke_tool=lambda ctx, args, toolname=tool.name: call_accounts_tool(toolname, json.loads(args))
-                
+
         )
         openai_tools.append(openai_tool)
-    return openai_tools
\ No newline at end of file
+    return openai_tools
@@ -46,6 +46,18 @@ async def sell_shares(name: str, symbol: str, quantity: int, rationale: str) ->
     """
     return Account.get(name).sell_shares(symbol, quantity, rationale)
 
+@mcp.tool()
+async def get_transactions(name: str, before_id: int = 0, limit: int = 20) -> str:
+    """Get earlier transactions of the given account name, newest first, a page at a time.
+
+    Args:
+        name: The name of the account holder
+        before_id: Only return transactions with ids below this; 0 for the most recent.
+            Use older_transactions_before from the account summary, or next_before from the last page
+        limit: The most transactions to return, up to 100
+    """
+    return Account.get(name).transaction_page(before_id or None, min(max(limit, 1), 100))
+
 @mcp.tool()
 async def change_strategy(name: str, strategy: str) -> str:
     """At your discretion, if you choose to, call this to change your investment strategy for the future.
@@ -61,6 +73,16 @@ async def read_account_resource(name: str) -> str:
     account = Account.get(name.lower())
     return account.report()
 
+@mcp.resource("accounts://summary/{name}")
+async def read_account_summary_resource(name: str) -> str:
+    account = Account.get(name.lower())
+    return account.summary()
+
+@mcp.resource("accounts://transactions/{name}/{before_id}")
+async def read_transactions_resource(name: str, before_id: str) -> str:
+    account = Account.get(name.lower())
+    return account.transaction_page(None if before_id == "latest" else int(before_id))
+
 @mcp.resource("accounts://strategy/{name}")
 async def read_strategy_resource(name: str) -> str:
     account = Account.get(name.lower())
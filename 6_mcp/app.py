@@ -1,10 +1,16 @@
+import threading
+import time
 import gradio as gr
 from util import css, js, Color
 import pandas as pd
 from trading_floor import names, lastnames, short_model_names
 import plotly.express as px
 from accounts import Account
-from database import read_log
+from change_feed import change_feed
+from timeseries import load_portfolio_series
+from metrics import span_latencies, METRICS_WINDOW_HOURS
+
+LATENCY_REFRESH_SECONDS = 30
 
 mapper = {
     "trace": Color.WHITE,
@@ -22,6 +28,12 @@ class Trader:
         self.lastname = lastname
         self.model_name = model_name
         self.account = Account.get(name)
+        self.logs_lock = threading.Lock()
+        self.account_lock = threading.Lock()
+        self.rendered_logs = (None, None)
+        self.rendered_account = (None, None)
+        self.latency_lock = threading.Lock()
+        self.rendered_latencies = (0.0, None)
 
     def reload(self):
         self.account = Account.get(self.name)
@@ -33,7 +45,7 @@ class Trader:
         return self.account.get_strategy()
 
     def get_portfolio_value_df(self) -> pd.DataFrame:
-        df = pd.DataFrame(self.account.portfolio_value_time_series, columns=["datetime", "value"])
+        df = pd.DataFrame(load_portfolio_series(self.name), columns=["datetime", "value"])
         df["datetime"] = pd.to_datetime(df["datetime"])
         return df
 
@@ -80,17 +92,60 @@ class Trader:
         emoji = "⬆" if pnl >= 0 else "⬇"
         return f"<div style='text-align: center;background-color:{color};'><span style='font-size:32px'>${portfolio_value:,.0f}</span><span style='font-size:24px'>&nbsp;&nbsp;&nbsp;{emoji}&nbsp;${pnl:,.0f}</span></div>"
 
-    def get_logs(self, previous=None) -> str:
-        logs = read_log(self.name, last_n=13)
-        response = ""
-        for log in logs:
-            timestamp, type, message = log
-            color = mapper.get(type, Color.WHITE).value
-            response += f"<span style='color:{color}'>{timestamp} : [{type}] {message}</span><br/>"
-        response = f"<div style='height:250px; overflow-y:auto;'>{response}</div>"
-        if response != previous:
-            return response
-        return gr.update()
+    def get_latencies_df(self) -> pd.DataFrame:
+        """p50 and p95 span durations over the metrics window, rebuilt at most every LATENCY_REFRESH_SECONDS"""
+        with self.latency_lock:
+            if time.monotonic() - self.rendered_latencies[0] > LATENCY_REFRESH_SECONDS or self.rendered_latencies[1] is None:
+                rows = [
+                    {
+                        "Span": row["span_type"],
+                        "Count": row["count"],
+                        "p50 (s)": round(row["p50"], 2),
+                        "p95 (s)": round(row["p95"], 2),
+                        "Total (s)": round(row["total_seconds"], 1),
+                        "Errors": row["errors"],
+                        "Tokens": row["tokens"],
+                    }
+                    for row in span_latencies(self.name)
+                ]
+                df = pd.DataFrame(rows, columns=["Span", "Count", "p50 (s)", "p95 (s)", "Total (s)", "Errors", "Tokens"])
+                self.rendered_latencies = (time.monotonic(), df)
+            return self.rendered_latencies[1]
+
+    def get_logs(self) -> str:
+        """Render the log panel from the change feed, once per new log entry however many viewers there are"""
+        logs = change_feed.recent_logs(self.name)[-13:]
+        last_id = logs[-1][0] if logs else 0
+        with self.logs_lock:
+            if self.rendered_logs[0] != last_id:
+                response = ""
+                for _, timestamp, type, message in logs:
+                    color = mapper.get(type, Color.WHITE).value
+                    response += f"<span style='color:{color}'>{timestamp} : [{type}] {message}</span><br/>"
+                self.rendered_logs = (last_id, f"<div style='height:250px; overflow-y:auto;'>{response}</div>")
+            return self.rendered_logs[1]
+
+    def get_logs_update(self, previous_id=None):
+        """Send the log panel only when new entries have arrived since this viewer last saw it"""
+        last_id = change_feed.last_log_id(self.name)
+        if last_id == previous_id:
+            return gr.update(), previous_id
+        return self.get_logs(), last_id
+
+    def get_account_outputs(self) -> tuple:
+        """The portfolio value, chart and tables, rebuilt only when the account version changes"""
+        version = change_feed.account_version(self.name)
+        with self.account_lock:
+            if self.rendered_account[1] is None or self.rendered_account[0] != version:
+                self.reload()
+                outputs = (
+                    self.get_portfolio_value(),
+                    self.get_portfolio_value_chart(),
+                    self.get_holdings_df(),
+                    self.get_transactions_df(),
+                )
+                self.rendered_account = (version, outputs)
+            return self.rendered_account[1]
 
 
 class TraderView:
@@ -100,21 +155,22 @@ class TraderView:
         self.chart = None
         self.holdings_table = None
         self.transactions_table = None
+        self.latency_table = None
 
     def make_ui(self):
         with gr.Column():
             gr.HTML(self.trader.get_title())
             with gr.Row():
-                self.portfolio_value = gr.HTML(self.trader.get_portfolio_value)
+                self.portfolio_value = gr.HTML(lambda: self.trader.get_account_outputs()[0])
             with gr.Row():
                 self.chart = gr.Plot(
-                    self.trader.get_portfolio_value_chart, container=True, show_label=False
+                    lambda: self.trader.get_account_outputs()[1], container=True, show_label=False
                 )
             with gr.Row(variant="panel"):
                 self.log = gr.HTML(self.trader.get_logs)
             with gr.Row():
                 self.holdings_table = gr.Dataframe(
-                    value=self.trader.get_holdings_df,
+                    value=lambda: self.trader.get_account_outputs()[2],
                     label="Holdings",
                     headers=["Symbol", "Quantity"],
                     row_count=(5, "dynamic"),
@@ -124,7 +180,7 @@ class TraderView:
                 )
             with gr.Row():
                 self.transactions_table = gr.Dataframe(
-                    value=self.trader.get_transactions_df,
+                    value=lambda: self.trader.get_account_outputs()[3],
                     label="Recent Transactions",
                     headers=["Timestamp", "Symbol", "Quantity", "Price", "Rationale"],
                     row_count=(5, "dynamic"),
@@ -132,37 +188,52 @@ class TraderView:
                     max_height=300,
                     elem_classes=["dataframe-fix"],
                 )
+            with gr.Row():
+                self.latency_table = gr.Dataframe(
+                    value=self.trader.get_latencies_df,
+                    label=f"Where the time goes (last {METRICS_WINDOW_HOURS:g}h)",
+                    headers=["Span", "Count", "p50 (s)", "p95 (s)", "Total (s)", "Errors", "Tokens"],
+                    row_count=(5, "dynamic"),
+                    col_count=7,
+                    max_height=300,
+                    elem_classes=["dataframe-fix-small"],
+                )
 
-        timer = gr.Timer(value=120)
+        # Both timers read the in-memory change feed, not the database, and send nothing when nothing changed
+        account_version = gr.State(change_feed.account_version(self.trader.name))
+        timer = gr.Timer(value=1)
         timer.tick(
             fn=self.refresh,
-            inputs=[],
+            inputs=[account_version],
             outputs=[
                 self.portfolio_value,
                 self.chart,
                 self.holdings_table,
                 self.transactions_table,
+                account_version,
             ],
             show_progress="hidden",
             queue=False,
         )
+        latency_timer = gr.Timer(value=LATENCY_REFRESH_SECONDS)
+        latency_timer.tick(
+            fn=self.trader.get_latencies_df, outputs=[self.latency_table], show_progress="hidden", queue=False
+        )
+        last_log_id = gr.State(change_feed.last_log_id(self.trader.name))
         log_timer = gr.Timer(value=0.5)
         log_timer.tick(
-            fn=self.trader.get_logs,
-            inputs=[self.log],
-            outputs=[self.log],
+            fn=self.trader.get_logs_update,
+            inputs=[last_log_id],
+            outputs=[self.log, last_log_id],
             show_progress="hidden",
             queue=False,
         )
 
-    def refresh(self):
-        self.trader.reload()
-        return (
-            self.trader.get_portfolio_value(),
-            self.trader.get_portfolio_value_chart(),
-            self.trader.get_holdings_df(),
-            self.trader.get_transactions_df(),
-        )
+    def refresh(self, previous_version):
+        version = change_feed.account_version(self.trader.name)
+        if version == previous_version:
+            return gr.update(), gr.update(), gr.update(), gr.update(), previous_version
+        return *self.trader.get_account_outputs(), version
 
 
 # Main UI construction
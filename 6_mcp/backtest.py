@@ -0,0 +1,245 @@
+"""
+Backtest trader strategies offline against historical end of day prices.
+
+Prices come from the market table that the traders fill as they run, or from a CSV file,
+either long (date, symbol, close columns) or wide (a date column and one column per symbol).
+Strategies are either an account's recorded transactions, replayed at the historical prices, or one of
+the rule-based policies below, which stand in for an LLM trader.
+
+Trades follow the same rules as accounts.py: the account starts with INITIAL_BALANCE, buys fill at
+close * (1 + SPREAD) and sells at close * (1 - SPREAD). The whole simulation is computed with array
+operations over every day and symbol at once, rather than one trade at a time.
+
+Run with: uv run backtest.py --policy momentum --prices prices.csv
+     or:  uv run backtest.py --account warren
+     or:  uv run backtest.py --policy momentum --synthetic-days 2520 --synthetic-symbols 3000
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+from accounts import INITIAL_BALANCE, SPREAD
+from database import read_market_history, read_transactions
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+class PriceHistory:
+    """Closing prices as a (days, symbols) array, NaN where a symbol has no price that day"""
+
+    def __init__(self, dates: np.ndarray, symbols: list[str], closes: np.ndarray):
+        self.dates = dates.astype("datetime64[D]")
+        self.symbols = symbols
+        self.closes = closes.astype(np.float64)
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "PriceHistory":
+        """From a frame indexed by date with one column per symbol"""
+        frame = frame.sort_index()
+        return cls(pd.to_datetime(frame.index).values, [str(c) for c in frame.columns], frame.to_numpy(dtype=np.float64))
+
+    @classmethod
+    def from_market_table(cls) -> "PriceHistory":
+        history = read_market_history()
+        if not history:
+            raise ValueError("The market table is empty; run the traders for a while or load a price file")
+        frame = pd.DataFrame.from_dict({date: prices for date, prices in history}, orient="index")
+        return cls.from_frame(frame)
+
+    @classmethod
+    def from_file(cls, path: str) -> "PriceHistory":
+        frame = pd.read_csv(path)
+        frame.columns = [str(c).lower() if str(c).lower() in ("date", "symbol", "close", "price") else c for c in frame.columns]
+        if "symbol" in frame.columns:
+            value = "close" if "close" in frame.columns else "price"
+            frame = frame.pivot_table(index="date", columns="symbol", values=value, aggfunc="last")
+        else:
+            frame = frame.set_index("date")
+        return cls.from_frame(frame)
+
+    @classmethod
+    def synthetic(cls, days: int, symbols: int, seed: int = 0) -> "PriceHistory":
+        """Random walks, for trying policies out and timing the engine"""
+        rng = np.random.default_rng(seed)
+        returns = rng.normal(0.0003, 0.02, size=(days, symbols))
+        closes = rng.uniform(5, 500, size=symbols) * np.exp(np.cumsum(returns, axis=0))
+        dates = np.busday_offset("2015-01-02", np.arange(days), roll="forward")
+        return cls(dates, [f"SYM{i:05d}" for i in range(symbols)], closes)
+
+
+class BacktestResult(BaseModel):
+    days: int
+    symbols: int
+    final_value: float
+    profit_loss: float
+    total_return: float
+    annualized_return: float
+    max_drawdown: float
+    turnover: float
+    traded_value: float
+    spread_cost: float
+    trades: int
+    cash_shortfall_days: int
+
+
+def simulate(
+    history: PriceHistory,
+    orders: np.ndarray,
+    gross: np.ndarray | None = None,
+    initial_balance: float = INITIAL_BALANCE,
+):
+    """
+    Apply a (days, symbols) array of net share orders, positive to buy and negative to sell, at each day's close.
+    gross is the total number of shares traded in each cell, when a day has both buys and sells of a symbol;
+    it defaults to the size of the net order. Buys pay close * (1 + SPREAD) and sells get close * (1 - SPREAD),
+    so the cash spent is the net orders at the close plus SPREAD on the gross value traded.
+
+    Returns the result and the daily portfolio values. Orders on a day with no price for the symbol are
+    dropped, as accounts.py rejects unrecognized symbols. Days where the cash balance would be negative,
+    which accounts.py would have refused, are counted in cash_shortfall_days rather than stopped.
+    """
+    closes = history.closes
+    priced = ~np.isnan(closes)
+    orders = np.where(priced, orders, 0)
+    gross = np.where(priced, np.abs(orders) if gross is None else gross, 0)
+    marks = pd.DataFrame(closes).ffill().fillna(0.0).to_numpy()
+    traded = gross * marks
+    spend = (orders * marks).sum(axis=1) + SPREAD * traded.sum(axis=1)
+    cash = initial_balance - np.cumsum(spend)
+    positions = np.cumsum(orders, axis=0)
+    values = cash + (positions * marks).sum(axis=1)
+
+    traded_value = float(traded.sum())
+    peaks = np.maximum.accumulate(np.concatenate(([initial_balance], values)))[1:]
+    years = len(values) / TRADING_DAYS_PER_YEAR
+    total_return = values[-1] / initial_balance - 1
+    result = BacktestResult(
+        days=len(values),
+        symbols=len(history.symbols),
+        final_value=float(values[-1]),
+        profit_loss=float(values[-1] - initial_balance),
+        total_return=float(total_return),
+        annualized_return=float((1 + total_return) ** (1 / years) - 1) if total_return > -1 else -1.0,
+        max_drawdown=float(((peaks - values) / peaks).max()),
+        turnover=traded_value / float(values.mean()),
+        traded_value=traded_value,
+        spread_cost=traded_value * SPREAD,
+        trades=int(np.count_nonzero(gross)),
+        cash_shortfall_days=int(np.count_nonzero(cash < -1e-6)),
+    )
+    return result, values
+
+
+def orders_from_transactions(
+    history: PriceHistory, transactions: list[dict]
+) -> tuple[np.ndarray, np.ndarray, set[str]]:
+    """
+    Place recorded transactions on the first trading day on or after their timestamp.
+    Returns the net orders, the gross shares traded, and the symbols that have no price history,
+    whose transactions are left out.
+    """
+    orders = np.zeros(history.closes.shape)
+    gross = np.zeros(history.closes.shape)
+    columns = {symbol: i for i, symbol in enumerate(history.symbols)}
+    known = [t for t in transactions if t["symbol"] in columns]
+    missing = {t["symbol"] for t in transactions if t["symbol"] not in columns}
+    if known:
+        dates = np.array([t["timestamp"][:10] for t in known], dtype="datetime64[D]")
+        days = np.searchsorted(history.dates, dates)
+        inside = days < len(history.dates)
+        symbols = np.array([columns[t["symbol"]] for t in known])
+        quantities = np.array([t["quantity"] for t in known], dtype=np.float64)
+        np.add.at(orders, (days[inside], symbols[inside]), quantities[inside])
+        np.add.at(gross, (days[inside], symbols[inside]), np.abs(quantities[inside]))
+    return orders, gross, missing
+
+
+def shares_for(history: PriceHistory, allocations: np.ndarray) -> np.ndarray:
+    """The whole shares each (days, symbols) dollar allocation buys at the buy price on its day"""
+    marks = np.nan_to_num(history.closes)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(marks > 0, np.floor(allocations / (marks * (1 + SPREAD))), 0)
+
+
+def orders_to_hold(targets: np.ndarray) -> np.ndarray:
+    """The orders that take the holdings to each day's target number of shares"""
+    return np.diff(targets, axis=0, prepend=0)
+
+
+def buy_and_hold(history: PriceHistory, initial_balance: float = INITIAL_BALANCE) -> np.ndarray:
+    """Split the balance equally over every symbol priced on the first day and hold"""
+    first = ~np.isnan(history.closes[0])
+    allocations = np.zeros(history.closes.shape)
+    allocations[0, first] = initial_balance / max(int(first.sum()), 1)
+    targets = np.broadcast_to(shares_for(history, allocations)[0], history.closes.shape)
+    return orders_to_hold(targets)
+
+
+def momentum(
+    history: PriceHistory,
+    lookback: int = 60,
+    top_n: int = 10,
+    rebalance_every: int = 21,
+    initial_balance: float = INITIAL_BALANCE,
+) -> np.ndarray:
+    """
+    Every rebalance_every days, hold the top_n symbols by return over the last lookback days,
+    with an equal share of the initial balance in each.
+    """
+    closes = history.closes
+    trailing = np.full(closes.shape, -np.inf)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        trailing[lookback:] = closes[lookback:] / closes[:-lookback] - 1
+    trailing = np.where(np.isfinite(trailing), trailing, -np.inf)
+    rebalance_days = np.arange(lookback, len(closes), rebalance_every)
+    top_n = min(top_n, closes.shape[1])
+    chosen = np.argpartition(-trailing[rebalance_days], top_n - 1, axis=1)[:, :top_n]
+    rows = rebalance_days[:, None]
+    allocations = np.zeros(closes.shape)
+    allocations[rows, chosen] = np.where(np.isfinite(trailing[rows, chosen]), initial_balance / top_n, 0)
+    # Hold each rebalance's shares until the next one; before the first, day 0 has no allocations
+    latest = np.zeros(len(closes), dtype=np.int64)
+    latest[rebalance_days] = rebalance_days
+    latest = np.maximum.accumulate(latest)
+    return orders_to_hold(shares_for(history, allocations)[latest])
+
+
+POLICIES = {"buy_and_hold": buy_and_hold, "momentum": momentum}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prices", help="CSV file of closing prices; defaults to the market table")
+    parser.add_argument("--synthetic-days", type=int, help="use random walk prices with this many days")
+    parser.add_argument("--synthetic-symbols", type=int, default=1000)
+    parser.add_argument("--policy", choices=sorted(POLICIES), help="a rule-based policy to backtest")
+    parser.add_argument("--account", help="replay this account's recorded transactions")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.synthetic_days:
+        history = PriceHistory.synthetic(args.synthetic_days, args.synthetic_symbols)
+    elif args.prices:
+        history = PriceHistory.from_file(args.prices)
+    else:
+        history = PriceHistory.from_market_table()
+    loaded = time.perf_counter()
+
+    if args.account:
+        orders, gross, missing = orders_from_transactions(history, read_transactions(args.account))
+        if missing:
+            print(f"Left out transactions in symbols with no price history: {', '.join(sorted(missing))}")
+    else:
+        orders, gross = POLICIES[args.policy or "buy_and_hold"](history), None
+    result, _ = simulate(history, orders, gross)
+    finished = time.perf_counter()
+
+    print(f"{result.days} days x {result.symbols} symbols, loaded in {loaded - start:.2f}s, simulated in {finished - loaded:.2f}s")
+    for field, value in result.model_dump().items():
+        print(f"  {field:<20} {value:,.4f}" if isinstance(value, float) else f"  {field:<20} {value:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark the database layer under concurrent writers.
+
+Compares the original connect-per-call approach (a fresh sqlite3.connect and commit for
+every operation, default rollback journal) with the long-lived WAL connection manager.
+Each worker thread repeats the mix of calls that one Account.buy_shares makes:
+read the account, write it back, write a log line, and read the recent logs.
+
+Run with: uv run bench_database.py --writers 6 --ops 500
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from database import Database, SELECT_ACCOUNT, INSERT_LOG, SELECT_LOG
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)",
+    """CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, datetime DATETIME, type TEXT, message TEXT
+    )""",
+]
+
+UPSERT_ACCOUNT = """
+    INSERT INTO accounts (name, account)
+    VALUES (?, ?)
+    ON CONFLICT(name) DO UPDATE SET account=excluded.account
+"""
+
+ACCOUNT = {"name": "", "balance": 10_000.0, "strategy": "x" * 500, "holdings": {"AAPL": 10}}
+
+
+class ConnectPerCall:
+    """The original access pattern: open, execute, commit and close on every call"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with sqlite3.connect(path, timeout=30) as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def write(self, sql, args):
+        with sqlite3.connect(self.path, timeout=30) as conn:
+            conn.execute(sql, args)
+            conn.commit()
+
+    def read(self, sql, args):
+        with sqlite3.connect(self.path, timeout=30) as conn:
+            return conn.execute(sql, args).fetchall()
+
+
+class Pooled:
+    """The connection manager in database.py"""
+
+    def __init__(self, path: str):
+        self.database = Database(path)
+        with self.database.transaction() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def write(self, sql, args):
+        with self.database.transaction() as conn:
+            conn.execute(sql, args)
+
+    def read(self, sql, args):
+        return self.database.connection().execute(sql, args).fetchall()
+
+
+def worker(backend, name: str, ops: int, errors: list):
+    account = json.dumps({**ACCOUNT, "name": name})
+    try:
+        for _ in range(ops):
+            backend.read(SELECT_ACCOUNT, (name,))
+            backend.write(UPSERT_ACCOUNT, (name, account))
+            backend.write(INSERT_LOG, (name, "account", "Bought 1 of AAPL"))
+            backend.read(SELECT_LOG, (name, 10))
+    except sqlite3.OperationalError as e:
+        errors.append(e)
+
+
+def run(backend_class, writers: int, ops: int) -> tuple[float, int]:
+    with tempfile.TemporaryDirectory() as directory:
+        backend = backend_class(os.path.join(directory, "bench.db"))
+        errors = []
+        threads = [
+            threading.Thread(target=worker, args=(backend, f"trader{i}", ops, errors))
+            for i in range(writers)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if isinstance(backend, Pooled):
+            backend.database.close()
+    total_ops = writers * ops * 4
+    return total_ops / elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=6, help="number of concurrent writer threads")
+    parser.add_argument("--ops", type=int, default=500, help="buy_shares-style iterations per writer")
+    args = parser.parse_args()
+
+    print(f"{args.writers} concurrent writers x {args.ops} iterations (4 db calls each)")
+    before, before_errors = run(ConnectPerCall, args.writers, args.ops)
+    print(f"connect per call : {before:>10,.0f} ops/sec  ({before_errors} writers hit lock errors)")
+    after, after_errors = run(Pooled, args.writers, args.ops)
+    print(f"pooled WAL       : {after:>10,.0f} ops/sec  ({after_errors} writers hit lock errors)")
+    print(f"speedup          : {after / before:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
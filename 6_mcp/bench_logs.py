@@ -0,0 +1,98 @@
+"""
+Benchmark the trader log store on a large logs table.
+
+Fills a scratch database with --rows log entries spread over the last 30 days across --names traders,
+then times:
+- the original dashboard query, ORDER BY datetime DESC on the unindexed table
+- building the (name, id) index
+- read_log and the read_log_since cursor read on the indexed table
+- archiving everything older than --retention-days to compressed files
+
+Run with: uv run bench_logs.py --rows 10000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+TYPES = ["trace", "agent", "function", "generation", "response", "account"]
+OLD_SELECT_LOG = """
+    SELECT datetime, type, message FROM logs
+    WHERE name = ?
+    ORDER BY datetime DESC
+    LIMIT ?
+"""
+
+
+def timed(fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--names", type=int, default=20)
+    parser.add_argument("--retention-days", type=float, default=28)
+    args = parser.parse_args()
+
+    # The database module opens accounts.db in the working directory, so move to a scratch one first
+    scratch = tempfile.mkdtemp(prefix="bench_logs_")
+    os.chdir(scratch)
+    from database import db, read_log, read_log_since, read_last_log_id
+    from log_retention import archive_logs_older_than
+
+    conn = db.connection()
+    conn.execute("DROP INDEX idx_logs_name_id")
+    names = [f"trader{i}" for i in range(args.names)]
+    start_time = datetime.now(timezone.utc) - timedelta(days=30)
+    step = timedelta(days=30) / args.rows
+    rng = random.Random(0)
+
+    def rows(first, count):
+        for i in range(first, first + count):
+            when = (start_time + step * i).strftime("%Y-%m-%d %H:%M:%S")
+            yield rng.choice(names), when, rng.choice(TYPES), f"Span {i} finished with a message of ordinary length"
+
+    print(f"Writing {args.rows:,} log entries to {scratch}")
+    load_time = time.perf_counter()
+    for first in range(0, args.rows, 500_000):
+        with db.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO logs (name, datetime, type, message) VALUES (?, ?, ?, ?)",
+                rows(first, min(500_000, args.rows - first)),
+            )
+    print(f"  loaded in {time.perf_counter() - load_time:.1f}s")
+
+    name = names[0]
+    old_time, old_rows = timed(lambda: conn.execute(OLD_SELECT_LOG, (name, 13)).fetchall(), repeat=3)
+    index_time, _ = timed(lambda: conn.execute("CREATE INDEX idx_logs_name_id ON logs (name, id)"))
+    conn.execute("ANALYZE")
+    new_time, new_rows = timed(lambda: list(read_log(name, 13)), repeat=1000)
+    cursor = read_last_log_id() - 1000
+    since_time, since_rows = timed(lambda: read_log_since(name, cursor), repeat=1000)
+    # Several entries can share a second, so compare timestamps rather than rows
+    assert sorted(row[0] for row in old_rows) == sorted(row[0] for row in new_rows)
+
+    print(f"{'original read_log (no index)':<40} {old_time * 1000:>10.2f}ms")
+    print(f"{'build (name, id) index':<40} {index_time * 1000:>10.0f}ms")
+    print(f"{'read_log with index':<40} {new_time * 1000:>10.3f}ms  {old_time / new_time:,.0f}x faster")
+    print(f"{'read_log_since, last 1000 ids':<40} {since_time * 1000:>10.3f}ms  {len(since_rows)} new rows")
+
+    archive_dir = os.path.join(scratch, "log_archive")
+    archive_time, archived = timed(lambda: archive_logs_older_than(args.retention_days, archive_dir))
+    archive_bytes = sum(entry.stat().st_size for entry in os.scandir(archive_dir)) if archived else 0
+    remaining = conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+    print(
+        f"{'archive older than ' + str(args.retention_days) + ' days':<40} {archive_time:>10.1f}s  "
+        f"{archived:,} rows to {archive_bytes / 1e6:.0f}MB of archives, {remaining:,} rows left"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark per-symbol versus batched share price lookups on the paid Polygon plan.
+
+Starts a local stub of the Polygon snapshot endpoints that adds a fixed latency to every
+request, then prices 10, 50 and 500 symbols two ways:
+- the original pattern: a new RESTClient and one get_snapshot_ticker request per symbol
+- get_share_prices_polygon_min: one reused client and the multi-ticker snapshot endpoint
+and then shows a repeat lookup through market.get_share_prices, which is served by the price cache.
+
+Run with: uv run bench_market.py --latency-ms 30
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+SNAPSHOT_PATH = "/v2/snapshot/locale/us/markets/stocks/tickers"
+
+
+def stub_snapshot(symbol: str) -> dict:
+    price = float(sum(map(ord, symbol)) % 500 + 1)
+    return {"ticker": symbol, "min": {"c": price}, "prevDay": {"c": price - 0.5}}
+
+
+class StubPolygonHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    requests = 0
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        type(self).requests += 1
+        url = urlparse(self.path)
+        if url.path.startswith(SNAPSHOT_PATH + "/"):
+            body = {"status": "OK", "ticker": stub_snapshot(url.path.rsplit("/", 1)[1])}
+        elif url.path == SNAPSHOT_PATH:
+            tickers = parse_qs(url.query).get("tickers", [""])[0].split(",")
+            body = {"status": "OK", "tickers": [stub_snapshot(t) for t in tickers if t]}
+        else:
+            self.send_error(404)
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(latency: float) -> ThreadingHTTPServer:
+    StubPolygonHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubPolygonHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=30, help="latency the stub adds to every request")
+    args = parser.parse_args()
+
+    server = start_stub(args.latency_ms / 1000)
+    os.environ["POLYGON_API_KEY"] = "stub"
+    os.environ["POLYGON_PLAN"] = "paid"
+    os.environ["POLYGON_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+
+    # Imported after the environment points at the stub
+    from polygon import RESTClient
+    import market
+
+    def per_symbol(symbols):
+        prices = {}
+        for symbol in symbols:
+            client = RESTClient(market.polygon_api_key, base=market.polygon_base_url)
+            result = client.get_snapshot_ticker("stocks", symbol)
+            prices[symbol] = result.min.close or result.prev_day.close
+        return prices
+
+    print(f"Stub Polygon latency {args.latency_ms:.0f}ms per request")
+    print(f"{'symbols':>8} {'per-symbol':>12} {'batched':>12} {'speedup':>8} {'requests':>14} {'cached':>10}")
+    run = int(time.time())
+    for count in (10, 50, 500):
+        symbols = [f"T{run}{count}{i:04d}" for i in range(count)]
+        StubPolygonHandler.requests = 0
+        start = time.perf_counter()
+        before = per_symbol(symbols)
+        per_symbol_time = time.perf_counter() - start
+        per_symbol_requests = StubPolygonHandler.requests
+
+        StubPolygonHandler.requests = 0
+        start = time.perf_counter()
+        after = market.get_share_prices_polygon_min(symbols)
+        batched_time = time.perf_counter() - start
+        batched_requests = StubPolygonHandler.requests
+
+        market.get_share_prices(symbols)
+        start = time.perf_counter()
+        cached = market.get_share_prices(symbols)
+        cached_time = time.perf_counter() - start
+
+        assert before == after == cached
+        print(
+            f"{count:>8} {per_symbol_time * 1000:>10.0f}ms {batched_time * 1000:>10.0f}ms "
+            f"{per_symbol_time / batched_time:>7.1f}x {per_symbol_requests:>6} -> {batched_requests:<5} "
+            f"{cached_time * 1000:>8.1f}ms"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark end of day market snapshot storage: one JSON blob per date versus one row per (date, symbol).
+
+Writes --days snapshots of --symbols tickers to a scratch database both ways, then times:
+- writing one snapshot
+- a single symbol lookup, which with the blob means reading and parsing the whole market
+- pricing the 20 holdings of a portfolio
+- one symbol's price history over every stored date
+
+Run with: uv run bench_market_storage.py --symbols 10000 --days 60
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+
+def timed(fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=60)
+    args = parser.parse_args()
+
+    # The database module opens accounts.db in the working directory, so move to a scratch one first
+    os.chdir(tempfile.mkdtemp(prefix="bench_market_storage_"))
+    from database import db, write_market, read_market_prices, read_price_history
+
+    rng = random.Random(0)
+    symbols = [f"T{i:05d}" for i in range(args.symbols)]
+    dates = [(date(2025, 1, 1) + timedelta(days=i)).isoformat() for i in range(args.days)]
+    snapshots = {day: {symbol: round(rng.uniform(1, 500), 2) for symbol in symbols} for day in dates}
+    conn = db.connection()
+
+    def write_blob(day):
+        with db.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO market (date, data) VALUES (?, ?)", (day, json.dumps(snapshots[day])))
+
+    blob_write, _ = timed(lambda: [write_blob(day) for day in dates])
+    row_write, _ = timed(lambda: [write_market(day, snapshots[day]) for day in dates])
+
+    def blob_lookup(day, wanted):
+        data = json.loads(conn.execute("SELECT data FROM market WHERE date = ?", (day,)).fetchone()[0])
+        return {symbol: data.get(symbol, 0.0) for symbol in wanted}
+
+    def blob_history(symbol):
+        rows = conn.execute("SELECT date, data FROM market ORDER BY date").fetchall()
+        return [(day, json.loads(data)[symbol]) for day, data in rows]
+
+    day, symbol, holdings = dates[-1], symbols[len(symbols) // 2], rng.sample(symbols, 20)
+    results = [
+        ("write one snapshot", blob_write / args.days, row_write / args.days),
+        ("look up one symbol", *(timed(f, 200)[0] for f in (
+            lambda: blob_lookup(day, [symbol]), lambda: read_market_prices(day, [symbol])))),
+        ("price 20 holdings", *(timed(f, 200)[0] for f in (
+            lambda: blob_lookup(day, holdings), lambda: read_market_prices(day, holdings)))),
+        (f"one symbol over {args.days} days", *(timed(f, 5)[0] for f in (
+            lambda: blob_history(symbol), lambda: read_price_history(symbol)))),
+    ]
+    assert blob_lookup(day, holdings) == read_market_prices(day, holdings)
+    assert blob_history(symbol) == read_price_history(symbol)
+
+    print(f"{args.symbols:,} symbols x {args.days} days")
+    print(f"{'':<28} {'JSON blob':>12} {'rows':>12}")
+    for label, blob, rows in results:
+        print(f"{label:<28} {blob * 1000:>10.3f}ms {rows * 1000:>10.3f}ms  {blob / rows:,.1f}x")
+
+
+if __name__ == "__main__":
+    main()
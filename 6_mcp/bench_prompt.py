@@ -0,0 +1,86 @@
+"""
+Measure the size of the trader's prompt on a long-running account.
+
+Fills a scratch database with an account that has made --transactions trades across --symbols symbols,
+each with a rationale of ordinary length, and compares the trade message built from:
+- the full account report the trader used to read, without the portfolio value time series
+- the account summary, with positions, statistics and the most recent transactions
+Also compares the tool result returned after each buy or sell, which used to carry the full report too.
+
+Tokens are counted with tiktoken when it is installed, and estimated at 4 characters a token otherwise.
+
+Run with: uv run bench_prompt.py --transactions 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+RATIONALE = (
+    "Momentum and recent earnings beat support adding to the position; the sector rotation into "
+    "large caps fits the strategy and the position size keeps risk within limits."
+)
+
+
+def token_counter():
+    try:
+        import tiktoken
+    except ImportError:
+        return "estimated at 4 characters a token", lambda text: len(text) // 4
+    encoding = tiktoken.get_encoding("o200k_base")
+    return "counted with tiktoken o200k_base", lambda text: len(encoding.encode(text))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=2000)
+    parser.add_argument("--symbols", type=int, default=40)
+    args = parser.parse_args()
+
+    # The database module opens accounts.db in the working directory, so move to a scratch one first
+    os.chdir(tempfile.mkdtemp(prefix="bench_prompt_"))
+    import accounts
+    from accounts import Account
+    from templates import trade_message
+
+    symbols = [f"SYM{i:02d}" for i in range(args.symbols)]
+    prices = {symbol: random.Random(symbol).uniform(20, 400) for symbol in symbols}
+    accounts.get_share_price = lambda symbol: prices.get(symbol, 0.0)
+    accounts.get_share_prices = lambda wanted: {symbol: prices.get(symbol, 0.0) for symbol in wanted}
+    report = Account.report
+    Account.report = lambda self: ""
+
+    account = Account.get("longrunner")
+    account.deposit(10_000_000)
+    rng = random.Random(0)
+    for _ in range(args.transactions):
+        symbol = rng.choice(symbols)
+        if account.holdings.get(symbol, 0) >= 5 and rng.random() < 0.4:
+            account.sell_shares(symbol, rng.randint(1, 5), RATIONALE)
+        else:
+            account.buy_shares(symbol, rng.randint(1, 10), RATIONALE)
+    Account.report = report
+
+    method, count = token_counter()
+    full = json.loads(account.report())
+    full.pop("portfolio_value_time_series", None)
+    start = time.perf_counter()
+    summary = account.summary()
+    summary_seconds = time.perf_counter() - start
+    before = count(trade_message(account.name, "Strategy", json.dumps(full)))
+    after = count(trade_message(account.name, "Strategy", summary))
+    report_tokens, summary_tokens = count(account.report()), count(summary)
+
+    print(f"Account with {args.transactions:,} transactions in {len(account.holdings)} holdings, tokens {method}")
+    print(f"{'trade message with full report':<36} {before:>10,} tokens")
+    print(f"{'trade message with summary':<36} {after:>10,} tokens  {1 - after / before:.1%} smaller")
+    print(f"{'tool result after a trade, before':<36} {report_tokens:>10,} tokens")
+    print(f"{'tool result after a trade, now':<36} {summary_tokens:>10,} tokens")
+    print(f"{'building the summary':<36} {summary_seconds * 1000:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Benchmark LLM calls against a rate limited provider, with and without the rate_limits scheduler.
+
+Starts a local chat completions stub that allows --stub-rpm requests and --stub-tpm tokens a minute,
+replenished continuously with at most --stub-burst-seconds worth available at once, as providers enforce
+per minute limits over shorter periods, and answers anything over them with a 429 and a retry-after.
+Then --workers concurrent callers, a quarter of them researchers and the rest traders, each make
+--calls chat completions two ways:
+- a plain AsyncOpenAI client, relying on the SDK's own retries
+- a client from rate_limits.rate_limited_client, configured with the provider's limits
+and reports goodput (completed calls per second), 429s, failed calls and latency by role.
+
+Run with: uv run bench_rate_limits.py --workers 40 --calls 5 --stub-rpm 120 --stub-tpm 60000
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+PROMPT = "Summarize today's market news for a cautious value investor. " * 40
+
+
+class StubLimitedHandler(BaseHTTPRequestHandler):
+    rpm = 60
+    tpm = 100_000
+    burst_seconds = 5.0
+    latency = 0.2
+    lock = threading.Lock()
+    levels = [0.0, 0.0]
+    updated = 0.0
+    served = 0
+    rejected = 0
+
+    @classmethod
+    def reset(cls):
+        with cls.lock:
+            cls.levels = [cls.rpm * cls.burst_seconds / 60, cls.tpm * cls.burst_seconds / 60]
+            cls.updated = time.monotonic()
+            cls.served = cls.rejected = 0
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        tokens = len(json.dumps(request["messages"])) // 4 + 50
+        cls = type(self)
+        with cls.lock:
+            now = time.monotonic()
+            rates = [cls.rpm / 60, cls.tpm / 60]
+            for i, rate in enumerate(rates):
+                cls.levels[i] = min(cls.levels[i] + (now - cls.updated) * rate, rate * cls.burst_seconds)
+            cls.updated = now
+            allowed = cls.levels[0] >= 1 and cls.levels[1] >= tokens
+            if allowed:
+                cls.levels[0] -= 1
+                cls.levels[1] -= tokens
+                cls.served += 1
+            else:
+                cls.rejected += 1
+            retry_after = max((1 - cls.levels[0]) / rates[0], (tokens - cls.levels[1]) / rates[1], 0.05)
+        if not allowed:
+            self.send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                           {"retry-after": f"{retry_after:.2f}"})
+            return
+        time.sleep(self.latency)
+        body = {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "Markets were steady."}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": tokens - 50, "completion_tokens": 50, "total_tokens": tokens},
+        }
+        self.send_json(200, body, {})
+
+    def send_json(self, status: int, body: dict, headers: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(rpm: int, tpm: int, burst_seconds: float, latency: float) -> ThreadingHTTPServer:
+    StubLimitedHandler.rpm, StubLimitedHandler.tpm = rpm, tpm
+    StubLimitedHandler.burst_seconds, StubLimitedHandler.latency = burst_seconds, latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubLimitedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run_workers(clients: dict, workers: int, calls: int) -> dict:
+    latencies = collections.defaultdict(list)
+    failures = 0
+
+    async def worker(index: int):
+        nonlocal failures
+        role = "researcher" if index % 4 == 0 else "trader"
+        for _ in range(calls):
+            start = time.perf_counter()
+            try:
+                await clients[role].chat.completions.create(model="stub", messages=[{"role": "user", "content": PROMPT}])
+                latencies[role].append(time.perf_counter() - start)
+            except Exception:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(workers)))
+    return {"elapsed": time.perf_counter() - start, "latencies": latencies, "failures": failures}
+
+
+def report(label: str, result: dict, limiter=None) -> None:
+    completed = sum(len(values) for values in result["latencies"].values())
+    print(f"{label}: {completed} completed, {result['failures']} failed in {result['elapsed']:.1f}s, "
+          f"goodput {completed / result['elapsed']:.2f} calls/s, "
+          f"{StubLimitedHandler.rejected} 429s from the provider")
+    for role, values in sorted(result["latencies"].items()):
+        p50, p95 = np.percentile(values, [50, 95])
+        print(f"  {role:<11} {len(values):>4} calls  p50 {p50:6.2f}s  p95 {p95:6.2f}s")
+    if limiter:
+        print(f"  limiter {limiter.stats()}")
+
+
+async def main_async(args, url: str):
+    from openai import AsyncOpenAI
+    import rate_limits
+
+    StubLimitedHandler.reset()
+    plain = AsyncOpenAI(base_url=url, api_key="stub")
+    report("plain client", await run_workers({"trader": plain, "researcher": plain}, args.workers, args.calls))
+
+    StubLimitedHandler.reset()
+    limited = rate_limits.rate_limited_client("stub", base_url=url, api_key="stub")
+    clients = {role: rate_limits.with_priority(limited, role) for role in ("trader", "researcher")}
+    result = await run_workers(clients, args.workers, args.calls)
+    report("rate limited client", result, rate_limits.limiters["stub"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=40)
+    parser.add_argument("--calls", type=int, default=5, help="calls per worker")
+    parser.add_argument("--stub-rpm", type=int, default=120)
+    parser.add_argument("--stub-tpm", type=int, default=60_000)
+    parser.add_argument("--stub-burst-seconds", type=float, default=5)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    server = start_stub(args.stub_rpm, args.stub_tpm, args.stub_burst_seconds, args.latency_ms / 1000)
+    # The limiter is configured with the same limits the stub enforces, as it would be for a real provider
+    os.environ["RATE_LIMIT_STUB_RPM"] = str(args.stub_rpm)
+    os.environ["RATE_LIMIT_STUB_TPM"] = str(args.stub_tpm)
+    asyncio.run(main_async(args, f"http://127.0.0.1:{server.server_port}/v1"))
+
+
+if __name__ == "__main__":
+    main()
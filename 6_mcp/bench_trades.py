@@ -0,0 +1,149 @@
+"""
+Stress test trade execution with many concurrent buyers and sellers on the same accounts.
+
+Starts --processes worker processes with --threads threads each, all trading at random on the
+same --accounts accounts in a scratch accounts.db at fixed prices. Every worker buys and sells
+through its own Account objects, so each trade is checked against the version it read and
+retried on a conflict. Afterwards each account is checked against its transaction history:
+- the balance is the initial balance less the net spend of the transactions
+- the holdings and cost basis match a replay of the transactions, and none is negative
+- there is exactly one transaction for every trade a worker saw complete
+
+Run with: uv run bench_trades.py --processes 4 --threads 8 --accounts 3 --trades 200
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+PRICES = {"AAPL": 190.0, "MSFT": 410.0, "NVDA": 120.0, "SPY": 520.0}
+
+
+def worker(accounts: list[str], threads: int, trades: int, seed: int) -> dict:
+    import accounts as accounts_module
+    import database
+    from accounts import Account
+
+    # Fixed prices, and no report or summary after every trade, so the test measures the trade itself
+    accounts_module.get_share_price = lambda symbol: PRICES.get(symbol, 0.0)
+    accounts_module.get_share_prices = lambda symbols: {symbol: PRICES.get(symbol, 0.0) for symbol in symbols}
+    Account.report = lambda self: ""
+    Account.summary = lambda self, recent=0: ""
+    record_trade = database.record_trade
+    counts = {"completed": 0, "refused": 0, "conflicts": 0, "gave_up": 0}
+    completed = {name: 0 for name in accounts}
+    lock = threading.Lock()
+
+    def counted_record_trade(*args, **kwargs):
+        try:
+            return record_trade(*args, **kwargs)
+        except database.VersionConflict:
+            with lock:
+                counts["conflicts"] += 1
+            raise
+
+    accounts_module.record_trade = counted_record_trade
+
+    def trade(thread: int):
+        rng = random.Random(seed * 1000 + thread)
+        for _ in range(trades):
+            name = rng.choice(accounts)
+            account = Account.get(name)
+            symbol = rng.choice(list(PRICES))
+            quantity = rng.randint(1, 5)
+            try:
+                if rng.random() < 0.5:
+                    account.buy_shares(symbol, quantity, "Stress test buy")
+                else:
+                    account.sell_shares(symbol, quantity, "Stress test sell")
+            except ValueError as e:
+                outcome = "gave_up" if "too many traders" in str(e) else "refused"
+                with lock:
+                    counts[outcome] += 1
+                continue
+            with lock:
+                counts["completed"] += 1
+                completed[name] += 1
+
+    pool = [threading.Thread(target=trade, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return {"counts": counts, "completed": completed}
+
+
+def check_account(name: str, completed: int) -> list[str]:
+    from accounts import Account, INITIAL_BALANCE
+    from database import read_transactions
+    from valuation import replay_trades
+
+    account = Account.get(name)
+    transactions = read_transactions(name)
+    net_spend, positions = replay_trades(transactions)
+    problems = []
+    if len(transactions) != completed:
+        problems.append(f"{len(transactions)} transactions for {completed} completed trades")
+    if abs(account.balance - (INITIAL_BALANCE - net_spend)) > 1e-6:
+        problems.append(f"balance {account.balance:.4f} but transactions give {INITIAL_BALANCE - net_spend:.4f}")
+    if abs(account.net_spend - net_spend) > 1e-6:
+        problems.append(f"net spend {account.net_spend:.4f} but transactions give {net_spend:.4f}")
+    if account.balance < -1e-6:
+        problems.append(f"negative balance {account.balance:.4f}")
+    held = {symbol: quantity for symbol, (quantity, _) in positions.items() if quantity}
+    if account.holdings != held:
+        problems.append(f"holdings {account.holdings} but transactions give {held}")
+    for symbol, (quantity, cost) in positions.items():
+        if quantity < 0:
+            problems.append(f"negative holding of {quantity} {symbol}")
+        if quantity and abs(account.cost_basis.get(symbol, 0.0) - cost) > 1e-6:
+            problems.append(f"cost basis of {symbol} {account.cost_basis.get(symbol)} but transactions give {cost}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="threads per process")
+    parser.add_argument("--accounts", type=int, default=3, help="accounts shared by every thread")
+    parser.add_argument("--trades", type=int, default=200, help="trades per thread")
+    args = parser.parse_args()
+
+    # The database module opens accounts.db in the working directory, so move to a scratch one first
+    os.chdir(tempfile.mkdtemp(prefix="bench_trades_"))
+    print(f"Running in {os.getcwd()}")
+    from accounts import Account
+
+    names = [f"stress{i}" for i in range(args.accounts)]
+    for name in names:
+        Account.get(name)
+
+    start = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+        results = pool.starmap(worker, [(names, args.threads, args.trades, seed) for seed in range(args.processes)])
+    elapsed = time.perf_counter() - start
+
+    counts = {key: sum(result["counts"][key] for result in results) for key in results[0]["counts"]}
+    completed = {name: sum(result["completed"][name] for result in results) for name in names}
+    attempted = args.processes * args.threads * args.trades
+    print(f"{args.processes} processes x {args.threads} threads on {args.accounts} accounts, {attempted:,} trades attempted")
+    print(f"  completed          {counts['completed']:>8,}  {counts['completed'] / elapsed:,.0f} trades/s")
+    print(f"  refused            {counts['refused']:>8,}  (not enough cash or shares)")
+    print(f"  version conflicts  {counts['conflicts']:>8,}  {counts['conflicts'] / max(counts['completed'], 1):.2f} per completed trade")
+    print(f"  gave up            {counts['gave_up']:>8,}")
+
+    failed = False
+    for name in names:
+        problems = check_account(name, completed[name])
+        failed |= bool(problems)
+        print(f"  {name}: {'; '.join(problems) if problems else 'consistent'}")
+    if failed:
+        raise SystemExit("Accounts are inconsistent with their transactions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Load test the trading floor without LLM or Polygon accounts.
+
+Runs trading cycles the way trading_floor.run_every_n_minutes does, through the TradingScheduler,
+the MCP server pool and the real Trader, accounts, market and push servers, against:
+- a local OpenAI-compatible chat completions server with a fixed script: each trader calls the
+  Researcher, looks up the price of a symbol picked from its name, buys one share and finishes
+- the stub Polygon snapshot server from bench_market.py
+Both add a configurable latency to every request. Researcher MCP servers (fetch, search, memory)
+are left out, as they would call external services.
+
+Everything runs in a scratch directory with its own accounts.db. Reports cycle and trader run
+latency percentiles, MCP server spawn time, rows written to SQLite per cycle, and time spent
+in each kind of trace span.
+
+Run with: uv run bench_trading_floor.py --traders 50 --cycles 3 --concurrency 10 --llm-latency-ms 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from bench_market import StubPolygonHandler, start_stub
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SYMBOLS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOG", "META", "TSLA", "SPY"]
+MODEL_NAME = "stub/scripted"
+
+
+def scripted_reply(request: dict) -> dict:
+    """The next assistant message for a chat completions request, decided by how far the conversation has got"""
+    messages = request["messages"]
+    tools = {tool["function"]["name"] for tool in request.get("tools", [])}
+    system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+    match = re.search(r"You are (\w+), a trader", system or "")
+    if not match:
+        return {"role": "assistant", "content": "Research: markets are steady and large caps look fairly priced."}
+    name = match.group(1)
+    symbol = SYMBOLS[sum(map(ord, name)) % len(SYMBOLS)]
+    script = [
+        ("Researcher", {"input": f"Latest news on {symbol}"}),
+        ("lookup_share_price", {"symbol": symbol}),
+        ("buy_shares", {"name": name, "symbol": symbol, "quantity": 1, "rationale": "Scripted load test trade"}),
+    ]
+    script = [step for step in script if step[0] in tools]
+    done = sum(1 for message in messages if message["role"] == "tool")
+    if done >= len(script):
+        return {"role": "assistant", "content": f"Bought 1 share of {symbol}."}
+    tool, arguments = script[done]
+    call = {"id": f"call_{done}", "type": "function", "function": {"name": tool, "arguments": json.dumps(arguments)}}
+    return {"role": "assistant", "content": None, "tool_calls": [call]}
+
+
+class StubChatHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    requests = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.latency)
+        with self.lock:
+            type(self).requests += 1
+        message = scripted_reply(request)
+        body = {
+            "id": f"chatcmpl-{type(self).requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request["model"],
+            "choices": [
+                {"index": 0, "message": message, "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_chat_stub(latency: float) -> ThreadingHTTPServer:
+    StubChatHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubChatHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def span_timer():
+    """A trace processor that adds up the time spent in each kind of span"""
+    from agents import TracingProcessor
+
+    class SpanTimer(TracingProcessor):
+        def __init__(self):
+            self.seconds = defaultdict(list)
+
+        def on_trace_start(self, trace) -> None:
+            pass
+
+        def on_trace_end(self, trace) -> None:
+            pass
+
+        def on_span_start(self, span) -> None:
+            pass
+
+        def on_span_end(self, span) -> None:
+            if span.started_at and span.ended_at:
+                elapsed = datetime.fromisoformat(span.ended_at) - datetime.fromisoformat(span.started_at)
+                self.seconds[span.span_data.type].append(elapsed.total_seconds())
+
+        def shutdown(self) -> None:
+            pass
+
+        def force_flush(self) -> None:
+            pass
+
+    return SpanTimer()
+
+
+TABLE_COUNTS = {
+    "logs": "SELECT COUNT(*) FROM logs",
+    "transactions": "SELECT COUNT(*) FROM transactions",
+    "portfolio_values": "SELECT COUNT(*) FROM portfolio_values",
+    "account updates": "SELECT COALESCE(SUM(version), 0) FROM account_info",
+}
+
+
+def table_counts(path: str) -> dict[str, int]:
+    with sqlite3.connect(path) as conn:
+        return {table: conn.execute(sql).fetchone()[0] for table, sql in TABLE_COUNTS.items()}
+
+
+def percentiles(values: list[float]) -> str:
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return f"p50 {p50:6.2f}s  p95 {p95:6.2f}s  p99 {p99:6.2f}s  max {max(values):6.2f}s"
+
+
+async def run(args, llm_url: str) -> None:
+    # Imported here, once the environment points at the stubs
+    import traders
+    import accounts_client
+    from agents import set_trace_processors
+    from mcp import StdioServerParameters
+    from rate_limits import rate_limited_client
+    from mcp_pool import MCPServerPool
+    from scheduler import TradingScheduler
+    from tracers import LogTracer
+
+    env = dict(os.environ)
+
+    def server(script: str) -> dict:
+        return {"command": sys.executable, "args": [os.path.join(HERE, script)], "env": env}
+
+    traders.trader_mcp_server_params = [server("accounts_server.py"), server("push_server.py"), server("market_server.py")]
+    traders.researcher_mcp_server_params = lambda name: []
+    traders.openrouter_client = rate_limited_client("openrouter", base_url=llm_url, api_key="stub")
+    accounts_client.accounts_client.server_params = StdioServerParameters(**server("accounts_server.py"))
+    log_tracer, timer = LogTracer(), span_timer()
+    set_trace_processors([log_tracer, timer])
+
+    floor = [traders.Trader(f"Trader{i:03d}", "Load", MODEL_NAME) for i in range(args.traders)]
+    pool = None if args.no_pool else MCPServerPool()
+    scheduler = TradingScheduler(
+        floor,
+        interval_seconds=0,
+        max_concurrency=args.concurrency,
+        deadline_seconds=args.deadline,
+        stagger_seconds=0,
+        pool=pool,
+    )
+    cycle_seconds, run_seconds, ready_seconds, writes = [], [], [], []
+    try:
+        for cycle in range(args.cycles):
+            before = table_counts("accounts.db")
+            start = time.perf_counter()
+            scheduler.tick()
+            await asyncio.gather(*scheduler.running.values())
+            cycle_seconds.append(time.perf_counter() - start)
+            run_seconds += [trader.last_run_seconds for trader in floor if trader.last_run_seconds is not None]
+            ready_seconds += [trader.servers_ready_seconds for trader in floor if trader.servers_ready_seconds is not None]
+            log_tracer.force_flush()
+            after = table_counts("accounts.db")
+            writes.append({table: after[table] - before[table] for table in after})
+            print(f"Cycle {cycle + 1}: {cycle_seconds[-1]:.2f}s, {writes[-1]}")
+    finally:
+        await accounts_client.accounts_client.close()
+        if pool:
+            await pool.close()
+        log_tracer.shutdown()
+
+    print(f"\n{args.traders} traders, {args.concurrency} at a time, {args.cycles} cycles, "
+          f"LLM latency {args.llm_latency_ms:.0f}ms, Polygon latency {args.polygon_latency_ms:.0f}ms, "
+          f"{'without' if args.no_pool else 'with'} the MCP server pool")
+    print(f"{'cycle':<24} {percentiles(cycle_seconds)}")
+    print(f"{'trader run':<24} {percentiles(run_seconds)}")
+    if ready_seconds:
+        print(f"{'MCP servers ready':<24} {percentiles(ready_seconds)}")
+    if pool:
+        stats = pool.stats()
+        print(f"{'MCP spawns':<24} {stats['spawns']} servers in {stats['spawn_seconds']:.2f}s, {stats['restarts']} restarts")
+    print(f"{'timed out / skipped':<24} {scheduler.counts['timed_out']} / {scheduler.counts['skipped']}")
+    print(f"{'requests':<24} {StubChatHandler.requests} chat completions, {StubPolygonHandler.requests} Polygon")
+    print("SQLite rows written per cycle:")
+    for table in TABLE_COUNTS:
+        counts = [cycle[table] for cycle in writes]
+        print(f"  {table:<22} mean {np.mean(counts):8.1f}  max {max(counts):6d}")
+    print("Time in spans:")
+    for kind, seconds in sorted(timer.seconds.items(), key=lambda item: -sum(item[1])):
+        print(f"  {kind:<22} {len(seconds):6d} spans  total {sum(seconds):8.2f}s  mean {np.mean(seconds) * 1000:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--traders", type=int, default=4)
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4, help="traders running at once")
+    parser.add_argument("--deadline", type=float, default=300, help="seconds before a trader run is cancelled")
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--polygon-latency-ms", type=float, default=30)
+    parser.add_argument("--no-pool", action="store_true", help="spawn MCP servers for every run")
+    args = parser.parse_args()
+
+    polygon = start_stub(args.polygon_latency_ms / 1000)
+    llm = start_chat_stub(args.llm_latency_ms / 1000)
+    os.chdir(tempfile.mkdtemp(prefix="bench_trading_floor_"))
+    # Set after the stubs are up; subprocesses inherit these. Keep POLYGON_* out of .env when running this,
+    # since load_dotenv(override=True) would put the real values back
+    os.environ["POLYGON_API_KEY"] = "stub"
+    os.environ["POLYGON_PLAN"] = "paid"
+    os.environ["POLYGON_BASE_URL"] = f"http://127.0.0.1:{polygon.server_port}"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    print(f"Running in {os.getcwd()}")
+    asyncio.run(run(args, f"http://127.0.0.1:{llm.server_port}/v1"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import os
+import threading
+from collections import deque
+from dotenv import load_dotenv
+from database import (
+    read_data_version,
+    read_logs_after,
+    read_last_log_id,
+    read_recent_logs,
+    read_account_versions,
+)
+
+load_dotenv(override=True)
+
+CHANGE_FEED_INTERVAL = float(os.getenv("CHANGE_FEED_INTERVAL", "0.5"))
+LOG_BACKLOG = 50
+LOG_BATCH = 1000
+
+
+class ChangeFeed:
+    """
+    Publishes database changes to everything in this process from a single background poller.
+
+    Every interval the poller checks SQLite's data_version, which only moves when another connection
+    commits, so an idle database costs one pragma per interval. When it moves, the poller reads the
+    log rows written since its cursor and the current account versions, and keeps them in memory.
+    Dashboard sessions then read from memory, so the database load is the same for one viewer or many.
+    """
+
+    def __init__(self, interval: float = CHANGE_FEED_INTERVAL, backlog: int = LOG_BACKLOG):
+        self.interval = interval
+        self.backlog = backlog
+        self.logs: dict[str, deque] = {}
+        self.versions: dict[str, tuple[int, int | None]] = {}
+        self.cursor = 0
+        self.data_version = None
+        self.polls = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread:
+                return
+            self.cursor = read_last_log_id()
+            self.versions = read_account_versions()
+            self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def recent_logs(self, name: str) -> list[tuple[int, str, str, str]]:
+        """The latest log entries for a name as (id, datetime, type, message), oldest first"""
+        self.start()
+        name = name.lower()
+        with self._lock:
+            if name not in self.logs:
+                # Seed from the database on first use; later rows arrive through the poller
+                rows = [row for row in read_recent_logs(name, self.backlog) if row[0] <= self.cursor]
+                self.logs[name] = deque(rows, maxlen=self.backlog)
+            return list(self.logs[name])
+
+    def last_log_id(self, name: str) -> int:
+        logs = self.recent_logs(name)
+        return logs[-1][0] if logs else 0
+
+    def account_version(self, name: str) -> tuple[int, int | None] | None:
+        self.start()
+        return self.versions.get(name.lower())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Change feed poll failed: {e}")
+
+    def poll(self) -> None:
+        data_version = read_data_version()
+        if data_version == self.data_version:
+            return
+        self.data_version = data_version
+        self.polls += 1
+        while True:
+            rows = read_logs_after(self.cursor, LOG_BATCH)
+            with self._lock:
+                for id, name, datetime, type, message in rows:
+                    if name in self.logs:
+                        self.logs[name].append((id, datetime, type, message))
+                if rows:
+                    self.cursor = rows[-1][0]
+            if len(rows) < LOG_BATCH:
+                break
+        self.versions = read_account_versions()
+
+
+change_feed = ChangeFeed()
@@ -1,17 +1,303 @@
 import sqlite3
 import json
-from datetime import datetime
+import threading
+from contextlib import contextmanager
+from valuation import replay_trades
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
 DB = "accounts.db"
 
+# Tuned for many small writes from several processes sharing one file:
+# WAL lets readers run alongside a writer, and NORMAL sync is durable in WAL mode
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+]
 
-with sqlite3.connect(DB) as conn:
-    cursor = conn.cursor()
-    cursor.execute('CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)')
-    cursor.execute('''
+# Statement text is kept constant so sqlite3's per-connection statement cache reuses the prepared statements
+SELECT_ACCOUNT = "SELECT account FROM accounts WHERE name = ?"
+SELECT_ACCOUNT_INFO = "SELECT name, balance, strategy, version, net_spend FROM account_info WHERE name = ?"
+UPSERT_ACCOUNT_INFO = """
+    INSERT INTO account_info (name, balance, strategy, version)
+    VALUES (?, ?, ?, 1)
+    ON CONFLICT(name) DO UPDATE SET
+        balance=excluded.balance, strategy=excluded.strategy, version=account_info.version + 1
+"""
+INSERT_NEW_ACCOUNT_INFO = """
+    INSERT INTO account_info (name, balance, strategy, version)
+    VALUES (?, ?, ?, 1)
+    ON CONFLICT(name) DO NOTHING
+"""
+# Compare-and-swap updates: they only apply if the account is still at the version the caller read
+UPDATE_ACCOUNT_INFO = """
+    UPDATE account_info SET balance = ?, strategy = ?, version = version + 1
+    WHERE name = ? AND version = ?
+"""
+UPDATE_TRADE_TOTALS = """
+    UPDATE account_info SET balance = ?, net_spend = ?, version = version + 1
+    WHERE name = ? AND version = ?
+"""
+SELECT_POSITIONS = "SELECT symbol, quantity, cost FROM holdings WHERE name = ?"
+UPSERT_HOLDING = """
+    INSERT INTO holdings (name, symbol, quantity, cost)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(name, symbol) DO UPDATE SET quantity=excluded.quantity, cost=excluded.cost
+"""
+DELETE_HOLDING = "DELETE FROM holdings WHERE name = ? AND symbol = ?"
+INSERT_TRANSACTION = """
+    INSERT INTO transactions (name, symbol, quantity, price, timestamp, rationale)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+SELECT_TRANSACTIONS = """
+    SELECT symbol, quantity, price, timestamp, rationale FROM transactions
+    WHERE name = ?
+    ORDER BY id
+"""
+# Pages of transactions newest first, continuing below the id of the last one seen
+SELECT_TRANSACTION_PAGE = """
+    SELECT id, symbol, quantity, price, timestamp, rationale FROM transactions
+    WHERE name = ? AND id < ?
+    ORDER BY id DESC
+    LIMIT ?
+"""
+SELECT_TRANSACTION_STATS = """
+    SELECT COUNT(*), COALESCE(SUM(quantity > 0), 0), COALESCE(SUM(quantity < 0), 0),
+        COALESCE(SUM(ABS(quantity * price)), 0), COUNT(DISTINCT symbol), MIN(timestamp), MAX(timestamp)
+    FROM transactions WHERE name = ?
+"""
+INSERT_PORTFOLIO_VALUE = "INSERT INTO portfolio_values (name, datetime, value) VALUES (?, ?, ?)"
+SELECT_PORTFOLIO_VALUES = "SELECT datetime, value FROM portfolio_values WHERE name = ? ORDER BY id"
+COUNT_PORTFOLIO_VALUES_UP_TO = "SELECT COUNT(*) FROM (SELECT 1 FROM portfolio_values WHERE name = ? LIMIT ?)"
+# Rollup buckets are keyed by their start time, in the same format as the raw datetimes:
+# the first characters of the datetime, padded back out to a full timestamp
+ROLLUP_RESOLUTIONS = {"1m": (16, ":00"), "1h": (13, ":00:00"), "1d": (10, " 00:00:00")}
+UPSERT_ROLLUP = """
+    INSERT INTO portfolio_value_rollups (name, resolution, bucket, value, low, high, count)
+    VALUES (?, ?, ?, ?, ?, ?, 1)
+    ON CONFLICT(name, resolution, bucket) DO UPDATE SET
+        value=excluded.value, low=MIN(low, excluded.low), high=MAX(high, excluded.high), count=count + 1
+"""
+SELECT_ROLLUPS = """
+    SELECT bucket, value FROM portfolio_value_rollups
+    WHERE name = ? AND resolution = ?
+    ORDER BY bucket
+"""
+COUNT_ROLLUPS_UP_TO = """
+    SELECT COUNT(*) FROM (SELECT 1 FROM portfolio_value_rollups WHERE name = ? AND resolution = ? LIMIT ?)
+"""
+INSERT_LOG = """
+    INSERT INTO logs (name, datetime, type, message)
+    VALUES (?, datetime('now'), ?, ?)
+"""
+INSERT_LOG_AT = """
+    INSERT INTO logs (name, datetime, type, message)
+    VALUES (?, ?, ?, ?)
+"""
+SELECT_LOG = """
+    SELECT datetime, type, message FROM logs
+    WHERE name = ?
+    ORDER BY id DESC
+    LIMIT ?
+"""
+SELECT_LOG_SINCE = """
+    SELECT id, datetime, type, message FROM logs
+    WHERE name = ? AND id > ?
+    ORDER BY id
+    LIMIT ?
+"""
+SELECT_RECENT_LOGS = """
+    SELECT id, datetime, type, message FROM logs
+    WHERE name = ?
+    ORDER BY id DESC
+    LIMIT ?
+"""
+SELECT_LOGS_AFTER = """
+    SELECT id, name, datetime, type, message FROM logs
+    WHERE id > ?
+    ORDER BY id
+    LIMIT ?
+"""
+SELECT_LAST_LOG_ID = "SELECT COALESCE(MAX(id), 0) FROM logs"
+# Walks the (name, id) index one name at a time instead of scanning every row
+SELECT_LOG_NAMES = """
+    WITH RECURSIVE names(name) AS (
+        SELECT MIN(name) FROM logs
+        UNION ALL
+        SELECT (SELECT MIN(name) FROM logs WHERE logs.name > names.name) FROM names WHERE name IS NOT NULL
+    )
+    SELECT name FROM names WHERE name IS NOT NULL
+"""
+SELECT_NAME_LOGS_AFTER = """
+    SELECT id, name, datetime, type, message FROM logs
+    WHERE name = ? AND id > ? AND id <= ?
+    ORDER BY id
+    LIMIT ?
+"""
+SELECT_NTH_NEWEST_LOG_ID = "SELECT id FROM logs WHERE name = ? ORDER BY id DESC LIMIT 1 OFFSET ?"
+DELETE_LOGS = "DELETE FROM logs WHERE id BETWEEN ? AND ?"
+DELETE_NAME_LOGS = "DELETE FROM logs WHERE name = ? AND id BETWEEN ? AND ?"
+SELECT_ACCOUNT_VERSIONS = """
+    SELECT name, version, (SELECT MAX(id) FROM portfolio_values WHERE portfolio_values.name = account_info.name)
+    FROM account_info
+"""
+# End of day prices are stored one row per (date, symbol), so a lookup reads one row rather than the whole market;
+# market_days records which dates have a complete snapshot
+UPSERT_MARKET_DAY = """
+    INSERT INTO market_days (date, symbols)
+    VALUES (?, ?)
+    ON CONFLICT(date) DO UPDATE SET symbols=excluded.symbols
+"""
+DELETE_MARKET_PRICES = "DELETE FROM market_prices WHERE date = ?"
+INSERT_MARKET_PRICE = "INSERT INTO market_prices (date, symbol, price) VALUES (?, ?, ?)"
+SELECT_MARKET_DAY = "SELECT symbols FROM market_days WHERE date = ?"
+SELECT_MARKET_PRICE = "SELECT price FROM market_prices WHERE date = ? AND symbol = ?"
+SELECT_MARKET = "SELECT symbol, price FROM market_prices WHERE date = ?"
+SELECT_MARKET_HISTORY = "SELECT date, symbol, price FROM market_prices ORDER BY date"
+SELECT_PRICE_HISTORY = """
+    SELECT date, price FROM market_prices
+    WHERE symbol = ? AND date BETWEEN ? AND ?
+    ORDER BY date
+"""
+SELECT_LEGACY_MARKET = "SELECT date, data FROM market ORDER BY date"
+UPSERT_CACHED_PRICE = """
+    INSERT INTO price_cache (source, symbol, price, fetched_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(source, symbol) DO UPDATE SET price=excluded.price, fetched_at=excluded.fetched_at
+"""
+CLAIM_PRICE_LEASE = """
+    INSERT INTO price_cache_leases (source, symbol, expires_at)
+    VALUES (?, ?, ?)
+    ON CONFLICT(source, symbol) DO UPDATE SET expires_at=excluded.expires_at
+    WHERE price_cache_leases.expires_at < ?
+"""
+DELETE_PRICE_LEASE = "DELETE FROM price_cache_leases WHERE source = ? AND symbol = ?"
+ADD_PRICE_CACHE_STATS = """
+    INSERT INTO price_cache_stats (source, hits, stale_hits, misses, upstream_calls)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(source) DO UPDATE SET
+        hits=hits + excluded.hits,
+        stale_hits=stale_hits + excluded.stale_hits,
+        misses=misses + excluded.misses,
+        upstream_calls=upstream_calls + excluded.upstream_calls
+"""
+# Researcher tool results, keyed by a hash of the tool name and arguments, evicted least recently used first
+SELECT_RESEARCH = "SELECT result FROM research_cache WHERE key = ? AND expires_at > ?"
+TOUCH_RESEARCH = "UPDATE research_cache SET used_at = ? WHERE key = ?"
+UPSERT_RESEARCH = """
+    INSERT INTO research_cache (key, tool, result, size, expires_at, used_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(key) DO UPDATE SET
+        result=excluded.result, size=excluded.size, expires_at=excluded.expires_at, used_at=excluded.used_at
+"""
+SELECT_RESEARCH_BY_USE = "SELECT key, size FROM research_cache ORDER BY used_at"
+ADD_RESEARCH_CACHE_STATS = """
+    INSERT INTO research_cache_stats (tool, hits, misses, coalesced, upstream_calls)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(tool) DO UPDATE SET
+        hits=hits + excluded.hits,
+        misses=misses + excluded.misses,
+        coalesced=coalesced + excluded.coalesced,
+        upstream_calls=upstream_calls + excluded.upstream_calls
+"""
+# Leases on a key within a scope: whoever holds the unexpired lease does the work for everyone
+CLAIM_LEASE = """
+    INSERT INTO leases (scope, key, expires_at)
+    VALUES (?, ?, ?)
+    ON CONFLICT(scope, key) DO UPDATE SET expires_at=excluded.expires_at
+    WHERE leases.expires_at < ?
+"""
+DELETE_LEASE = "DELETE FROM leases WHERE scope = ? AND key = ?"
+RESEARCH_LEASE_SCOPE = "research"
+# Span metrics rolled up by trader and hour; histogram buckets are those of metrics.LatencyHistogram
+ADD_SPAN_METRICS = """
+    INSERT INTO span_metrics (name, hour, span_type, label, count, errors, seconds, input_tokens, output_tokens)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(name, hour, span_type, label) DO UPDATE SET
+        count=count + excluded.count,
+        errors=errors + excluded.errors,
+        seconds=seconds + excluded.seconds,
+        input_tokens=input_tokens + excluded.input_tokens,
+        output_tokens=output_tokens + excluded.output_tokens
+"""
+ADD_SPAN_HISTOGRAM = """
+    INSERT INTO span_histograms (name, hour, span_type, label, bucket, count)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(name, hour, span_type, label, bucket) DO UPDATE SET count=count + excluded.count
+"""
+SELECT_SPAN_METRICS = """
+    SELECT span_type, SUM(count), SUM(errors), SUM(seconds), SUM(input_tokens), SUM(output_tokens)
+    FROM span_metrics
+    WHERE name = ? AND hour >= ?
+    GROUP BY span_type
+"""
+SELECT_SPAN_HISTOGRAMS = """
+    SELECT span_type, bucket, SUM(count) FROM span_histograms
+    WHERE name = ? AND hour >= ?
+    GROUP BY span_type, bucket
+"""
+
+
+class VersionConflict(Exception):
+    """An account changed after it was read, so a compare-and-swap write to it was not applied"""
+
+
+class Database:
+    """
+    A long-lived connection manager for the SQLite database.
+    Each thread gets its own connection, opened once and reused for every call, in WAL mode.
+    Connections run in autocommit mode; writes go through transaction(), which takes the
+    write lock up front so concurrent writers queue on busy_timeout rather than deadlocking.
+    """
+
+    def __init__(self, path: str = DB):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, isolation_level=None, check_same_thread=False, cached_statements=256
+            )
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+db = Database()
+
+with db.transaction() as conn:
+    conn.execute('CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)')
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT,
@@ -20,82 +306,619 @@ with sqlite3.connect(DB) as conn:
             message TEXT
         )
     ''')
-    cursor.execute('CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)')
-    conn.commit()
-
-def write_account(name, account_dict):
-    json_data = json.dumps(account_dict)
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO accounts (name, account)
-            VALUES (?, ?)
-            ON CONFLICT(name) DO UPDATE SET account=excluded.account
-        ''', (name.lower(), json_data))
-        conn.commit()
-
-def read_account(name):
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT account FROM accounts WHERE name = ?', (name.lower(),))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
-    
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_logs_name_id ON logs (name, id)')
+    conn.execute('CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)')
+    conn.execute('CREATE TABLE IF NOT EXISTS market_days (date TEXT PRIMARY KEY, symbols INTEGER NOT NULL)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS market_prices (
+            date TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            price REAL NOT NULL,
+            PRIMARY KEY (date, symbol)
+        ) WITHOUT ROWID
+    ''')
+    # Covers a symbol's history over a range of dates without touching the table
+    conn.execute('CREATE INDEX IF NOT EXISTS market_prices_symbol_date ON market_prices (symbol, date, price)')
+    # Share prices shared by every process, with leases so only one process fetches a symbol at a time
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS price_cache (
+            source TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            price REAL NOT NULL,
+            fetched_at REAL NOT NULL,
+            PRIMARY KEY (source, symbol)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS price_cache_leases (
+            source TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (source, symbol)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS price_cache_stats (
+            source TEXT PRIMARY KEY,
+            hits INTEGER NOT NULL,
+            stale_hits INTEGER NOT NULL,
+            misses INTEGER NOT NULL,
+            upstream_calls INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS leases (
+            scope TEXT NOT NULL,
+            key TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (scope, key)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS research_cache (
+            key TEXT PRIMARY KEY,
+            tool TEXT NOT NULL,
+            result TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            used_at REAL NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS research_cache_used_at ON research_cache (used_at)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS research_cache_stats (
+            tool TEXT PRIMARY KEY,
+            hits INTEGER NOT NULL,
+            misses INTEGER NOT NULL,
+            coalesced INTEGER NOT NULL,
+            upstream_calls INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS span_metrics (
+            name TEXT NOT NULL,
+            hour TEXT NOT NULL,
+            span_type TEXT NOT NULL,
+            label TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            errors INTEGER NOT NULL,
+            seconds REAL NOT NULL,
+            input_tokens INTEGER NOT NULL,
+            output_tokens INTEGER NOT NULL,
+            PRIMARY KEY (name, hour, span_type, label)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS span_histograms (
+            name TEXT NOT NULL,
+            hour TEXT NOT NULL,
+            span_type TEXT NOT NULL,
+            label TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (name, hour, span_type, label, bucket)
+        ) WITHOUT ROWID
+    ''')
+    # Accounts are normalized: the small, frequently rewritten state lives in account_info and holdings,
+    # while transactions and portfolio values are append-only history tables read by (name, id)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS account_info (
+            name TEXT PRIMARY KEY,
+            balance REAL NOT NULL,
+            strategy TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            net_spend REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS holdings (
+            name TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            cost REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (name, symbol)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            price REAL NOT NULL,
+            timestamp TEXT NOT NULL,
+            rationale TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS transactions_name_id ON transactions (name, id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS portfolio_values (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            datetime TEXT NOT NULL,
+            value REAL NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS portfolio_values_name_id ON portfolio_values (name, id)')
+    # Portfolio values rolled up into 1 minute, 1 hour and 1 day buckets, kept current on every append,
+    # holding the last value in each bucket along with its low, high and number of raw values
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS portfolio_value_rollups (
+            name TEXT NOT NULL,
+            resolution TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            value REAL NOT NULL,
+            low REAL NOT NULL,
+            high REAL NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (name, resolution, bucket)
+        ) WITHOUT ROWID
+    ''')
+
+def _columns(conn, table: str) -> set[str]:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def _rebuild_running_totals(conn, name: str) -> None:
+    transactions = [
+        {"symbol": symbol, "quantity": quantity, "price": price}
+        for symbol, quantity, price, _, _ in conn.execute(SELECT_TRANSACTIONS, (name,))
+    ]
+    net_spend, positions = replay_trades(transactions)
+    conn.execute("UPDATE account_info SET net_spend = ? WHERE name = ?", (net_spend, name))
+    conn.executemany(
+        "UPDATE holdings SET cost = ? WHERE name = ? AND symbol = ?",
+        [(cost, name, symbol) for symbol, (_, cost) in positions.items()],
+    )
+
+def _write_rollups(conn, name: str, values: list[tuple[str, float]]) -> None:
+    conn.executemany(
+        UPSERT_ROLLUP,
+        [
+            (name, resolution, when[:length] + padding, value, value, value)
+            for when, value in values
+            for resolution, (length, padding) in ROLLUP_RESOLUTIONS.items()
+        ],
+    )
+
+def _write_market(conn, date: str, data: dict) -> None:
+    conn.execute(DELETE_MARKET_PRICES, (date,))
+    conn.executemany(INSERT_MARKET_PRICE, ((date, symbol, price) for symbol, price in data.items()))
+    conn.execute(UPSERT_MARKET_DAY, (date, len(data)))
+
+# Databases created before the running totals existed get the columns added and backfilled from history
+with db.transaction() as conn:
+    upgraded = False
+    if "net_spend" not in _columns(conn, "account_info"):
+        conn.execute("ALTER TABLE account_info ADD COLUMN net_spend REAL NOT NULL DEFAULT 0")
+        upgraded = True
+    if "cost" not in _columns(conn, "holdings"):
+        conn.execute("ALTER TABLE holdings ADD COLUMN cost REAL NOT NULL DEFAULT 0")
+        upgraded = True
+    if upgraded:
+        for (name,) in conn.execute("SELECT name FROM account_info").fetchall():
+            _rebuild_running_totals(conn, name)
+    # and databases created before the rollups existed get them built from the raw portfolio values
+    if not conn.execute("SELECT 1 FROM portfolio_value_rollups LIMIT 1").fetchone():
+        for (name,) in conn.execute("SELECT DISTINCT name FROM portfolio_values").fetchall():
+            _write_rollups(conn, name, conn.execute(SELECT_PORTFOLIO_VALUES, (name,)).fetchall())
+    # and market snapshots stored as one JSON blob per date are split into rows
+    for date, data in conn.execute(SELECT_LEGACY_MARKET).fetchall():
+        _write_market(conn, date, json.loads(data))
+        conn.execute("DELETE FROM market WHERE date = ?", (date,))
+
+def read_account_info(name: str) -> dict | None:
+    """
+    Read the balance, strategy, version and net spend of an account without touching its history.
+    net_spend is the running total of quantity * price over all of the account's transactions.
+    """
+    row = db.connection().execute(SELECT_ACCOUNT_INFO, (name.lower(),)).fetchone()
+    if not row:
+        return None
+    return {"name": row[0], "balance": row[1], "strategy": row[2], "version": row[3], "net_spend": row[4]}
+
+def write_account_info(name: str, balance: float, strategy: str) -> None:
+    with db.transaction() as conn:
+        conn.execute(UPSERT_ACCOUNT_INFO, (name.lower(), balance, strategy))
+
+def create_account_info(name: str, balance: float, strategy: str) -> None:
+    """Open an account, leaving it alone if another process opened it first"""
+    with db.transaction() as conn:
+        conn.execute(INSERT_NEW_ACCOUNT_INFO, (name.lower(), balance, strategy))
+
+def update_account_info(name: str, version: int, balance: float, strategy: str) -> None:
+    """Write the balance and strategy if the account is still at version, or raise VersionConflict"""
+    with db.transaction() as conn:
+        if not conn.execute(UPDATE_ACCOUNT_INFO, (balance, strategy, name.lower(), version)).rowcount:
+            raise VersionConflict(name)
+
+def read_positions(name: str) -> dict[str, tuple[int, float]]:
+    """Read the holdings of an account as {symbol: (quantity, cost basis)}"""
+    rows = db.connection().execute(SELECT_POSITIONS, (name.lower(),)).fetchall()
+    return {symbol: (quantity, cost) for symbol, quantity, cost in rows}
+
+def read_transactions(name: str) -> list[dict]:
+    rows = db.connection().execute(SELECT_TRANSACTIONS, (name.lower(),)).fetchall()
+    columns = ("symbol", "quantity", "price", "timestamp", "rationale")
+    return [dict(zip(columns, row)) for row in rows]
+
+def read_transaction_page(name: str, before_id: int | None = None, limit: int = 20) -> list[dict]:
+    """Up to limit transactions of an account with ids below before_id, newest first"""
+    before_id = (1 << 63) - 1 if before_id is None else before_id
+    rows = db.connection().execute(SELECT_TRANSACTION_PAGE, (name.lower(), before_id, limit)).fetchall()
+    columns = ("id", "symbol", "quantity", "price", "timestamp", "rationale")
+    return [dict(zip(columns, row)) for row in rows]
+
+def read_transaction_stats(name: str) -> dict:
+    row = db.connection().execute(SELECT_TRANSACTION_STATS, (name.lower(),)).fetchone()
+    columns = ("count", "buys", "sells", "traded_value", "symbols_traded", "first", "last")
+    return dict(zip(columns, row))
+
+def record_trade(
+    name: str,
+    version: int,
+    balance: float,
+    net_spend: float,
+    symbol: str,
+    quantity_held: int,
+    cost_held: float,
+    transaction: dict,
+) -> None:
+    """
+    Record a buy or sell in one transaction: the new balance and net spend, the new holding and
+    cost basis of the symbol (deleted when it reaches zero), and one appended transactions row.
+    All of it was worked out from the account as it was at version; if another trade or update has
+    landed since, nothing is written and VersionConflict is raised so the caller can re-read and retry.
+    """
+    name = name.lower()
+    with db.transaction() as conn:
+        if not conn.execute(UPDATE_TRADE_TOTALS, (balance, net_spend, name, version)).rowcount:
+            raise VersionConflict(name)
+        if quantity_held:
+            conn.execute(UPSERT_HOLDING, (name, symbol, quantity_held, cost_held))
+        else:
+            conn.execute(DELETE_HOLDING, (name, symbol))
+        conn.execute(
+            INSERT_TRANSACTION,
+            (
+                name,
+                transaction["symbol"],
+                transaction["quantity"],
+                transaction["price"],
+                transaction["timestamp"],
+                transaction["rationale"],
+            ),
+        )
+
+def append_portfolio_value(name: str, datetime: str, value: float) -> None:
+    name = name.lower()
+    with db.transaction() as conn:
+        conn.execute(INSERT_PORTFOLIO_VALUE, (name, datetime, value))
+        _write_rollups(conn, name, [(datetime, value)])
+
+def read_portfolio_values(name: str) -> list[tuple[str, float]]:
+    return db.connection().execute(SELECT_PORTFOLIO_VALUES, (name.lower(),)).fetchall()
+
+def read_portfolio_value_rollups(name: str, resolution: str) -> list[tuple[str, float]]:
+    """The last portfolio value in each bucket of a resolution ('1m', '1h' or '1d'), as (bucket start, value)"""
+    return db.connection().execute(SELECT_ROLLUPS, (name.lower(), resolution)).fetchall()
+
+def count_portfolio_points(name: str, resolution: str, limit: int) -> int:
+    """How many points a resolution ('raw' or a rollup) has for a name, counting no further than limit"""
+    if resolution == "raw":
+        return db.connection().execute(COUNT_PORTFOLIO_VALUES_UP_TO, (name.lower(), limit)).fetchone()[0]
+    return db.connection().execute(COUNT_ROLLUPS_UP_TO, (name.lower(), resolution, limit)).fetchone()[0]
+
+def reset_account(name: str, balance: float, strategy: str) -> None:
+    """Clear an account's holdings and history and start it again with this balance and strategy"""
+    name = name.lower()
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM holdings WHERE name = ?", (name,))
+        conn.execute("DELETE FROM transactions WHERE name = ?", (name,))
+        conn.execute("DELETE FROM portfolio_values WHERE name = ?", (name,))
+        conn.execute("DELETE FROM portfolio_value_rollups WHERE name = ?", (name,))
+        conn.execute(UPSERT_ACCOUNT_INFO, (name, balance, strategy))
+        conn.execute("UPDATE account_info SET net_spend = 0 WHERE name = ?", (name,))
+
+def read_legacy_account_names() -> list[str]:
+    """The names of accounts still stored as one JSON blob in the old accounts table"""
+    return [row[0] for row in db.connection().execute("SELECT name FROM accounts ORDER BY name")]
+
+def migrate_legacy_account(name: str, overwrite: bool = False) -> bool:
+    """
+    Copy an account from its JSON blob in the old accounts table into the normalized tables.
+    Does nothing if there is no blob, or if the account already exists and overwrite is False.
+    Returns True if the account was migrated.
+    """
+    name = name.lower()
+    with db.transaction() as conn:
+        row = conn.execute(SELECT_ACCOUNT, (name,)).fetchone()
+        if not row:
+            return False
+        if not overwrite and conn.execute(SELECT_ACCOUNT_INFO, (name,)).fetchone():
+            return False
+        fields = json.loads(row[0])
+        conn.execute("DELETE FROM holdings WHERE name = ?", (name,))
+        conn.execute("DELETE FROM transactions WHERE name = ?", (name,))
+        conn.execute("DELETE FROM portfolio_values WHERE name = ?", (name,))
+        conn.execute("DELETE FROM portfolio_value_rollups WHERE name = ?", (name,))
+        net_spend, positions = replay_trades(fields["transactions"])
+        conn.execute(UPSERT_ACCOUNT_INFO, (name, fields["balance"], fields["strategy"]))
+        conn.execute("UPDATE account_info SET net_spend = ? WHERE name = ?", (net_spend, name))
+        conn.executemany(
+            UPSERT_HOLDING,
+            [
+                (name, symbol, quantity, positions.get(symbol, (0, 0.0))[1])
+                for symbol, quantity in fields["holdings"].items()
+                if quantity
+            ],
+        )
+        conn.executemany(
+            INSERT_TRANSACTION,
+            [
+                (name, t["symbol"], t["quantity"], t["price"], t["timestamp"], t["rationale"])
+                for t in fields["transactions"]
+            ],
+        )
+        conn.executemany(
+            INSERT_PORTFOLIO_VALUE,
+            [(name, when, value) for when, value in fields["portfolio_value_time_series"]],
+        )
+        _write_rollups(conn, name, fields["portfolio_value_time_series"])
+    return True
+
 def write_log(name: str, type: str, message: str):
     """
     Write a log entry to the logs table.
-    
+
     Args:
         name (str): The name associated with the log
         type (str): The type of log entry
         message (str): The log message
     """
-    now = datetime.now().isoformat()
-    
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO logs (name, datetime, type, message)
-            VALUES (?, datetime('now'), ?, ?)
-        ''', (name.lower(), type, message))
-        conn.commit()
+    with db.transaction() as conn:
+        conn.execute(INSERT_LOG, (name.lower(), type, message))
+
+def write_logs(rows: list[tuple[str, str, str, str]]) -> None:
+    """
+    Write a batch of log entries in a single transaction.
+
+    Args:
+        rows (list): Tuples of (name, datetime, type, message), with datetime in UTC as 'YYYY-MM-DD HH:MM:SS'
+    """
+    with db.transaction() as conn:
+        conn.executemany(INSERT_LOG_AT, [(name.lower(), when, type, message) for name, when, type, message in rows])
 
 def read_log(name: str, last_n=10):
     """
     Read the most recent log entries for a given name.
-    
+
     Args:
         name (str): The name to retrieve logs for
         last_n (int): Number of most recent entries to retrieve
-        
+
     Returns:
         list: A list of tuples containing (datetime, type, message)
     """
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT datetime, type, message FROM logs 
-            WHERE name = ? 
-            ORDER BY datetime DESC
-            LIMIT ?
-        ''', (name.lower(), last_n))
-        
-        return reversed(cursor.fetchall())
+    rows = db.connection().execute(SELECT_LOG, (name.lower(), last_n)).fetchall()
+    return reversed(rows)
+
+def read_log_since(name: str, after_id: int, limit: int = 100) -> list[tuple[int, str, str, str]]:
+    """
+    Read the log entries for a name written after a cursor, oldest first.
+
+    Args:
+        name (str): The name to retrieve logs for
+        after_id (int): The id of the last entry already seen, or 0 to start from the beginning
+        limit (int): The most entries to return; call again from the last id returned to get more
+
+    Returns:
+        list: A list of tuples containing (id, datetime, type, message)
+    """
+    return db.connection().execute(SELECT_LOG_SINCE, (name.lower(), after_id, limit)).fetchall()
+
+def read_recent_logs(name: str, last_n: int) -> list[tuple[int, str, str, str]]:
+    """The most recent log entries for a name as (id, datetime, type, message), oldest first"""
+    rows = db.connection().execute(SELECT_RECENT_LOGS, (name.lower(), last_n)).fetchall()
+    return rows[::-1]
+
+def read_logs_after(after_id: int, limit: int) -> list[tuple[int, str, str, str, str]]:
+    """Log entries for every name written after after_id, as (id, name, datetime, type, message)"""
+    return db.connection().execute(SELECT_LOGS_AFTER, (after_id, limit)).fetchall()
+
+def read_last_log_id() -> int:
+    return db.connection().execute(SELECT_LAST_LOG_ID).fetchone()[0]
+
+def read_log_names() -> list[str]:
+    return [row[0] for row in db.connection().execute(SELECT_LOG_NAMES)]
+
+def read_name_logs_after(name: str, after_id: int, up_to_id: int, limit: int) -> list[tuple[int, str, str, str, str]]:
+    """Log entries for one name with after_id < id <= up_to_id, as (id, name, datetime, type, message)"""
+    return db.connection().execute(SELECT_NAME_LOGS_AFTER, (name, after_id, up_to_id, limit)).fetchall()
+
+def read_nth_newest_log_id(name: str, n: int) -> int | None:
+    """The id of a name's log entry with n newer entries above it, or None if it has n or fewer"""
+    row = db.connection().execute(SELECT_NTH_NEWEST_LOG_ID, (name, n)).fetchone()
+    return row[0] if row else None
+
+def delete_logs(first_id: int, last_id: int, name: str | None = None) -> int:
+    """Delete the log entries with ids from first_id to last_id, for one name or for all of them"""
+    with db.transaction() as conn:
+        if name is None:
+            return conn.execute(DELETE_LOGS, (first_id, last_id)).rowcount
+        return conn.execute(DELETE_NAME_LOGS, (name, first_id, last_id)).rowcount
+
+def read_account_versions() -> dict[str, tuple[int, int | None]]:
+    """
+    {name: (version, latest portfolio value id)} for every account. The pair changes whenever
+    anything shown on the dashboard for that account does: a trade, a reset or a new valuation.
+    """
+    return {row[0]: (row[1], row[2]) for row in db.connection().execute(SELECT_ACCOUNT_VERSIONS)}
+
+def read_data_version() -> int:
+    """
+    SQLite's data_version for this thread's connection: it changes whenever another connection,
+    in this process or any other, commits to the database, so it is a cheap way to poll for changes.
+    """
+    return db.connection().execute("PRAGMA data_version").fetchone()[0]
 
 def write_market(date: str, data: dict) -> None:
-    data_json = json.dumps(data)
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO market (date, data)
-            VALUES (?, ?)
-            ON CONFLICT(date) DO UPDATE SET data=excluded.data
-        ''', (date, data_json))
-        conn.commit()
+    """Store the end of day price of every symbol for date, replacing any snapshot already stored for it"""
+    with db.transaction() as conn:
+        _write_market(conn, date, data)
+
+def has_market(date: str) -> bool:
+    return db.connection().execute(SELECT_MARKET_DAY, (date,)).fetchone() is not None
 
 def read_market(date: str) -> dict | None:
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT data FROM market WHERE date = ?', (date,))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
\ No newline at end of file
+    if not has_market(date):
+        return None
+    return dict(db.connection().execute(SELECT_MARKET, (date,)).fetchall())
+
+def read_market_prices(date: str, symbols: list[str]) -> dict[str, float] | None:
+    """
+    The prices of just these symbols on date, one primary key lookup each, leaving out symbols with no price.
+    None if there is no snapshot for date.
+    """
+    if not has_market(date):
+        return None
+    conn = db.connection()
+    prices = {}
+    for symbol in symbols:
+        row = conn.execute(SELECT_MARKET_PRICE, (date, symbol)).fetchone()
+        if row:
+            prices[symbol] = row[0]
+    return prices
+
+def read_price_history(symbol: str, start: str = "", end: str = "9999-12-31") -> list[tuple[str, float]]:
+    """A symbol's stored end of day prices with dates from start to end inclusive, oldest first"""
+    return db.connection().execute(SELECT_PRICE_HISTORY, (symbol, start, end)).fetchall()
+
+def read_market_history() -> list[tuple[str, dict]]:
+    """Every day of stored end of day prices, oldest first, as (date, {symbol: price})"""
+    history = []
+    for date, symbol, price in db.connection().execute(SELECT_MARKET_HISTORY):
+        if not history or history[-1][0] != date:
+            history.append((date, {}))
+        history[-1][1][symbol] = price
+    return history
+
+def read_cached_prices(source: str, symbols: list[str]) -> dict[str, tuple[float, float]]:
+    """Read cached prices as {symbol: (price, fetched_at)}, where fetched_at is a unix time"""
+    conn = db.connection()
+    cached = {}
+    for start in range(0, len(symbols), 500):
+        batch = symbols[start : start + 500]
+        placeholders = ",".join("?" * len(batch))
+        rows = conn.execute(
+            f"SELECT symbol, price, fetched_at FROM price_cache WHERE source = ? AND symbol IN ({placeholders})",
+            (source, *batch),
+        )
+        cached.update({symbol: (price, fetched_at) for symbol, price, fetched_at in rows})
+    return cached
+
+def write_cached_prices(source: str, prices: dict[str, float], fetched_at: float) -> None:
+    """Store freshly fetched prices and release the leases held on them"""
+    with db.transaction() as conn:
+        conn.executemany(UPSERT_CACHED_PRICE, [(source, symbol, price, fetched_at) for symbol, price in prices.items()])
+        conn.executemany(DELETE_PRICE_LEASE, [(source, symbol) for symbol in prices])
+
+def claim_price_leases(source: str, symbols: list[str], now: float, expires_at: float) -> list[str]:
+    """
+    Try to take the lease to fetch each symbol; a lease can be taken if nobody holds an unexpired one.
+    Returns the symbols this caller now holds the lease for.
+    """
+    claimed = []
+    with db.transaction() as conn:
+        for symbol in symbols:
+            if conn.execute(CLAIM_PRICE_LEASE, (source, symbol, expires_at, now)).rowcount:
+                claimed.append(symbol)
+    return claimed
+
+def release_price_leases(source: str, symbols: list[str]) -> None:
+    with db.transaction() as conn:
+        conn.executemany(DELETE_PRICE_LEASE, [(source, symbol) for symbol in symbols])
+
+def add_price_cache_stats(source: str, hits: int, stale_hits: int, misses: int, upstream_calls: int) -> None:
+    with db.transaction() as conn:
+        conn.execute(ADD_PRICE_CACHE_STATS, (source, hits, stale_hits, misses, upstream_calls))
+
+def read_price_cache_stats() -> dict[str, dict[str, int]]:
+    """The price cache counters, summed over every process that has used the cache"""
+    rows = db.connection().execute(
+        "SELECT source, hits, stale_hits, misses, upstream_calls FROM price_cache_stats ORDER BY source"
+    )
+    columns = ("hits", "stale_hits", "misses", "upstream_calls")
+    return {row[0]: dict(zip(columns, row[1:])) for row in rows}
+
+def claim_lease(scope: str, key: str, now: float, expires_at: float) -> bool:
+    """Try to take the lease on key within scope; it can be taken if nobody holds an unexpired one"""
+    with db.transaction() as conn:
+        return conn.execute(CLAIM_LEASE, (scope, key, expires_at, now)).rowcount > 0
+
+def release_lease(scope: str, key: str) -> None:
+    with db.transaction() as conn:
+        conn.execute(DELETE_LEASE, (scope, key))
+
+def read_research(key: str, now: float) -> str | None:
+    """A cached researcher tool result that has not expired, marking it as just used"""
+    row = db.connection().execute(SELECT_RESEARCH, (key, now)).fetchone()
+    if not row:
+        return None
+    with db.transaction() as conn:
+        conn.execute(TOUCH_RESEARCH, (now, key))
+    return row[0]
+
+def write_research(key: str, tool: str, result: str, expires_at: float, now: float, max_bytes: int) -> int:
+    """
+    Store a researcher tool result and release the lease held on its key, then evict expired results
+    and, while the cache is over max_bytes, the least recently used ones. Returns the number evicted.
+    """
+    with db.transaction() as conn:
+        conn.execute(UPSERT_RESEARCH, (key, tool, result, len(result), expires_at, now))
+        conn.execute(DELETE_LEASE, (RESEARCH_LEASE_SCOPE, key))
+        evicted = conn.execute("DELETE FROM research_cache WHERE expires_at <= ?", (now,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM research_cache").fetchone()[0]
+        if total > max_bytes:
+            oldest = []
+            for old_key, size in conn.execute(SELECT_RESEARCH_BY_USE):
+                if total <= max_bytes:
+                    break
+                oldest.append((old_key,))
+                total -= size
+            conn.executemany("DELETE FROM research_cache WHERE key = ?", oldest)
+            evicted += len(oldest)
+    return evicted
+
+def add_research_cache_stats(tool: str, hits: int, misses: int, coalesced: int, upstream_calls: int) -> None:
+    with db.transaction() as conn:
+        conn.execute(ADD_RESEARCH_CACHE_STATS, (tool, hits, misses, coalesced, upstream_calls))
+
+def read_research_cache_stats() -> dict[str, dict[str, int]]:
+    """The research cache counters for each tool, summed over every process that has used the cache"""
+    rows = db.connection().execute(
+        "SELECT tool, hits, misses, coalesced, upstream_calls FROM research_cache_stats ORDER BY tool"
+    )
+    columns = ("hits", "misses", "coalesced", "upstream_calls")
+    return {row[0]: dict(zip(columns, row[1:])) for row in rows}
+
+def add_span_metrics(metrics: list[tuple], histograms: list[tuple]) -> None:
+    """
+    Add to the hourly span rollups: metrics rows are (name, hour, span_type, label, count, errors, seconds,
+    input_tokens, output_tokens) and histograms rows (name, hour, span_type, label, bucket, count)
+    """
+    with db.transaction() as conn:
+        conn.executemany(ADD_SPAN_METRICS, metrics)
+        conn.executemany(ADD_SPAN_HISTOGRAM, histograms)
+
+def read_span_metrics(name: str, since_hour: str) -> tuple[dict[str, dict], dict[str, dict[int, int]]]:
+    """
+    A trader's span totals and histogram bucket counts for each span type, over the hours from since_hour:
+    ({span_type: {count, errors, seconds, input_tokens, output_tokens}}, {span_type: {bucket: count}})
+    """
+    conn = db.connection()
+    columns = ("count", "errors", "seconds", "input_tokens", "output_tokens")
+    totals = {row[0]: dict(zip(columns, row[1:])) for row in conn.execute(SELECT_SPAN_METRICS, (name.lower(), since_hour))}
+    histograms = {}
+    for span_type, bucket, count in conn.execute(SELECT_SPAN_HISTOGRAMS, (name.lower(), since_hour)):
+        histograms.setdefault(span_type, {})[bucket] = count
+    return totals, histograms
@@ -0,0 +1,136 @@
+"""
+Archive old trader logs out of the database into compressed files.
+
+Two policies, each switched off by setting it to 0:
+- LOG_RETENTION_DAYS: entries older than this many days are archived
+- LOG_KEEP_PER_NAME: only this many of the most recent entries are kept for each name
+
+Archived entries are written to gzipped JSON lines files in LOG_ARCHIVE_DIR, one file per batch,
+named after the range of ids it holds, and only deleted from the database once the file is written.
+
+Run with: uv run log_retention.py --days 7 --keep 5000
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from database import (
+    db,
+    read_logs_after,
+    read_log_names,
+    read_name_logs_after,
+    read_nth_newest_log_id,
+    delete_logs,
+)
+
+load_dotenv(override=True)
+
+LOG_RETENTION_DAYS = float(os.getenv("LOG_RETENTION_DAYS", "7"))
+LOG_KEEP_PER_NAME = int(os.getenv("LOG_KEEP_PER_NAME", "0"))
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "log_archive")
+LOG_RETENTION_INTERVAL_HOURS = float(os.getenv("LOG_RETENTION_INTERVAL_HOURS", "1"))
+ARCHIVE_BATCH = 50_000
+
+FIELDS = ("id", "name", "datetime", "type", "message")
+
+
+def write_archive(rows: list[tuple], archive_dir: str, label: str) -> str:
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"logs-{label}-{rows[0][0]:012d}-{rows[-1][0]:012d}.jsonl.gz")
+    temporary = path + ".tmp"
+    with gzip.open(temporary, "wt", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(dict(zip(FIELDS, row))) + "\n")
+    os.replace(temporary, path)
+    return path
+
+
+def read_archive(path: str):
+    """Yield the entries of an archive file as dicts of id, name, datetime, type and message"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def archive_logs_older_than(days: float, archive_dir: str = LOG_ARCHIVE_DIR) -> int:
+    """
+    Archive every entry written more than days ago. Ids grow with time, so this walks the table
+    in id order and stops at the first entry that is recent enough to keep.
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    archived, after_id = 0, 0
+    while True:
+        rows = read_logs_after(after_id, ARCHIVE_BATCH)
+        old = []
+        for row in rows:
+            if row[2] >= cutoff:
+                break
+            old.append(row)
+        if not old:
+            return archived
+        write_archive(old, archive_dir, "all")
+        archived += delete_logs(old[0][0], old[-1][0])
+        after_id = old[-1][0]
+        if len(old) < len(rows) or len(rows) < ARCHIVE_BATCH:
+            return archived
+
+
+def compact_logs(keep_per_name: int, archive_dir: str = LOG_ARCHIVE_DIR) -> int:
+    """Archive all but the most recent keep_per_name entries of every name"""
+    archived = 0
+    for name in read_log_names():
+        up_to_id = read_nth_newest_log_id(name, keep_per_name)
+        after_id = 0
+        while up_to_id is not None:
+            rows = read_name_logs_after(name, after_id, up_to_id, ARCHIVE_BATCH)
+            if not rows:
+                break
+            write_archive(rows, archive_dir, name)
+            archived += delete_logs(rows[0][0], rows[-1][0], name)
+            after_id = rows[-1][0]
+    return archived
+
+
+def apply_log_retention(
+    days: float = LOG_RETENTION_DAYS,
+    keep_per_name: int = LOG_KEEP_PER_NAME,
+    archive_dir: str = LOG_ARCHIVE_DIR,
+) -> dict[str, int]:
+    archived = {"expired": 0, "compacted": 0}
+    if days > 0:
+        archived["expired"] = archive_logs_older_than(days, archive_dir)
+    if keep_per_name > 0:
+        archived["compacted"] = compact_logs(keep_per_name, archive_dir)
+    return archived
+
+
+async def run_log_retention_forever(interval_hours: float = LOG_RETENTION_INTERVAL_HOURS) -> None:
+    while True:
+        try:
+            archived = await asyncio.to_thread(apply_log_retention)
+            if any(archived.values()):
+                print(f"Archived old logs to {LOG_ARCHIVE_DIR}: {archived}")
+        except Exception as e:
+            print(f"Log retention failed: {e}")
+        await asyncio.sleep(interval_hours * 3600)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=float, default=LOG_RETENTION_DAYS, help="archive entries older than this")
+    parser.add_argument("--keep", type=int, default=LOG_KEEP_PER_NAME, help="most recent entries to keep per name")
+    parser.add_argument("--archive-dir", default=LOG_ARCHIVE_DIR)
+    parser.add_argument("--vacuum", action="store_true", help="rebuild the database file to give the space back")
+    args = parser.parse_args()
+    archived = apply_log_retention(args.days, args.keep, args.archive_dir)
+    print(f"Archived {archived['expired']} expired and {archived['compacted']} compacted log entries")
+    if args.vacuum:
+        db.connection().execute("VACUUM")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from database import write_logs
+
+load_dotenv(override=True)
+
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "0.5"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_FLUSH_TIMEOUT = float(os.getenv("LOG_FLUSH_TIMEOUT", "5"))
+
+_STOP = object()
+
+
+class LogWriter:
+    """
+    A buffered sink for log rows.
+    write() only timestamps the row and puts it on a bounded queue; a background thread drains
+    the queue and inserts everything it has with a single executemany and commit, either when
+    batch_size rows are waiting or flush_interval seconds after the first unwritten row.
+    write() never waits: if the queue is full because the disk can't keep up, the row is dropped and
+    counted in dropped, and the background thread reports the count. Once the writer is closed,
+    write() falls back to inserting the row directly.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = LOG_FLUSH_INTERVAL,
+        batch_size: int = LOG_BATCH_SIZE,
+        max_queue: int = LOG_QUEUE_SIZE,
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.closed = False
+        self.dropped = 0
+        self.reported_dropped = 0
+        # Makes checking closed and enqueueing one step, so no row is queued after the writer stops
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, name: str, type: str, message: str) -> None:
+        row = (name, datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"), type, message)
+        with self.lock:
+            if not self.closed:
+                try:
+                    self.queue.put_nowait(row)
+                except queue.Full:
+                    self.dropped += 1
+                return
+        self._write([row])
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until every row written before this call is committed; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            closed = self.closed
+        if closed:
+            # close() is draining the queue or has already; its join is the flush
+            self.thread.join(timeout)
+            return not self.thread.is_alive()
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        # A close() that started after the check above may stop the thread without seeing the event,
+        # so the wait also ends once the thread has exited
+        while not done.wait(0.1):
+            if not self.thread.is_alive():
+                return done.is_set() or self.queue.empty()
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        return True
+
+    def close(self, timeout: float | None = None) -> None:
+        """Drain the queue, commit what's left and stop the background thread"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+
+    def _write(self, batch: list) -> None:
+        dropped = self.dropped
+        if dropped > self.reported_dropped:
+            print(f"Dropped {dropped - self.reported_dropped} log rows as the log writer fell behind")
+            self.reported_dropped = dropped
+        if not batch:
+            return
+        try:
+            write_logs(batch)
+        except Exception as e:
+            print(f"Was not able to write {len(batch)} log rows due to {e}")
+        batch.clear()
+
+    def _run(self) -> None:
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                waiters = self._drain(batch)
+                self._write(batch)
+                for waiter in waiters:
+                    waiter.set()
+                return
+            if isinstance(item, threading.Event):
+                self._write(batch)
+                deadline = None
+                item.set()
+                continue
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if len(batch) >= self.batch_size or (batch and time.monotonic() >= deadline):
+                self._write(batch)
+                deadline = None
+
+    def _drain(self, batch: list) -> list[threading.Event]:
+        waiters = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return waiters
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not _STOP:
+                batch.append(item)
@@ -3,26 +3,37 @@ from dotenv import load_dotenv
 import os
 from datetime import datetime
 import random
-from database import write_market, read_market
+from database import write_market, has_market, read_market_prices
+from price_cache import PriceCache
 from functools import lru_cache
 
 load_dotenv(override=True)
 
 polygon_api_key = os.getenv("POLYGON_API_KEY")
 polygon_plan = os.getenv("POLYGON_PLAN")
+polygon_base_url = os.getenv("POLYGON_BASE_URL", "https://api.polygon.io")
 
 is_paid_polygon = polygon_plan == "paid"
 is_realtime_polygon = polygon_plan == "realtime"
 
+# The multi-ticker snapshot takes a comma separated list in the query string, so very long lists are split
+SNAPSHOT_BATCH_SIZE = 250
+
+
+@lru_cache(maxsize=1)
+def get_polygon_client() -> RESTClient:
+    """One client per process, so its connection pool is reused across calls"""
+    return RESTClient(polygon_api_key, base=polygon_base_url)
+
 
 def is_market_open() -> bool:
-    client = RESTClient(polygon_api_key)
+    client = get_polygon_client()
     market_status = client.get_market_status()
     return market_status.market == "open"
 
 
 def get_all_share_prices_polygon_eod() -> dict[str, float]:
-    client = RESTClient(polygon_api_key)
+    client = get_polygon_client()
 
     probe = client.get_previous_close_agg("SPY")[0]
     last_close = datetime.fromtimestamp(probe.timestamp / 1000).date()
@@ -32,31 +43,61 @@ def get_all_share_prices_polygon_eod() -> dict[str, float]:
 
 
 @lru_cache(maxsize=2)
-def get_market_for_prior_date(today):
-    market_data = read_market(today)
-    if not market_data:
-        market_data = get_all_share_prices_polygon_eod()
-        write_market(today, market_data)
-    return market_data
+def ensure_market_for_prior_date(today) -> str:
+    """Fetch and store the whole market's prior close once per date; lookups then read single rows"""
+    if not has_market(today):
+        write_market(today, get_all_share_prices_polygon_eod())
+    return today
+
+
+def start_of_today() -> float:
+    """When the current date's prior close became the price, on the same clock as the market date"""
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
 
 
 def get_share_price_polygon_eod(symbol) -> float:
-    today = datetime.now().date().strftime("%Y-%m-%d")
-    market_data = get_market_for_prior_date(today)
-    return market_data.get(symbol, 0.0)
+    return get_share_prices_polygon_eod([symbol])[symbol]
+
+
+def get_share_prices_polygon_eod(symbols: list[str]) -> dict[str, float]:
+    today = ensure_market_for_prior_date(datetime.now().date().strftime("%Y-%m-%d"))
+    prices = read_market_prices(today, symbols) or {}
+    return {symbol: prices.get(symbol, 0.0) for symbol in symbols}
 
 
 def get_share_price_polygon_min(symbol) -> float:
-    client = RESTClient(polygon_api_key)
+    client = get_polygon_client()
     result = client.get_snapshot_ticker("stocks", symbol)
     return result.min.close or result.prev_day.close
 
 
+def get_share_prices_polygon_min(symbols: list[str]) -> dict[str, float]:
+    client = get_polygon_client()
+    prices = {}
+    for start in range(0, len(symbols), SNAPSHOT_BATCH_SIZE):
+        batch = symbols[start : start + SNAPSHOT_BATCH_SIZE]
+        for result in client.get_snapshot_all("stocks", tickers=batch):
+            minute_close = result.min.close if result.min else None
+            prev_close = result.prev_day.close if result.prev_day else None
+            prices[result.ticker] = minute_close or prev_close or 0.0
+    return {symbol: prices.get(symbol, 0.0) for symbol in symbols}
+
+
+# Shared across processes, so traders asking for the same ticker within the ttl cost one upstream call
+# End of day prices change with the date, so the previous close is never served after midnight
+eod_price_cache = PriceCache("eod", get_share_prices_polygon_eod, valid_from=start_of_today)
+snapshot_price_cache = PriceCache("realtime" if is_realtime_polygon else "min", get_share_prices_polygon_min)
+
+
 def get_share_price_polygon(symbol) -> float:
-    if is_paid_polygon:
-        return get_share_price_polygon_min(symbol)
+    return get_share_prices_polygon([symbol])[symbol]
+
+
+def get_share_prices_polygon(symbols: list[str]) -> dict[str, float]:
+    if is_paid_polygon or is_realtime_polygon:
+        return snapshot_price_cache.get_many(symbols)
     else:
-        return get_share_price_polygon_eod(symbol)
+        return eod_price_cache.get_many(symbols)
 
 
 def get_share_price(symbol) -> float:
@@ -66,3 +107,16 @@ def get_share_price(symbol) -> float:
         except Exception as e:
             print(f"Was not able to use the polygon API due to {e}; using a random number")
     return float(random.randint(1, 100))
+
+
+def get_share_prices(symbols: list[str]) -> dict[str, float]:
+    """Look up many symbols at once: a single snapshot request per batch instead of one per symbol"""
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    if polygon_api_key:
+        try:
+            return get_share_prices_polygon(symbols)
+        except Exception as e:
+            print(f"Was not able to use the polygon API due to {e}; using random numbers")
+    return {symbol: float(random.randint(1, 100)) for symbol in symbols}
@@ -27,17 +27,29 @@ trader_mcp_server_params = [
     market_mcp,
 ]
 
-# The full set of MCP servers for the researcher: Fetch, Brave Search and Memory
+# The researcher's Fetch and Brave Search servers; by default they run behind the research cache server,
+# which shares their results between traders
+
+USE_RESEARCH_CACHE = os.getenv("USE_RESEARCH_CACHE", "true").strip().lower() == "true"
+
+research_upstream_params = [
+    {"command": "uvx", "args": ["mcp-server-fetch"]},
+    {
+        "command": "npx",
+        "args": ["-y", "@modelcontextprotocol/server-brave-search"],
+        "env": brave_env,
+    },
+]
+
+research_cache_params = {"command": "uv", "args": ["run", "research_cache_server.py"], "env": brave_env}
+
+# The full set of MCP servers for the researcher: Fetch and Brave Search, and Memory
 
 
 def researcher_mcp_server_params(name: str):
+    research = [research_cache_params] if USE_RESEARCH_CACHE else research_upstream_params
     return [
-        {"command": "uvx", "args": ["mcp-server-fetch"]},
-        {
-            "command": "npx",
-            "args": ["-y", "@modelcontextprotocol/server-brave-search"],
-            "env": brave_env,
-        },
+        *research,
         {
             "command": "npx",
             "args": ["-y", "mcp-memory-libsql"],
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import time
+from agents.mcp import MCPServerStdio
+
+CLIENT_SESSION_TIMEOUT_SECONDS = 120
+HEALTH_CHECK_TIMEOUT_SECONDS = 10
+
+
+def server_key(params: dict) -> str:
+    return json.dumps(params, sort_keys=True)
+
+
+class PooledServer:
+    """
+    One MCP server process kept running between trading cycles.
+    The process is started and stopped by its own supervisor task, because the stdio client
+    has to be entered and exited in the same task; traders only ever use the session.
+    """
+
+    def __init__(self, params: dict, client_session_timeout_seconds: float):
+        self.params = params
+        self.client_session_timeout_seconds = client_session_timeout_seconds
+        self.server: MCPServerStdio | None = None
+        self.error: BaseException | None = None
+        self.spawn_seconds = 0.0
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> MCPServerStdio:
+        self._task = asyncio.create_task(self._supervise())
+        await self._ready.wait()
+        if self.error:
+            raise self.error
+        return self.server
+
+    async def _supervise(self) -> None:
+        start = time.perf_counter()
+        server = MCPServerStdio(
+            self.params,
+            cache_tools_list=True,
+            client_session_timeout_seconds=self.client_session_timeout_seconds,
+        )
+        try:
+            async with server:
+                self.spawn_seconds = time.perf_counter() - start
+                self.server = server
+                self._ready.set()
+                await self._stop.wait()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.server = None
+            self._ready.set()
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done() and self.server is not None
+
+    async def healthy(self, timeout: float = HEALTH_CHECK_TIMEOUT_SECONDS) -> bool:
+        if not self.is_running():
+            return False
+        try:
+            await asyncio.wait_for(self.server.session.send_ping(), timeout)
+            return True
+        except Exception:
+            return False
+
+    async def close(self) -> None:
+        self._stop.set()
+        if self._task:
+            try:
+                await self._task
+            except Exception:
+                pass
+
+
+class MCPServerPool:
+    """
+    Starts each MCP server once and hands the same connection to every trader that asks for it.
+
+    Servers are keyed by their full params, so servers with identical params (accounts, push,
+    market, fetch and search) are shared by all traders, while servers whose params differ per
+    trader, like the libsql memory server with its own database file, stay isolated.
+    Every acquire pings the server first, and a server that has crashed or stopped answering
+    is restarted.
+    """
+
+    def __init__(
+        self,
+        client_session_timeout_seconds: float = CLIENT_SESSION_TIMEOUT_SECONDS,
+        health_check_timeout: float = HEALTH_CHECK_TIMEOUT_SECONDS,
+    ):
+        self.client_session_timeout_seconds = client_session_timeout_seconds
+        self.health_check_timeout = health_check_timeout
+        self.servers: dict[str, PooledServer] = {}
+        self.locks: dict[str, asyncio.Lock] = {}
+        self.spawns = 0
+        self.restarts = 0
+        self.spawn_seconds = 0.0
+
+    async def get(self, params: dict) -> MCPServerStdio:
+        key = server_key(params)
+        async with self.locks.setdefault(key, asyncio.Lock()):
+            pooled = self.servers.get(key)
+            if pooled and not await pooled.healthy(self.health_check_timeout):
+                print(f"Restarting MCP server {params['command']} {' '.join(params['args'])}")
+                self.restarts += 1
+                await pooled.close()
+                pooled = None
+            if pooled is None:
+                pooled = PooledServer(params, self.client_session_timeout_seconds)
+                try:
+                    await pooled.start()
+                finally:
+                    self.spawns += 1
+                    self.spawn_seconds += pooled.spawn_seconds
+                self.servers[key] = pooled
+            return pooled.server
+
+    async def get_all(self, params_list: list[dict]) -> list[MCPServerStdio]:
+        return list(await asyncio.gather(*[self.get(params) for params in params_list]))
+
+    def stats(self) -> dict:
+        return {
+            "running": sum(1 for pooled in self.servers.values() if pooled.is_running()),
+            "spawns": self.spawns,
+            "restarts": self.restarts,
+            "spawn_seconds": self.spawn_seconds,
+        }
+
+    async def close(self) -> None:
+        await asyncio.gather(*[pooled.close() for pooled in self.servers.values()])
+        self.servers.clear()
@@ -0,0 +1,276 @@
+"""
+Span timing metrics for the traders.
+
+MetricsProcessor is a trace processor that runs alongside LogTracer. For every finished span it records
+the duration in a latency histogram, along with errors and LLM token usage, keyed by trader, span type
+and a label: the model for generation and response spans, the tool for function spans, the server for
+MCP tool listings and the agent for agent spans. The totals since the process started are served in the
+Prometheus text format on METRICS_PORT, and hourly rollups are added to the span_metrics and
+span_histograms tables, where the dashboard reads them.
+
+Run with: uv run metrics.py warren
+to print a trader's latencies over the last METRICS_WINDOW_HOURS.
+"""
+
+import os
+import sys
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from agents import TracingProcessor
+from dotenv import load_dotenv
+from database import add_span_metrics, read_span_metrics
+from tracers import trader_name
+
+load_dotenv(override=True)
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "30"))
+METRICS_WINDOW_HOURS = float(os.getenv("METRICS_WINDOW_HOURS", "24"))
+
+# Each power of two is split into 2 ** SUB_BUCKET_BITS buckets, so recorded values are within about 3%
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def bucket_of(microseconds: int) -> int:
+    if microseconds < SUB_BUCKETS:
+        return max(microseconds, 0)
+    shift = microseconds.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (microseconds >> shift) - SUB_BUCKETS
+
+
+def bucket_middle(bucket: int) -> float:
+    """The middle of the range of microseconds that falls in bucket"""
+    if bucket < SUB_BUCKETS:
+        return float(bucket)
+    shift = bucket // SUB_BUCKETS - 1
+    return float((bucket % SUB_BUCKETS + SUB_BUCKETS) << shift) + ((1 << shift) - 1) / 2
+
+
+class LatencyHistogram:
+    """
+    An HDR-style histogram of durations: log-linear buckets of microseconds with a fixed relative precision,
+    so memory stays small over any range from microseconds to hours. Histograms merge by adding bucket counts.
+    """
+
+    def __init__(self, buckets: dict[int, int] | None = None):
+        self.buckets: dict[int, int] = dict(buckets or {})
+        self.count = sum(self.buckets.values())
+
+    def record(self, seconds: float) -> None:
+        bucket = bucket_of(int(seconds * 1_000_000))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+
+    def percentile(self, fraction: float) -> float:
+        """The duration in seconds that fraction of the recorded durations are at or below"""
+        if not self.count:
+            return 0.0
+        rank = max(fraction * self.count, 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return bucket_middle(bucket) / 1_000_000
+        return bucket_middle(max(self.buckets)) / 1_000_000
+
+
+@dataclass
+class SpanSeries:
+    histogram: LatencyHistogram = field(default_factory=LatencyHistogram)
+    seconds: float = 0.0
+    errors: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+    def add(self, other: "SpanSeries") -> None:
+        self.histogram.merge(other.histogram)
+        self.seconds += other.seconds
+        self.errors += other.errors
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+
+
+def span_label(span_data) -> str:
+    if span_data.type == "generation":
+        return span_data.model or ""
+    if span_data.type == "response":
+        response = span_data.response
+        return response.model if response and response.model else ""
+    if span_data.type == "mcp_tools":
+        return span_data.server or ""
+    return getattr(span_data, "name", None) or ""
+
+
+def span_tokens(span_data) -> tuple[int, int]:
+    """The input and output tokens used by a generation or response span, where the model reported them"""
+    if span_data.type == "generation" and span_data.usage:
+        return span_data.usage.get("input_tokens") or 0, span_data.usage.get("output_tokens") or 0
+    if span_data.type == "response" and span_data.response and span_data.response.usage:
+        usage = span_data.response.usage
+        return usage.input_tokens or 0, usage.output_tokens or 0
+    return 0, 0
+
+
+class MetricsProcessor(TracingProcessor):
+    """
+    Records span durations, errors and token usage per (trader, span type, label).
+    Keeps the totals since start for the Prometheus endpoint, and the changes since the last flush,
+    which a background thread adds to the hourly rollup tables every flush_seconds.
+    """
+
+    def __init__(self, flush_seconds: float = METRICS_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self.totals: dict[tuple[str, str, str], SpanSeries] = {}
+        self.pending: dict[tuple[str, str, str, str], SpanSeries] = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="metrics-flush", daemon=True)
+        self.thread.start()
+
+    def on_trace_start(self, trace) -> None:
+        pass
+
+    def on_trace_end(self, trace) -> None:
+        pass
+
+    def on_span_start(self, span) -> None:
+        pass
+
+    def on_span_end(self, span) -> None:
+        name = trader_name(span)
+        if not name or not span.started_at or not span.ended_at:
+            return
+        ended = datetime.fromisoformat(span.ended_at)
+        seconds = (ended - datetime.fromisoformat(span.started_at)).total_seconds()
+        span_type = span.span_data.type if span.span_data else "span"
+        label = span_label(span.span_data) if span.span_data else ""
+        input_tokens, output_tokens = span_tokens(span.span_data) if span.span_data else (0, 0)
+        hour = ended.astimezone(timezone.utc).strftime("%Y-%m-%d %H:00:00")
+        with self.lock:
+            for series in (
+                self.totals.setdefault((name, span_type, label), SpanSeries()),
+                self.pending.setdefault((name, hour, span_type, label), SpanSeries()),
+            ):
+                series.histogram.record(seconds)
+                series.seconds += seconds
+                series.errors += 1 if span.error else 0
+                series.input_tokens += input_tokens
+                series.output_tokens += output_tokens
+
+    def flush(self) -> None:
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        metrics, histograms = [], []
+        for (name, hour, span_type, label), series in pending.items():
+            metrics.append((name, hour, span_type, label, series.histogram.count, series.errors, series.seconds,
+                            series.input_tokens, series.output_tokens))
+            histograms += [(name, hour, span_type, label, bucket, count) for bucket, count in series.histogram.buckets.items()]
+        try:
+            add_span_metrics(metrics, histograms)
+        except Exception as e:
+            print(f"Was not able to write span metrics due to {e}")
+
+    def _run(self) -> None:
+        while not self.stopped.wait(self.flush_seconds):
+            self.flush()
+
+    def force_flush(self) -> None:
+        self.flush()
+
+    def shutdown(self) -> None:
+        self.stopped.set()
+        self.flush()
+
+    def prometheus(self) -> str:
+        """The totals since start in the Prometheus text exposition format"""
+        with self.lock:
+            totals = [(key, series.histogram.count, series) for key, series in self.totals.items()]
+            lines = [
+                "# HELP trader_span_duration_seconds Duration of agent trace spans",
+                "# TYPE trader_span_duration_seconds summary",
+            ]
+            for (name, span_type, label), count, series in totals:
+                labels = f'trader="{escape(name)}",span_type="{escape(span_type)}",label="{escape(label)}"'
+                for quantile in QUANTILES:
+                    value = series.histogram.percentile(quantile)
+                    lines.append(f'trader_span_duration_seconds{{{labels},quantile="{quantile}"}} {value:.6f}')
+                lines.append(f"trader_span_duration_seconds_sum{{{labels}}} {series.seconds:.6f}")
+                lines.append(f"trader_span_duration_seconds_count{{{labels}}} {count}")
+            lines += ["# HELP trader_span_errors_total Spans that ended with an error", "# TYPE trader_span_errors_total counter"]
+            for (name, span_type, label), _, series in totals:
+                labels = f'trader="{escape(name)}",span_type="{escape(span_type)}",label="{escape(label)}"'
+                lines.append(f"trader_span_errors_total{{{labels}}} {series.errors}")
+            lines += ["# HELP trader_llm_tokens_total Tokens reported by the model", "# TYPE trader_llm_tokens_total counter"]
+            for (name, span_type, label), _, series in totals:
+                if series.input_tokens or series.output_tokens:
+                    labels = f'trader="{escape(name)}",span_type="{escape(span_type)}",label="{escape(label)}"'
+                    lines.append(f'trader_llm_tokens_total{{{labels},direction="input"}} {series.input_tokens}')
+                    lines.append(f'trader_llm_tokens_total{{{labels},direction="output"}} {series.output_tokens}')
+        return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def start_metrics_server(processor: MetricsProcessor, port: int = METRICS_PORT) -> ThreadingHTTPServer | None:
+    """Serve processor's metrics at /metrics on port, in a background thread; a port of 0 turns this off"""
+    if not port:
+        return None
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            payload = processor.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def span_latencies(name: str, hours: float = METRICS_WINDOW_HOURS) -> list[dict]:
+    """A trader's count, p50, p95, errors and tokens for each span type over the last hours, slowest total first"""
+    since = (datetime.now(timezone.utc) - timedelta(hours=hours)).strftime("%Y-%m-%d %H:00:00")
+    totals, buckets = read_span_metrics(name, since)
+    rows = []
+    for span_type, total in totals.items():
+        histogram = LatencyHistogram(buckets.get(span_type))
+        rows.append({
+            "span_type": span_type,
+            "count": total["count"],
+            "p50": histogram.percentile(0.5),
+            "p95": histogram.percentile(0.95),
+            "total_seconds": total["seconds"],
+            "errors": total["errors"],
+            "tokens": total["input_tokens"] + total["output_tokens"],
+        })
+    return sorted(rows, key=lambda row: -row["total_seconds"])
+
+
+if __name__ == "__main__":
+    for row in span_latencies(sys.argv[1] if len(sys.argv) > 1 else "warren"):
+        print(
+            f"{row['span_type']:<12} {row['count']:>6} spans  p50 {row['p50']:8.3f}s  p95 {row['p95']:8.3f}s  "
+            f"total {row['total_seconds']:9.1f}s  {row['errors']} errors  {row['tokens']:,} tokens"
+        )
@@ -0,0 +1,33 @@
+"""
+Convert accounts stored as JSON blobs in the old accounts table into the normalized
+account_info, holdings, transactions and portfolio_values tables.
+
+Run with: uv run migrate_accounts.py [--overwrite] [--drop-legacy]
+"""
+
+import argparse
+from database import db, read_legacy_account_names, migrate_legacy_account
+
+
+def migrate(overwrite: bool = False, drop_legacy: bool = False) -> None:
+    names = read_legacy_account_names()
+    if not names:
+        print("No legacy accounts to migrate")
+    for name in names:
+        if migrate_legacy_account(name, overwrite=overwrite):
+            print(f"Migrated {name}")
+        else:
+            print(f"Skipped {name}: already migrated (use --overwrite to replace it)")
+    if drop_legacy and names:
+        with db.transaction() as conn:
+            conn.execute("DELETE FROM accounts")
+        db.connection().execute("VACUUM")
+        print(f"Removed {len(names)} legacy account blobs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--overwrite", action="store_true", help="replace accounts that already exist in the new tables")
+    parser.add_argument("--drop-legacy", action="store_true", help="delete the JSON blobs once they are migrated")
+    args = parser.parse_args()
+    migrate(overwrite=args.overwrite, drop_legacy=args.drop_legacy)
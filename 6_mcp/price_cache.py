@@ -0,0 +1,165 @@
+import atexit
+import os
+import threading
+import time
+from typing import Callable
+from dotenv import load_dotenv
+from database import (
+    read_cached_prices,
+    write_cached_prices,
+    claim_price_leases,
+    release_price_leases,
+    add_price_cache_stats,
+    read_price_cache_stats,
+)
+
+load_dotenv(override=True)
+
+# How long a price is fresh, and how much longer a stale price may still be served while it is refreshed
+PRICE_TTLS = {
+    "eod": float(os.getenv("PRICE_TTL_EOD", "3600")),
+    "min": float(os.getenv("PRICE_TTL_MIN", "60")),
+    "realtime": float(os.getenv("PRICE_TTL_REALTIME", "5")),
+}
+PRICE_STALE_FOR = {
+    "eod": float(os.getenv("PRICE_STALE_FOR_EOD", "21600")),
+    "min": float(os.getenv("PRICE_STALE_FOR_MIN", "300")),
+    "realtime": float(os.getenv("PRICE_STALE_FOR_REALTIME", "30")),
+}
+
+LEASE_SECONDS = 10
+WAIT_INTERVAL = 0.05
+STATS_FLUSH_SECONDS = 10
+
+
+class PriceCache:
+    """
+    A share price cache shared by every process through the SQLite database.
+
+    Prices younger than the ttl are served straight from the cache. Prices that are older, but within
+    the stale window, are served as they are while a background thread fetches fresh ones.
+    Anything else is fetched upstream in a single call for all the missing symbols. Before fetching,
+    a process takes a short lease on each symbol, so when several traders ask for the same ticker
+    at once only one upstream call is made and the others wait for its result.
+    If valid_from is given, it returns the time the current prices became valid, such as the start of the
+    trading date for end of day prices; anything fetched before then is refetched, however young.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        fetch: Callable[[list[str]], dict[str, float]],
+        ttl: float | None = None,
+        stale_for: float | None = None,
+        valid_from: Callable[[], float] | None = None,
+    ):
+        self.source = source
+        self.fetch = fetch
+        self.valid_from = valid_from
+        self.ttl = PRICE_TTLS[source] if ttl is None else ttl
+        self.stale_for = PRICE_STALE_FOR[source] if stale_for is None else stale_for
+        self.counters = {"hits": 0, "stale_hits": 0, "misses": 0, "upstream_calls": 0}
+        self._unflushed = dict(self.counters)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush_stats)
+
+    def get_many(self, symbols: list[str]) -> dict[str, float]:
+        now = time.time()
+        cached = self._current(read_cached_prices(self.source, symbols))
+        prices, stale, missing = {}, [], []
+        for symbol in symbols:
+            entry = cached.get(symbol)
+            age = now - entry[1] if entry else None
+            if entry and age <= self.ttl:
+                prices[symbol] = entry[0]
+            elif entry and age <= self.ttl + self.stale_for:
+                prices[symbol] = entry[0]
+                stale.append(symbol)
+            else:
+                missing.append(symbol)
+        self._count(hits=len(prices) - len(stale), stale_hits=len(stale), misses=len(missing))
+        if stale:
+            threading.Thread(target=self._revalidate, args=(stale,), daemon=True).start()
+        if missing:
+            prices.update(self._load(missing))
+        return {symbol: prices.get(symbol, 0.0) for symbol in symbols}
+
+    def _current(self, cached: dict[str, tuple[float, float]]) -> dict[str, tuple[float, float]]:
+        """The cached entries fetched since valid_from"""
+        if self.valid_from is None:
+            return cached
+        since = self.valid_from()
+        return {symbol: entry for symbol, entry in cached.items() if entry[1] >= since}
+
+    def get(self, symbol: str) -> float:
+        return self.get_many([symbol])[symbol]
+
+    def stats(self) -> dict[str, int]:
+        """The counters for this process; read_price_cache_stats() has the totals across processes"""
+        with self._lock:
+            return dict(self.counters)
+
+    def flush_stats(self) -> None:
+        with self._lock:
+            deltas, self._unflushed = self._unflushed, dict.fromkeys(self._unflushed, 0)
+            self._last_flush = time.monotonic()
+        if any(deltas.values()):
+            add_price_cache_stats(self.source, **deltas)
+
+    def _count(self, **counts) -> None:
+        with self._lock:
+            for key, value in counts.items():
+                self.counters[key] += value
+                self._unflushed[key] += value
+            due = time.monotonic() - self._last_flush > STATS_FLUSH_SECONDS
+        if due:
+            self.flush_stats()
+
+    def _fetch(self, symbols: list[str]) -> dict[str, float]:
+        """Fetch symbols whose leases this process holds, and store the results for everyone"""
+        try:
+            fetched = self.fetch(symbols)
+        except BaseException:
+            release_price_leases(self.source, symbols)
+            raise
+        self._count(upstream_calls=1)
+        write_cached_prices(self.source, fetched, time.time())
+        return fetched
+
+    def _load(self, symbols: list[str]) -> dict[str, float]:
+        prices = {}
+        pending = symbols
+        while pending:
+            now = time.time()
+            claimed = claim_price_leases(self.source, pending, now, now + LEASE_SECONDS)
+            if claimed:
+                prices.update(self._fetch(claimed))
+                claimed = set(claimed)
+                pending = [symbol for symbol in pending if symbol not in claimed]
+            if pending:
+                # Another process holds the lease on these, so wait for its results;
+                # if it dies, the lease expires and the next claim succeeds
+                time.sleep(WAIT_INTERVAL)
+                cached = self._current(read_cached_prices(self.source, pending))
+                now = time.time()
+                fresh = {symbol: price for symbol, (price, fetched_at) in cached.items() if now - fetched_at <= self.ttl}
+                prices.update(fresh)
+                pending = [symbol for symbol in pending if symbol not in fresh]
+        return prices
+
+    def _revalidate(self, symbols: list[str]) -> None:
+        now = time.time()
+        try:
+            claimed = claim_price_leases(self.source, symbols, now, now + LEASE_SECONDS)
+            if claimed:
+                self._fetch(claimed)
+        except Exception as e:
+            print(f"Was not able to refresh {len(symbols)} cached {self.source} prices due to {e}")
+
+
+if __name__ == "__main__":
+    for source, counters in read_price_cache_stats().items():
+        lookups = counters["hits"] + counters["stale_hits"] + counters["misses"]
+        hit_rate = (counters["hits"] + counters["stale_hits"]) / lookups if lookups else 0.0
+        print(f"{source:>8}: {lookups} lookups, {hit_rate:.0%} hit rate, {counters['upstream_calls']} upstream calls")
@@ -0,0 +1,257 @@
+"""
+Rate limiting for the LLM providers, shared by every trader and researcher in the process.
+
+Each provider has a ProviderLimiter with two token buckets, one for requests per minute and one for
+LLM tokens per minute, set with RATE_LIMIT_<PROVIDER>_RPM and RATE_LIMIT_<PROVIDER>_TPM.
+Calls wait their turn in a priority queue: trader calls go ahead of researcher calls, and calls of the
+same priority go first come first served. A researcher call that has waited longer than
+RATE_LIMIT_PRIORITY_AGING_SECONDS goes next regardless, since the trader that asked for it is waiting too.
+Every response feeds back into the limiter:
+- a 429 halves the rate and pauses the provider for its retry-after, then the call is retried here
+- rate limit headers saying nothing is left pause the provider until their reset time
+- successful calls bring the rate back up, and correct the token estimate with the reported usage
+
+The limiter is applied as an httpx transport under the AsyncOpenAI clients, so it sees every request
+the OpenAI SDK and the agents make, including the SDK's own retries.
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import httpx
+from collections import deque
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+# Conservative defaults; set them to your account's limits
+DEFAULT_LIMITS = {
+    "openai": (500, 200_000),
+    "openrouter": (200, 400_000),
+    "deepseek": (60, 200_000),
+    "grok": (60, 200_000),
+    "gemini": (60, 250_000),
+}
+RATE_LIMIT_BURST_SECONDS = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "10"))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "6"))
+RATE_LIMIT_PRIORITY_AGING_SECONDS = float(os.getenv("RATE_LIMIT_PRIORITY_AGING_SECONDS", "10"))
+DEFAULT_OUTPUT_TOKENS = 256
+MIN_SCALE = 0.1
+RECOVERY_STEP = 0.05
+
+PRIORITY_HEADER = "x-trader-priority"
+PRIORITIES = {"trader": 0, "researcher": 1}
+DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: str | None) -> float | None:
+    """Seconds from a retry-after or reset header: plain seconds, or durations like 1s, 250ms or 6m0s"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parts = DURATION.findall(value)
+        return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts) if parts else None
+
+
+class TokenBucket:
+    """Holds up to burst_seconds worth of a per minute allowance, refilled continuously at rate * scale"""
+
+    def __init__(self, per_minute: float, burst_seconds: float = RATE_LIMIT_BURST_SECONDS):
+        self.rate = per_minute / 60
+        self.capacity = max(self.rate * burst_seconds, 1)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float, scale: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate * scale)
+        self.updated = now
+
+    def wait_for(self, amount: float, scale: float) -> float:
+        """Seconds until amount can be taken; amounts above the capacity only wait for a full bucket"""
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0) / (self.rate * scale)
+
+
+class ProviderLimiter:
+    def __init__(self, provider: str, requests_per_minute: float, tokens_per_minute: float):
+        self.provider = provider
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.scale = 1.0
+        self.paused_until = 0.0
+        self.queues: dict[int, deque[tuple[float, int, asyncio.Future]]] = {}
+        self.timer: asyncio.TimerHandle | None = None
+        self.counts = {"requests": 0, "rate_limited": 0, "retries": 0, "paused": 0}
+        self.waited_seconds = 0.0
+
+    async def acquire(self, tokens: int, priority: int) -> None:
+        """Wait until the provider can take a request of about this many tokens, behind higher priority callers"""
+        start = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(priority, deque()).append((start, tokens, future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the caller went away, so give the allowance back
+                self.requests.level += 1
+                self.tokens.level += tokens
+            raise
+        self.waited_seconds += time.monotonic() - start
+        self.counts["requests"] += 1
+
+    def _next(self, now: float) -> deque | None:
+        """The queue whose head goes next: the highest priority, unless a lower priority head has waited too long"""
+        heads = []
+        for priority in sorted(self.queues):
+            queue = self.queues[priority]
+            while queue and queue[0][2].done():
+                queue.popleft()
+            if queue:
+                heads.append(queue)
+        if not heads:
+            return None
+        aged = [queue for queue in heads[1:] if now - queue[0][0] > RATE_LIMIT_PRIORITY_AGING_SECONDS]
+        return min(aged, key=lambda queue: queue[0][0]) if aged else heads[0]
+
+    def _dispatch(self) -> None:
+        self.timer = None
+        now = time.monotonic()
+        self.requests.refill(now, self.scale)
+        self.tokens.refill(now, self.scale)
+        while (queue := self._next(now)) is not None:
+            _, tokens, future = queue[0]
+            wait = max(self.paused_until - now, self.requests.wait_for(1, self.scale), self.tokens.wait_for(tokens, self.scale))
+            if wait > 0:
+                if self.timer is not None:
+                    self.timer.cancel()
+                self.timer = future.get_loop().call_later(wait, self._dispatch)
+                return
+            queue.popleft()
+            self.requests.level -= 1
+            self.tokens.level -= tokens
+            future.set_result(None)
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Correct the tokens taken for a request once the provider reports what it used"""
+        self.tokens.level += estimated - actual
+
+    def observe(self, status: int, headers: httpx.Headers, attempt: int) -> None:
+        now = time.monotonic()
+        pause = 0.0
+        if status == 429:
+            self.counts["rate_limited"] += 1
+            self.scale = max(self.scale / 2, MIN_SCALE)
+            retry_after = parse_duration(headers.get("retry-after-ms"))
+            retry_after = retry_after / 1000 if retry_after is not None else parse_duration(headers.get("retry-after"))
+            pause = retry_after if retry_after is not None else min(2 ** attempt, 30) * random.uniform(0.5, 1.0)
+        else:
+            self.scale = min(self.scale + RECOVERY_STEP, 1.0)
+        for kind in ("requests", "tokens"):
+            if headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+                pause = max(pause, parse_duration(headers.get(f"x-ratelimit-reset-{kind}")) or 1.0)
+        if pause and now + pause > self.paused_until:
+            self.counts["paused"] += 1
+            self.paused_until = now + pause
+
+    def stats(self) -> dict:
+        return {**self.counts, "waited_seconds": round(self.waited_seconds, 2), "scale": round(self.scale, 2)}
+
+
+def estimate_tokens(request: httpx.Request) -> int:
+    """About 4 characters a token for the prompt, plus the requested output or a default allowance"""
+    try:
+        body = json.loads(request.content or b"{}")
+    except (ValueError, httpx.RequestNotRead):
+        return DEFAULT_OUTPUT_TOKENS
+    output = body.get("max_completion_tokens") or body.get("max_tokens") or body.get("max_output_tokens")
+    return len(request.content) // 4 + (output or DEFAULT_OUTPUT_TOKENS)
+
+
+def is_streaming(request: httpx.Request, response: httpx.Response) -> bool:
+    """Whether the response arrives as a stream of events, which must reach the caller as it comes"""
+    if "text/event-stream" in response.headers.get("content-type", ""):
+        return True
+    try:
+        return bool(json.loads(request.content or b"{}").get("stream"))
+    except (ValueError, AttributeError, httpx.RequestNotRead):
+        return False
+
+
+async def reported_tokens(response: httpx.Response) -> int | None:
+    if "json" not in response.headers.get("content-type", ""):
+        return None
+    await response.aread()
+    try:
+        usage = response.json().get("usage") or {}
+    except ValueError:
+        return None
+    return usage.get("total_tokens")
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Sends every request through a ProviderLimiter, and retries 429s once the limiter allows"""
+
+    def __init__(self, limiter: ProviderLimiter, transport: httpx.AsyncBaseTransport | None = None,
+                 max_retries: int = RATE_LIMIT_MAX_RETRIES):
+        self.limiter = limiter
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        self.max_retries = max_retries
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        priority = PRIORITIES.get(request.headers.pop(PRIORITY_HEADER, "trader"), 0)
+        estimated = estimate_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(estimated, priority)
+            response = await self.transport.handle_async_request(request)
+            self.limiter.observe(response.status_code, response.headers, attempt)
+            if response.status_code != 429 or attempt == self.max_retries:
+                break
+            self.limiter.counts["retries"] += 1
+            await response.aclose()
+        if response.status_code != 200 or "json" not in response.headers.get("content-type", ""):
+            return response
+        if is_streaming(request, response):
+            # Passed through untouched, keeping the estimate, so tokens arrive as the model produces them
+            return response
+        # Read the body to settle the token estimate, then hand the client a response with the same raw bytes
+        raw = b"".join([chunk async for chunk in response.aiter_raw()])
+        await response.aclose()
+        settled = httpx.Response(response.status_code, headers=response.headers, content=raw, request=request,
+                                 extensions=response.extensions)
+        actual = await reported_tokens(httpx.Response(200, headers=response.headers, content=raw))
+        if actual is not None:
+            self.limiter.settle(estimated, actual)
+        return settled
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def make_limiter(provider: str) -> ProviderLimiter:
+    default_rpm, default_tpm = DEFAULT_LIMITS.get(provider, (60, 100_000))
+    rpm = float(os.getenv(f"RATE_LIMIT_{provider.upper()}_RPM", default_rpm))
+    tpm = float(os.getenv(f"RATE_LIMIT_{provider.upper()}_TPM", default_tpm))
+    return ProviderLimiter(provider, rpm, tpm)
+
+
+limiters = {provider: make_limiter(provider) for provider in DEFAULT_LIMITS}
+
+
+def rate_limited_client(provider: str, **options) -> AsyncOpenAI:
+    """An AsyncOpenAI client whose requests all go through the provider's limiter"""
+    limiter = limiters.setdefault(provider, make_limiter(provider))
+    return AsyncOpenAI(http_client=DefaultAsyncHttpxClient(transport=RateLimitedTransport(limiter)), **options)
+
+
+def with_priority(client: AsyncOpenAI, role: str) -> AsyncOpenAI:
+    """The same client and connection pool, with its requests queued at role's priority"""
+    return client.with_options(default_headers={PRIORITY_HEADER: role})
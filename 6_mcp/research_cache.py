@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Awaitable, Callable
+from dotenv import load_dotenv
+from database import (
+    RESEARCH_LEASE_SCOPE,
+    read_research,
+    write_research,
+    claim_lease,
+    release_lease,
+    add_research_cache_stats,
+    read_research_cache_stats,
+)
+
+load_dotenv(override=True)
+
+# How long a result stays fresh for each tool, in seconds; tools not listed use the default, and 0 turns caching off
+RESEARCH_TTLS = {
+    "fetch": float(os.getenv("RESEARCH_TTL_FETCH", "3600")),
+    "brave_web_search": float(os.getenv("RESEARCH_TTL_SEARCH", "900")),
+    "brave_local_search": float(os.getenv("RESEARCH_TTL_SEARCH", "900")),
+}
+RESEARCH_TTL_DEFAULT = float(os.getenv("RESEARCH_TTL_DEFAULT", "600"))
+RESEARCH_CACHE_MAX_BYTES = int(float(os.getenv("RESEARCH_CACHE_MAX_MB", "200")) * 1_000_000)
+
+LEASE_SECONDS = 120
+WAIT_INTERVAL = 0.1
+
+
+def cache_key(tool: str, arguments: dict) -> str:
+    """The same tool called with the same arguments, in any order, gives the same key"""
+    canonical = json.dumps([tool, arguments], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResearchCache:
+    """
+    A cache of researcher tool results shared by every process through the SQLite database.
+
+    Results are stored under a hash of the tool name and arguments, and served until the tool's ttl passes.
+    Identical calls that arrive while one is in flight wait for its result instead of calling upstream:
+    within a process they share the pending call, and across processes the caller holding the lease on
+    the key makes the call while the others wait for its result to be stored. Once the cache holds more
+    than max_bytes, the least recently used results are evicted. Failed calls are not cached.
+    Database calls run in worker threads, so a busy database never holds up the event loop.
+    """
+
+    def __init__(self, ttls: dict[str, float] = RESEARCH_TTLS, max_bytes: int = RESEARCH_CACHE_MAX_BYTES):
+        self.ttls = ttls
+        self.max_bytes = max_bytes
+        self.counters: dict[str, dict[str, int]] = {}
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+    def ttl(self, tool: str) -> float:
+        return self.ttls.get(tool, RESEARCH_TTL_DEFAULT)
+
+    async def call(self, tool: str, arguments: dict, upstream: Callable[[], Awaitable[str]]) -> str:
+        """The result of tool with arguments, from the cache or else from upstream()"""
+        ttl = self.ttl(tool)
+        if ttl <= 0:
+            await self._count(tool, misses=1, upstream_calls=1)
+            return await upstream()
+        key = cache_key(tool, arguments)
+        cached = await asyncio.to_thread(read_research, key, time.time())
+        if cached is not None:
+            await self._count(tool, hits=1)
+            return cached
+        task = self._in_flight.get(key)
+        if task:
+            await self._count(tool, coalesced=1)
+        else:
+            # The call runs in its own task, so a caller that is cancelled does not cancel it for the others
+            task = asyncio.create_task(self._load(tool, key, ttl, upstream))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        del self._in_flight[key]
+        if not task.cancelled():
+            # Every caller may have gone, so mark any exception as seen
+            task.exception()
+
+    async def _load(self, tool: str, key: str, ttl: float, upstream: Callable[[], Awaitable[str]]) -> str:
+        while True:
+            now = time.time()
+            if await asyncio.to_thread(claim_lease, RESEARCH_LEASE_SCOPE, key, now, now + LEASE_SECONDS):
+                await self._count(tool, misses=1, upstream_calls=1)
+                try:
+                    result = await upstream()
+                except BaseException:
+                    await asyncio.to_thread(release_lease, RESEARCH_LEASE_SCOPE, key)
+                    raise
+                now = time.time()
+                await asyncio.to_thread(write_research, key, tool, result, now + ttl, now, self.max_bytes)
+                return result
+            # Another process is making this call, so wait for its result;
+            # if it fails or dies, the lease is released or expires and the next claim succeeds
+            await asyncio.sleep(WAIT_INTERVAL)
+            cached = await asyncio.to_thread(read_research, key, time.time())
+            if cached is not None:
+                await self._count(tool, coalesced=1)
+                return cached
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """The counters for this process; read_research_cache_stats() has the totals across processes"""
+        return {tool: dict(counters) for tool, counters in self.counters.items()}
+
+    async def _count(self, tool: str, **counts) -> None:
+        # Written through on every call, as research calls are few and slow and the server may be killed at any time
+        deltas = {"hits": 0, "misses": 0, "coalesced": 0, "upstream_calls": 0, **counts}
+        counters = self.counters.setdefault(tool, dict.fromkeys(deltas, 0))
+        for key, value in deltas.items():
+            counters[key] += value
+        await asyncio.to_thread(add_research_cache_stats, tool, **deltas)
+
+
+class ResearchCacheReport:
+    """Prints the research cache hit rate of each tool since the previous report, e.g. once per trading cycle"""
+
+    def __init__(self):
+        self.previous = read_research_cache_stats()
+
+    def __call__(self) -> dict[str, dict[str, int]]:
+        current = read_research_cache_stats()
+        deltas = {}
+        for tool, counters in current.items():
+            before = self.previous.get(tool, {})
+            delta = {key: value - before.get(key, 0) for key, value in counters.items()}
+            if any(delta.values()):
+                deltas[tool] = delta
+        self.previous = current
+        for tool, delta in deltas.items():
+            print(f"Research cache {tool}: {format_hit_rate(delta)}")
+        return deltas
+
+
+def format_hit_rate(counters: dict[str, int]) -> str:
+    calls = counters["hits"] + counters["misses"] + counters["coalesced"]
+    served = counters["hits"] + counters["coalesced"]
+    hit_rate = served / calls if calls else 0.0
+    return (
+        f"{calls} calls, {hit_rate:.0%} served without an upstream call "
+        f"({counters['hits']} hits, {counters['coalesced']} coalesced), {counters['upstream_calls']} upstream calls"
+    )
+
+
+if __name__ == "__main__":
+    for tool, counters in read_research_cache_stats().items():
+        print(f"{tool:>20}: {format_hit_rate(counters)}")
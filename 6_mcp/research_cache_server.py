@@ -0,0 +1,68 @@
+"""
+An MCP server that sits in front of the researcher's fetch and search servers and caches their results.
+
+It starts the upstream servers in research_upstream_params, offers their tools under the same names and
+schemas, and answers each call through the shared ResearchCache, so traders researching the same
+headlines in the same cycle make one upstream call between them.
+"""
+
+import asyncio
+import sys
+from contextlib import AsyncExitStack
+import mcp.types as types
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.server.lowlevel import Server
+from mcp.server.stdio import stdio_server
+from mcp_params import research_upstream_params
+from research_cache import ResearchCache
+
+server = Server("research_cache_server")
+cache = ResearchCache()
+upstream: dict[str, tuple[types.Tool, ClientSession]] = {}
+
+
+class UpstreamToolError(Exception):
+    pass
+
+
+@server.list_tools()
+async def list_tools() -> list[types.Tool]:
+    return [tool for tool, _ in upstream.values()]
+
+
+@server.call_tool()
+async def call_tool(name: str, arguments: dict) -> list:
+    if name not in upstream:
+        raise ValueError(f"Unknown tool {name}")
+    _, session = upstream[name]
+
+    async def call() -> str:
+        result = await session.call_tool(name, arguments)
+        if result.isError:
+            # Raised rather than returned, so that failures are not cached
+            raise UpstreamToolError(" ".join(c.text for c in result.content if isinstance(c, types.TextContent)))
+        return result.model_dump_json()
+
+    result = types.CallToolResult.model_validate_json(await cache.call(name, arguments, call))
+    return result.content
+
+
+async def main():
+    async with AsyncExitStack() as stack:
+        for params in research_upstream_params:
+            try:
+                streams = await stack.enter_async_context(stdio_client(StdioServerParameters(**params)))
+                session = await stack.enter_async_context(ClientSession(*streams))
+                await session.initialize()
+                for tool in (await session.list_tools()).tools:
+                    upstream[tool.name] = (tool, session)
+            except Exception as e:
+                # stdout carries the protocol, so report on stderr and carry on with the other servers
+                print(f"Research cache could not start {params['command']} {' '.join(params['args'])}: {e}", file=sys.stderr)
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, server.create_initialization_options())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+import asyncio
+import random
+import time
+from typing import Callable
+from traders import Trader
+from mcp_pool import MCPServerPool
+from database import write_log
+
+
+class TradingScheduler:
+    """
+    Runs every trader once per tick, on a fixed-rate clock.
+
+    Ticks are anchored to the start time rather than to the end of the previous cycle, so run time
+    never pushes the schedule back; ticks missed while the process was busy are skipped, not replayed.
+    Each tick, traders start staggered across stagger_seconds with random jitter, at most
+    max_concurrency run at once, and a run that goes past its deadline is cancelled.
+    A trader whose previous run is still going is skipped for that tick, so one slow trader
+    never delays the others. on_tick, if given, is called at the start of every tick, before any trader starts.
+    """
+
+    def __init__(
+        self,
+        traders: list[Trader],
+        interval_seconds: float,
+        max_concurrency: int,
+        deadline_seconds: float,
+        stagger_seconds: float,
+        should_run: Callable[[], bool] = lambda: True,
+        pool: MCPServerPool | None = None,
+        on_tick: Callable[[], None] | None = None,
+    ):
+        self.traders = traders
+        self.interval_seconds = interval_seconds
+        self.deadline_seconds = deadline_seconds
+        self.stagger_seconds = stagger_seconds
+        self.should_run = should_run
+        self.pool = pool
+        self.on_tick = on_tick
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.running: dict[str, asyncio.Task] = {}
+        self.counts = {"started": 0, "completed": 0, "timed_out": 0, "skipped": 0, "missed_ticks": 0}
+
+    async def run_forever(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        try:
+            while True:
+                if self.should_run():
+                    self.tick()
+                else:
+                    print("Market is closed, skipping run")
+                next_tick += self.interval_seconds
+                now = loop.time()
+                if now > next_tick:
+                    missed = int((now - next_tick) // self.interval_seconds) + 1
+                    self.counts["missed_ticks"] += missed
+                    next_tick += missed * self.interval_seconds
+                await asyncio.sleep(next_tick - now)
+        finally:
+            await self.cancel_all()
+
+    def tick(self) -> None:
+        if self.on_tick:
+            self.on_tick()
+        spacing = self.stagger_seconds / len(self.traders) if self.traders else 0
+        for index, trader in enumerate(self.traders):
+            previous = self.running.get(trader.name)
+            if previous and not previous.done():
+                self.counts["skipped"] += 1
+                write_log(trader.name, "schedule", "Skipping this run because the previous one is still going")
+                continue
+            delay = index * spacing + random.uniform(0, spacing)
+            self.running[trader.name] = asyncio.create_task(self.run_trader(trader, delay))
+        print(f"Tick: {self.stats()}")
+
+    async def run_trader(self, trader: Trader, delay: float) -> None:
+        await asyncio.sleep(delay)
+        async with self.semaphore:
+            self.counts["started"] += 1
+            start = time.perf_counter()
+            try:
+                async with asyncio.timeout(self.deadline_seconds):
+                    await trader.run(self.pool)
+                self.counts["completed"] += 1
+            except TimeoutError:
+                self.counts["timed_out"] += 1
+                elapsed = time.perf_counter() - start
+                write_log(trader.name, "schedule", f"Cancelled the run after {elapsed:.0f}s, past its deadline")
+
+    async def cancel_all(self) -> None:
+        tasks = [task for task in self.running.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        active = sum(1 for task in self.running.values() if not task.done())
+        return {"active": active, **self.counts}
@@ -58,8 +58,9 @@ You do not need to rebalance your portfolio; you will be asked to do so later.
 Just make trades based on your strategy as needed.
 Your investment strategy:
 {strategy}
-Here is your current account:
+Here is your current account, with your most recent transactions:
 {account}
+If you need to look further back, use the get_transactions tool with older_transactions_before.
 Here is the current datetime:
 {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 Now, carry out analysis, make your decision and execute trades. Your account name is {name}.
@@ -77,8 +78,9 @@ Just rebalance your portfolio based on your strategy as needed.
 Your investment strategy:
 {strategy}
 You also have a tool to change your strategy if you wish; you can decide at any time that you would like to evolve or even switch your strategy.
-Here is your current account:
+Here is your current account, with your most recent transactions:
 {account}
+If you need to look further back, use the get_transactions tool with older_transactions_before.
 Here is the current datetime:
 {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 Now, carry out analysis, make your decision and execute trades. Your account name is {name}.
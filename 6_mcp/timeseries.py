@@ -0,0 +1,62 @@
+import os
+import numpy as np
+from dotenv import load_dotenv
+from database import read_portfolio_values, read_portfolio_value_rollups, count_portfolio_points
+
+load_dotenv(override=True)
+
+CHART_POINTS = int(os.getenv("CHART_POINTS", "500"))
+# Finest first: the chart reads the finest resolution with at most this many points per chart point
+RESOLUTIONS = ["raw", "1m", "1h", "1d"]
+POINTS_PER_CHART_POINT = 8
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-triangle-three-buckets downsampling: choose threshold of the points that best keep the shape
+    of the line. The first and last points are always kept; the rest are split into threshold - 2 buckets,
+    and from each bucket the point forming the largest triangle with the point kept from the previous
+    bucket and the average of the next bucket is kept. Returns the indices of the kept points.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    bounds = np.arange(threshold - 1) * (n - 2) // (threshold - 2) + 1
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = bounds[i], bounds[i + 1]
+        next_end = bounds[i + 2] if i + 2 < len(bounds) else n
+        average_x, average_y = x[end:next_end].mean(), y[end:next_end].mean()
+        areas = np.abs((x[a] - average_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (average_y - y[a]))
+        a = start + int(np.argmax(areas))
+        kept[i + 1] = a
+    return kept
+
+
+def downsample(series: list[tuple[str, float]], points: int) -> list[tuple[str, float]]:
+    if len(series) <= points:
+        return series
+    x = np.array([when for when, _ in series], dtype="datetime64[s]").astype(np.float64)
+    y = np.fromiter((value for _, value in series), dtype=np.float64, count=len(series))
+    return [series[i] for i in lttb(x, y, points)]
+
+
+def load_portfolio_series(name: str, points: int = CHART_POINTS) -> list[tuple[str, float]]:
+    """
+    The portfolio value history of an account as at most points (datetime, value) pairs.
+    Reads the raw values while there are few of them, and the finest rollup that is small enough after that,
+    so the work is bounded by points however long the simulation has been running.
+    """
+    limit = points * POINTS_PER_CHART_POINT
+    for resolution in RESOLUTIONS[:-1]:
+        if count_portfolio_points(name, resolution, limit + 1) <= limit:
+            break
+    else:
+        resolution = RESOLUTIONS[-1]
+    if resolution == "raw":
+        series = read_portfolio_values(name)
+    else:
+        series = read_portfolio_value_rollups(name, resolution)
+    return downsample(series, points)
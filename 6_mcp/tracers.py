@@ -1,5 +1,5 @@
 from agents import TracingProcessor, Trace, Span
-from database import write_log
+from log_writer import LOG_FLUSH_TIMEOUT, LogWriter
 import secrets
 import string
 
@@ -15,25 +15,37 @@ def make_trace_id(tag: str) -> str:
     random_suffix = ''.join(secrets.choice(ALPHANUM) for _ in range(pad_len))
     return f"trace_{tag}{random_suffix}"
 
+def trader_name(trace_or_span: Trace | Span) -> str | None:
+    """The trader tag that make_trace_id put in the trace id, or None for traces not made by a trader"""
+    trace_id = trace_or_span.trace_id
+    name = trace_id.split("_")[1]
+    if '0' in name:
+        return name.split("0")[0]
+    else:
+        return None
+
 class LogTracer(TracingProcessor):
 
+    def __init__(self, flush_interval: float | None = None, batch_size: int | None = None):
+        options = {}
+        if flush_interval is not None:
+            options["flush_interval"] = flush_interval
+        if batch_size is not None:
+            options["batch_size"] = batch_size
+        self.writer = LogWriter(**options)
+
     def get_name(self, trace_or_span: Trace | Span) -> str | None:
-        trace_id = trace_or_span.trace_id
-        name = trace_id.split("_")[1]
-        if '0' in name:
-            return name.split("0")[0]
-        else:
-            return None
+        return trader_name(trace_or_span)
 
     def on_trace_start(self, trace) -> None:
         name = self.get_name(trace)
         if name:
-            write_log(name, "trace", f"Started: {trace.name}")
+            self.writer.write(name, "trace", f"Started: {trace.name}")
 
     def on_trace_end(self, trace) -> None:
         name = self.get_name(trace)
         if name:
-            write_log(name, "trace", f"Ended: {trace.name}")
+            self.writer.write(name, "trace", f"Ended: {trace.name}")
 
     def on_span_start(self, span) -> None:
         name = self.get_name(span)
@@ -49,7 +61,7 @@ class LogTracer(TracingProcessor):
                     message += f" {span.span_data.server}"
             if span.error:
                 message += f" {span.error}"
-            write_log(name, type, message)
+            self.writer.write(name, type, message)
 
     def on_span_end(self, span) -> None:
         name = self.get_name(span)
@@ -66,10 +78,11 @@ class LogTracer(TracingProcessor):
                     message += f" {span.span_data.server}"
             if span.error:
                 message += f" {span.error}"
-            write_log(name, type, message)
+            self.writer.write(name, type, message)
 
     def force_flush(self) -> None:
-        pass
+        if not self.writer.flush(LOG_FLUSH_TIMEOUT):
+            print(f"Log rows were still being written after {LOG_FLUSH_TIMEOUT}s")
 
     def shutdown(self) -> None:
-        pass
\ No newline at end of file
+        self.writer.close()
@@ -1,12 +1,13 @@
 from contextlib import AsyncExitStack
-from accounts_client import read_accounts_resource, read_strategy_resource
+from accounts_client import read_account_summary_resource, read_strategy_resource
 from tracers import make_trace_id
-from agents import Agent, Tool, Runner, OpenAIChatCompletionsModel, trace
-from openai import AsyncOpenAI
+from agents import Agent, Tool, Runner, OpenAIChatCompletionsModel, OpenAIResponsesModel, trace
 from dotenv import load_dotenv
 import os
-import json
+import time
 from agents.mcp import MCPServerStdio
+from mcp_pool import MCPServerPool
+from database import write_log
 from templates import (
     researcher_instructions,
     trader_instructions,
@@ -14,6 +15,7 @@ from templates import (
     rebalance_message,
     research_tool,
 )
+from rate_limits import rate_limited_client, with_priority
 from mcp_params import trader_mcp_server_params, researcher_mcp_server_params
 
 load_dotenv(override=True)
@@ -30,30 +32,33 @@ OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 
 MAX_TURNS = 30
 
-openrouter_client = AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=openrouter_api_key)
-deepseek_client = AsyncOpenAI(base_url=DEEPSEEK_BASE_URL, api_key=deepseek_api_key)
-grok_client = AsyncOpenAI(base_url=GROK_BASE_URL, api_key=grok_api_key)
-gemini_client = AsyncOpenAI(base_url=GEMINI_BASE_URL, api_key=google_api_key)
+# Every client queues its requests through rate_limits, per provider, so concurrent traders don't trip 429s
+openai_client = rate_limited_client("openai")
+openrouter_client = rate_limited_client("openrouter", base_url=OPENROUTER_BASE_URL, api_key=openrouter_api_key)
+deepseek_client = rate_limited_client("deepseek", base_url=DEEPSEEK_BASE_URL, api_key=deepseek_api_key)
+grok_client = rate_limited_client("grok", base_url=GROK_BASE_URL, api_key=grok_api_key)
+gemini_client = rate_limited_client("gemini", base_url=GEMINI_BASE_URL, api_key=google_api_key)
 
 
-def get_model(model_name: str):
+def get_model(model_name: str, role: str = "trader"):
+    """The model for model_name, whose requests are queued at role's priority, trader or researcher"""
     if "/" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=openrouter_client)
+        return OpenAIChatCompletionsModel(model=model_name, openai_client=with_priority(openrouter_client, role))
     elif "deepseek" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=deepseek_client)
+        return OpenAIChatCompletionsModel(model=model_name, openai_client=with_priority(deepseek_client, role))
     elif "grok" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=grok_client)
+        return OpenAIChatCompletionsModel(model=model_name, openai_client=with_priority(grok_client, role))
     elif "gemini" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=gemini_client)
+        return OpenAIChatCompletionsModel(model=model_name, openai_client=with_priority(gemini_client, role))
     else:
-        return model_name
+        return OpenAIResponsesModel(model=model_name, openai_client=with_priority(openai_client, role))
 
 
 async def get_researcher(mcp_servers, model_name) -> Agent:
     researcher = Agent(
         name="Researcher",
         instructions=researcher_instructions(),
-        model=get_model(model_name),
+        model=get_model(model_name, role="researcher"),
         mcp_servers=mcp_servers,
     )
     return researcher
@@ -71,6 +76,8 @@ class Trader:
         self.agent = None
         self.model_name = model_name
         self.do_trade = True
+        self.last_run_seconds = None
+        self.servers_ready_seconds = None
 
     async def create_agent(self, trader_mcp_servers, researcher_mcp_servers) -> Agent:
         tool = await get_researcher_tool(researcher_mcp_servers, self.model_name)
@@ -84,10 +91,7 @@ class Trader:
         return self.agent
 
     async def get_account_report(self) -> str:
-        account = await read_accounts_resource(self.name)
-        account_json = json.loads(account)
-        account_json.pop("portfolio_value_time_series", None)
-        return json.dumps(account_json)
+        return await read_account_summary_resource(self.name)
 
     async def run_agent(self, trader_mcp_servers, researcher_mcp_servers):
         self.agent = await self.create_agent(trader_mcp_servers, researcher_mcp_servers)
@@ -100,7 +104,15 @@ class Trader:
         )
         await Runner.run(self.agent, message, max_turns=MAX_TURNS)
 
+    async def run_with_pooled_mcp_servers(self, pool: MCPServerPool):
+        start = time.perf_counter()
+        trader_mcp_servers = await pool.get_all(trader_mcp_server_params)
+        researcher_mcp_servers = await pool.get_all(researcher_mcp_server_params(self.name))
+        self.servers_ready_seconds = time.perf_counter() - start
+        await self.run_agent(trader_mcp_servers, researcher_mcp_servers)
+
     async def run_with_mcp_servers(self):
+        start = time.perf_counter()
         async with AsyncExitStack() as stack:
             trader_mcp_servers = [
                 await stack.enter_async_context(
@@ -115,17 +127,27 @@ class Trader:
                     )
                     for params in researcher_mcp_server_params(self.name)
                 ]
+                self.servers_ready_seconds = time.perf_counter() - start
                 await self.run_agent(trader_mcp_servers, researcher_mcp_servers)
 
-    async def run_with_trace(self):
+    async def run_with_trace(self, pool: MCPServerPool | None = None):
         trace_name = f"{self.name}-trading" if self.do_trade else f"{self.name}-rebalancing"
         trace_id = make_trace_id(f"{self.name.lower()}")
         with trace(trace_name, trace_id=trace_id):
-            await self.run_with_mcp_servers()
-
-    async def run(self):
+            if pool:
+                await self.run_with_pooled_mcp_servers(pool)
+            else:
+                await self.run_with_mcp_servers()
+
+    async def run(self, pool: MCPServerPool | None = None):
+        self.servers_ready_seconds = None
+        start = time.perf_counter()
         try:
-            await self.run_with_trace()
+            await self.run_with_trace(pool)
         except Exception as e:
             print(f"Error running trader {self.name}: {e}")
+        self.last_run_seconds = time.perf_counter() - start
+        servers = "pooled" if pool else "spawned"
+        ready = f"{self.servers_ready_seconds:.1f}s" if self.servers_ready_seconds is not None else "n/a"
+        write_log(self.name, "timing", f"Run took {self.last_run_seconds:.1f}s; {servers} MCP servers ready in {ready}")
         self.do_trade = not self.do_trade
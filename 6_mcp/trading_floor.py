@@ -1,9 +1,16 @@
 from traders import Trader
 from typing import List
 import asyncio
+import json
 from tracers import LogTracer
 from agents import add_trace_processor
 from market import is_market_open
+from mcp_pool import MCPServerPool
+from scheduler import TradingScheduler
+from accounts_client import accounts_client
+from log_retention import run_log_retention_forever
+from research_cache import ResearchCacheReport
+from metrics import MetricsProcessor, start_metrics_server
 from dotenv import load_dotenv
 import os
 
@@ -14,21 +21,51 @@ RUN_EVEN_WHEN_MARKET_IS_CLOSED = (
     os.getenv("RUN_EVEN_WHEN_MARKET_IS_CLOSED", "false").strip().lower() == "true"
 )
 USE_MANY_MODELS = os.getenv("USE_MANY_MODELS", "false").strip().lower() == "true"
+USE_MCP_POOL = os.getenv("USE_MCP_POOL", "true").strip().lower() == "true"
 
-names = ["Warren", "George", "Ray", "Cathie"]
-lastnames = ["Patience", "Bold", "Systematic", "Crypto"]
+DEFAULT_MODEL_NAME, DEFAULT_SHORT_MODEL_NAME = "gpt-4o-mini", "GPT 4o mini"
+TRADERS_CONFIG = os.getenv("TRADERS_CONFIG", "traders.json")
+MAX_CONCURRENT_TRADERS = int(os.getenv("MAX_CONCURRENT_TRADERS", "4"))
+TRADER_DEADLINE_MINUTES = float(os.getenv("TRADER_DEADLINE_MINUTES", str(RUN_EVERY_N_MINUTES)))
+TRADER_STAGGER_SECONDS = float(os.getenv("TRADER_STAGGER_SECONDS", "30"))
+
+default_traders = [
+    {"name": "Warren", "lastname": "Patience"},
+    {"name": "George", "lastname": "Bold"},
+    {"name": "Ray", "lastname": "Systematic"},
+    {"name": "Cathie", "lastname": "Crypto"},
+]
 
 if USE_MANY_MODELS:
-    model_names = [
-        "gpt-4.1-mini",
-        "deepseek-chat",
-        "gemini-2.5-flash-preview-04-17",
-        "grok-3-mini-beta",
-    ]
-    short_model_names = ["GPT 4.1 Mini", "DeepSeek V3", "Gemini 2.5 Flash", "Grok 3 Mini"]
-else:
-    model_names = ["gpt-4o-mini"] * 4
-    short_model_names = ["GPT 4o mini"] * 4
+    for trader, model_name, short_model_name in zip(
+        default_traders,
+        ["gpt-4.1-mini", "deepseek-chat", "gemini-2.5-flash-preview-04-17", "grok-3-mini-beta"],
+        ["GPT 4.1 Mini", "DeepSeek V3", "Gemini 2.5 Flash", "Grok 3 Mini"],
+    ):
+        trader.update(model_name=model_name, short_model_name=short_model_name)
+
+
+def load_trader_configs(path: str = TRADERS_CONFIG) -> list[dict]:
+    """
+    Read the traders from a JSON list of {"name", "lastname", "model_name", "short_model_name"},
+    falling back to the four default traders when the file does not exist.
+    """
+    if os.path.exists(path):
+        with open(path) as f:
+            configs = json.load(f)
+    else:
+        configs = default_traders
+    for config in configs:
+        model_name = config.setdefault("model_name", DEFAULT_MODEL_NAME)
+        config.setdefault("short_model_name", DEFAULT_SHORT_MODEL_NAME if model_name == DEFAULT_MODEL_NAME else model_name)
+    return configs
+
+
+trader_configs = load_trader_configs()
+names = [config["name"] for config in trader_configs]
+lastnames = [config["lastname"] for config in trader_configs]
+model_names = [config["model_name"] for config in trader_configs]
+short_model_names = [config["short_model_name"] for config in trader_configs]
 
 
 def create_traders() -> List[Trader]:
@@ -40,15 +77,31 @@ def create_traders() -> List[Trader]:
 
 async def run_every_n_minutes():
     add_trace_processor(LogTracer())
+    metrics = MetricsProcessor()
+    add_trace_processor(metrics)
+    start_metrics_server(metrics)
     traders = create_traders()
-    while True:
-        if RUN_EVEN_WHEN_MARKET_IS_CLOSED or is_market_open():
-            await asyncio.gather(*[trader.run() for trader in traders])
-        else:
-            print("Market is closed, skipping run")
-        await asyncio.sleep(RUN_EVERY_N_MINUTES * 60)
+    pool = MCPServerPool() if USE_MCP_POOL else None
+    scheduler = TradingScheduler(
+        traders,
+        interval_seconds=RUN_EVERY_N_MINUTES * 60,
+        max_concurrency=MAX_CONCURRENT_TRADERS,
+        deadline_seconds=TRADER_DEADLINE_MINUTES * 60,
+        stagger_seconds=TRADER_STAGGER_SECONDS,
+        should_run=lambda: RUN_EVEN_WHEN_MARKET_IS_CLOSED or is_market_open(),
+        pool=pool,
+        on_tick=ResearchCacheReport(),
+    )
+    retention = asyncio.create_task(run_log_retention_forever())
+    try:
+        await scheduler.run_forever()
+    finally:
+        retention.cancel()
+        await accounts_client.close()
+        if pool:
+            await pool.close()
 
 
 if __name__ == "__main__":
-    print(f"Starting scheduler to run every {RUN_EVERY_N_MINUTES} minutes")
+    print(f"Starting scheduler to run {len(names)} traders every {RUN_EVERY_N_MINUTES} minutes, {MAX_CONCURRENT_TRADERS} at a time")
     asyncio.run(run_every_n_minutes())
@@ -0,0 +1,191 @@
+import numpy as np
+from pydantic import BaseModel
+
+
+class PortfolioValuation(BaseModel):
+    cash: float
+    holdings_value: float
+    portfolio_value: float
+    cost_basis: float
+    unrealized_profit_loss: float
+    profit_loss: float
+
+
+def apply_trade(quantity_held: int, cost_held: float, quantity: int, price: float) -> tuple[int, float]:
+    """
+    Return the new (quantity, cost basis) of a holding after trading quantity shares at price.
+    Buys (positive quantity) add their full cost; sells (negative quantity) remove cost at the
+    average cost per share, so the cost basis of the shares still held is unchanged.
+    """
+    if quantity >= 0:
+        return quantity_held + quantity, cost_held + quantity * price
+    remaining = quantity_held + quantity
+    if remaining <= 0:
+        return 0, 0.0
+    return remaining, cost_held * remaining / quantity_held
+
+
+def replay_trades(transactions: list[dict]) -> tuple[float, dict[str, tuple[int, float]]]:
+    """
+    Rebuild the running totals from a full transaction history, oldest first.
+    Returns (net_spend, {symbol: (quantity, cost_basis)}), where net_spend is the sum of
+    quantity * price over every transaction: the net cash that went into shares.
+    """
+    net_spend = 0.0
+    positions = {}
+    for transaction in transactions:
+        symbol, quantity, price = transaction["symbol"], transaction["quantity"], transaction["price"]
+        net_spend += quantity * price
+        positions[symbol] = apply_trade(*positions.get(symbol, (0, 0.0)), quantity, price)
+    return net_spend, {symbol: position for symbol, position in positions.items() if position[0]}
+
+
+def value_portfolio(
+    balance: float,
+    net_spend: float,
+    holdings: dict[str, int],
+    cost_basis: dict[str, float],
+    prices: dict[str, float],
+) -> PortfolioValuation:
+    """
+    Value every holding in one vectorized pass over a snapshot of prices.
+    Profit and loss comes from the running net_spend rather than from summing the transactions:
+    portfolio value - net spend on shares - cash gives the same figure.
+    """
+    symbols = list(holdings)
+    count = len(symbols)
+    quantities = np.fromiter((holdings[symbol] for symbol in symbols), dtype=np.float64, count=count)
+    price_array = np.fromiter((prices.get(symbol, 0.0) for symbol in symbols), dtype=np.float64, count=count)
+    costs = np.fromiter((cost_basis.get(symbol, 0.0) for symbol in symbols), dtype=np.float64, count=count)
+    holdings_value = float(quantities @ price_array)
+    total_cost = float(costs.sum())
+    portfolio_value = balance + holdings_value
+    return PortfolioValuation(
+        cash=balance,
+        holdings_value=holdings_value,
+        portfolio_value=portfolio_value,
+        cost_basis=total_cost,
+        unrealized_profit_loss=holdings_value - total_cost,
+        profit_loss=portfolio_value - net_spend - balance,
+    )
+
+
+SYMBOLS = ["AAPL", "MSFT", "NVDA", "TSLA", "AMZN", "GOOG", "META", "SPY"]
+
+
+def original_portfolio_value(balance: float, holdings: dict[str, int], prices: dict[str, float]) -> float:
+    """The per-call calculation this module replaced: cash plus every holding at its price"""
+    total_value = balance
+    for symbol, quantity in holdings.items():
+        total_value += prices[symbol] * quantity
+    return total_value
+
+
+def original_profit_loss(portfolio_value: float, transactions: list[dict], balance: float) -> float:
+    """The per-call calculation this module replaced: a sum over the whole transaction history"""
+    initial_spend = sum(t["quantity"] * t["price"] for t in transactions)
+    return portfolio_value - initial_spend - balance
+
+
+def check_random_histories(cases: int = 2_000, seed: int = 0) -> None:
+    """
+    Generate random trade histories and price snapshots under the accounts.py trading rules, and check
+    the running totals and valuation against a replay and the original per-call calculations
+    """
+    import math
+    import random
+    from accounts import INITIAL_BALANCE, SPREAD
+
+    rng = random.Random(seed)
+    for case in range(cases):
+        balance, holdings, transactions = INITIAL_BALANCE, {}, []
+        net_spend, cost_basis = 0.0, {}
+        for _ in range(rng.randint(0, 60)):
+            symbol = rng.choice(SYMBOLS)
+            price = rng.uniform(0.5, 900)
+            if rng.random() < 0.6:
+                quantity = rng.randint(1, 20)
+                trade_price = price * (1 + SPREAD)
+                if trade_price * quantity > balance:
+                    continue
+            else:
+                if not holdings.get(symbol):
+                    continue
+                quantity = -rng.randint(1, holdings[symbol])
+                trade_price = price * (1 - SPREAD)
+            balance -= trade_price * quantity
+            transactions.append({"symbol": symbol, "quantity": quantity, "price": trade_price})
+            held, cost = apply_trade(holdings.get(symbol, 0), cost_basis.get(symbol, 0.0), quantity, trade_price)
+            holdings[symbol], cost_basis[symbol] = held, cost
+            if not held:
+                del holdings[symbol], cost_basis[symbol]
+            net_spend += quantity * trade_price
+
+        replayed_spend, replayed_positions = replay_trades(transactions)
+        assert replayed_spend == net_spend, case
+        assert replayed_positions == {s: (holdings[s], cost_basis[s]) for s in holdings}, case
+
+        prices = {symbol: rng.uniform(0.5, 900) for symbol in SYMBOLS}
+        valuation = value_portfolio(balance, net_spend, holdings, cost_basis, prices)
+        expected_value = original_portfolio_value(balance, holdings, prices)
+        expected_pnl = original_profit_loss(expected_value, transactions, balance)
+        assert math.isclose(valuation.portfolio_value, expected_value, rel_tol=1e-12, abs_tol=1e-6), case
+        assert math.isclose(valuation.profit_loss, expected_pnl, rel_tol=1e-12, abs_tol=1e-6), case
+    print(f"{cases} random trade histories: incremental valuation matches the original calculations")
+
+
+def check_accounts(cases: int = 50, seed: int = 0) -> None:
+    """
+    Trade random histories through Account.buy_shares and sell_shares against the accounts.db in the
+    working directory, then check Account.valuation(), both on the account that traded and on one read
+    back from the database, against the original calculations over its stored transactions
+    """
+    import math
+    import random
+    import accounts
+    from accounts import Account, INITIAL_BALANCE
+    from database import read_positions, read_transactions
+
+    rng = random.Random(seed)
+    market = {}
+    # Trades fill at whatever price the market is showing, which the loop below sets before each one
+    accounts.get_share_price = lambda symbol: market[symbol]
+    accounts.get_share_prices = lambda symbols: {symbol: market[symbol] for symbol in symbols}
+    for case in range(cases):
+        account = Account.get(f"valuation_check_{seed}_{case}")
+        account.reset("")
+        for _ in range(rng.randint(0, 40)):
+            symbol = rng.choice(SYMBOLS)
+            market[symbol] = rng.uniform(0.5, 900)
+            try:
+                if rng.random() < 0.6:
+                    account.buy_shares(symbol, rng.randint(1, 20), "Valuation check")
+                elif account.holdings.get(symbol):
+                    account.sell_shares(symbol, rng.randint(1, account.holdings[symbol]), "Valuation check")
+            except ValueError:
+                pass  # Not enough cash, as a trader would be told
+
+        transactions = read_transactions(account.name)
+        assert math.isclose(account.balance, original_profit_loss(INITIAL_BALANCE, transactions, 0.0), abs_tol=1e-6), case
+        replayed_spend, replayed_positions = replay_trades(transactions)
+        assert read_positions(account.name).keys() == replayed_positions.keys(), case
+
+        prices = {symbol: rng.uniform(0.5, 900) for symbol in SYMBOLS}
+        expected_value = original_portfolio_value(account.balance, account.holdings, prices)
+        expected_pnl = original_profit_loss(expected_value, transactions, account.balance)
+        for valuation in (account.valuation(prices), Account.get(account.name).valuation(prices)):
+            assert math.isclose(valuation.portfolio_value, expected_value, rel_tol=1e-12, abs_tol=1e-6), case
+            assert math.isclose(valuation.profit_loss, expected_pnl, rel_tol=1e-12, abs_tol=1e-6), case
+            assert math.isclose(valuation.profit_loss, expected_value - replayed_spend - account.balance, abs_tol=1e-6), case
+        assert Account.get(account.name).holdings == {s: q for s, (q, _) in replayed_positions.items()}, case
+    print(f"{cases} accounts traded through Account: valuation matches the stored transactions")
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    # The database module opens accounts.db in the working directory on import, so move to a scratch one first
+    os.chdir(tempfile.mkdtemp(prefix="valuation_check_"))
+    check_random_histories()
+    check_accounts()
@@ -1,15 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import timedelta
 
-from ..config.database import get_db
-from ..services.auth import AuthService
+from ..config.database import get_async_db, get_db
+from ..services.auth import AsyncAuthService, AuthService
 from ..schemas.user import UserCreate, UserResponse, UserLogin, Token, UserUpdate
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 security = HTTPBearer()
 
+# Registration and login hash and check passwords with bcrypt, which is CPU-bound, so they stay sync
+# handlers in the threadpool. The token routes only look the user up and are async.
+
 @router.post("/register", response_model=UserResponse)
 def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """Register a new user"""
@@ -60,12 +64,12 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     }
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get current user profile"""
-    user = AuthService.get_current_user(db, credentials.credentials)
+    user = await AsyncAuthService.get_current_user(db, credentials.credentials)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -76,13 +80,13 @@ def get_current_user(
     return user.to_dict()
 
 @router.put("/me", response_model=UserResponse)
-def update_profile(
+async def update_profile(
     user_update: UserUpdate,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update current user profile"""
-    user = AuthService.get_current_user(db, credentials.credentials)
+    user = await AsyncAuthService.get_current_user(db, credentials.credentials)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -91,7 +95,7 @@ def update_profile(
         )
     
     try:
-        updated_user = AuthService.update_user_profile(
+        updated_user = await AsyncAuthService.update_user_profile(
             db, 
             user.id, 
             user_update.dict(exclude_unset=True)
@@ -106,12 +110,12 @@ def update_profile(
         )
 
 @router.post("/refresh")
-def refresh_token(
+async def refresh_token(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Refresh access token"""
-    user = AuthService.get_current_user(db, credentials.credentials)
+    user = await AsyncAuthService.get_current_user(db, credentials.credentials)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
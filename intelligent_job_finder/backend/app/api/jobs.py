@@ -1,18 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 
-from ..config.database import get_db
-from ..services.auth import AuthService
-from ..services.job_service import JobService
-from ..schemas.job import JobCreate, JobResponse, JobSearch, JobSearchResponse, JobUpdate
+from ..config.database import get_async_db, get_db
+from ..services.auth import AsyncAuthService, AuthService
+from ..services.job_ingest import JobIngest
+from ..services.job_service import AsyncJobService, InvalidCursor
+from ..services.search_cache import search_cache
+from ..schemas.job import (
+    BulkIngestResponse, JobCreate, JobResponse, JobSearch, JobSearchResponse, JobUpdate
+)
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 security = HTTPBearer()
 
+# Handlers take an AsyncSession from get_async_db and call AsyncJobService, so a request waiting on the
+# database holds no threadpool worker. Handlers still on get_db and the sync services run alongside them.
+
 @router.get("/", response_model=JobSearchResponse)
-def search_jobs(
+async def search_jobs(
     keywords: Optional[str] = Query(None, description="Search keywords"),
     location: Optional[str] = Query(None, description="Job location"),
     company: Optional[str] = Query(None, description="Company name"),
@@ -25,7 +34,9 @@ def search_jobs(
     sources: Optional[str] = Query(None, description="Job sources (comma-separated)"),
     limit: int = Query(20, ge=1, le=100, description="Number of results"),
     offset: int = Query(0, ge=0, description="Offset for pagination"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; replaces offset"),
+    include_total: Optional[bool] = Query(None, description="Count the matches, up to 10,000; by default only on the first page"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Search jobs with various filters"""
     # Parse comma-separated strings
@@ -44,17 +55,26 @@ def search_jobs(
         skills=skills_list,
         sources=sources_list,
         limit=limit,
-        offset=offset
+        offset=offset,
+        cursor=cursor,
+        include_total=include_total
     )
     
     try:
-        result = JobService.search_jobs(db, search_params)
+        result = await AsyncJobService.search_jobs(db, search_params)
         return JobSearchResponse(
             jobs=[job.to_dict() for job in result["jobs"]],
             total=result["total"],
+            total_exact=result["total_exact"],
             limit=result["limit"],
             offset=result["offset"],
-            has_more=result["has_more"]
+            has_more=result["has_more"],
+            next_cursor=result["next_cursor"]
+        )
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
     except Exception as e:
         raise HTTPException(
@@ -63,9 +83,9 @@ def search_jobs(
         )
 
 @router.get("/{job_id}", response_model=JobResponse)
-def get_job(job_id: int, db: Session = Depends(get_db)):
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific job by ID"""
-    job = JobService.get_job(db, job_id)
+    job = await AsyncJobService.get_job(db, job_id)
     if not job:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -75,13 +95,13 @@ def get_job(job_id: int, db: Session = Depends(get_db)):
     return job.to_dict()
 
 @router.get("/recent/", response_model=List[JobResponse])
-def get_recent_jobs(
+async def get_recent_jobs(
     days: int = Query(7, ge=1, le=30, description="Number of days"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get recently posted jobs"""
     try:
-        jobs = JobService.get_recent_jobs(db, days)
+        jobs = await AsyncJobService.get_recent_jobs(db, days)
         return [job.to_dict() for job in jobs]
     except Exception as e:
         raise HTTPException(
@@ -90,10 +110,10 @@ def get_recent_jobs(
         )
 
 @router.get("/company/{company}", response_model=List[JobResponse])
-def get_jobs_by_company(company: str, db: Session = Depends(get_db)):
+async def get_jobs_by_company(company: str, db: AsyncSession = Depends(get_async_db)):
     """Get all jobs from a specific company"""
     try:
-        jobs = JobService.get_jobs_by_company(db, company)
+        jobs = await AsyncJobService.get_jobs_by_company(db, company)
         return [job.to_dict() for job in jobs]
     except Exception as e:
         raise HTTPException(
@@ -102,10 +122,10 @@ def get_jobs_by_company(company: str, db: Session = Depends(get_db)):
         )
 
 @router.get("/location/{location}", response_model=List[JobResponse])
-def get_jobs_by_location(location: str, db: Session = Depends(get_db)):
+async def get_jobs_by_location(location: str, db: AsyncSession = Depends(get_async_db)):
     """Get jobs in a specific location"""
     try:
-        jobs = JobService.get_jobs_by_location(db, location)
+        jobs = await AsyncJobService.get_jobs_by_location(db, location)
         return [job.to_dict() for job in jobs]
     except Exception as e:
         raise HTTPException(
@@ -114,10 +134,10 @@ def get_jobs_by_location(location: str, db: Session = Depends(get_db)):
         )
 
 @router.get("/remote/", response_model=List[JobResponse])
-def get_remote_jobs(db: Session = Depends(get_db)):
+async def get_remote_jobs(db: AsyncSession = Depends(get_async_db)):
     """Get all remote jobs"""
     try:
-        jobs = JobService.get_remote_jobs(db)
+        jobs = await AsyncJobService.get_remote_jobs(db)
         return [job.to_dict() for job in jobs]
     except Exception as e:
         raise HTTPException(
@@ -125,16 +145,21 @@ def get_remote_jobs(db: Session = Depends(get_db)):
             detail=f"Failed to get remote jobs: {str(e)}"
         )
 
+@router.get("/cache/stats")
+async def get_search_cache_stats():
+    """Get this process's search cache hit counts and ratios"""
+    return search_cache.stats()
+
 # Admin routes (require authentication)
 @router.post("/", response_model=JobResponse)
-def create_job(
+async def create_job(
     job_data: JobCreate,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new job (admin only)"""
     # Verify user is authenticated
-    user = AuthService.get_current_user(db, credentials.credentials)
+    user = await AsyncAuthService.get_current_user(db, credentials.credentials)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -142,7 +167,7 @@ def create_job(
         )
     
     try:
-        job = JobService.create_job(db, job_data)
+        job = await AsyncJobService.create_job(db, job_data)
         return job.to_dict()
     except HTTPException:
         raise
@@ -152,16 +177,55 @@ def create_job(
             detail=f"Failed to create job: {str(e)}"
         )
 
+@router.post("/bulk", response_model=BulkIngestResponse)
+async def bulk_ingest_jobs(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """
+    Create or update many jobs at once (admin only). The body is NDJSON, one JobCreate per line, or a JSON
+    array of them; it is parsed as it arrives and upserted in batches on (external_id, source).
+    Returns the outcome of every record in order, so one bad record does not fail the rest.
+    Stays on the sync session: validating and writing a batch is CPU-bound, so batches run in the threadpool.
+    """
+    # Verify user is authenticated
+    user = await run_in_threadpool(AuthService.get_current_user, db, credentials.credentials)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+    
+    try:
+        results = await JobIngest.ingest_stream(db, request.stream())
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to ingest jobs: {str(e)}"
+        )
+    
+    counts = {outcome: 0 for outcome in ("created", "updated", "duplicate", "error")}
+    for result in results:
+        counts[result["status"]] += 1
+    return BulkIngestResponse(
+        created=counts["created"],
+        updated=counts["updated"],
+        duplicate=counts["duplicate"],
+        failed=counts["error"],
+        results=results
+    )
+
 @router.put("/{job_id}", response_model=JobResponse)
-def update_job(
+async def update_job(
     job_id: int,
     job_data: JobUpdate,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update a job (admin only)"""
     # Verify user is authenticated
-    user = AuthService.get_current_user(db, credentials.credentials)
+    user = await AsyncAuthService.get_current_user(db, credentials.credentials)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -169,7 +233,7 @@ def update_job(
         )
     
     try:
-        job = JobService.update_job(db, job_id, job_data)
+        job = await AsyncJobService.update_job(db, job_id, job_data)
         if not job:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -185,14 +249,14 @@ def update_job(
         )
 
 @router.delete("/{job_id}")
-def delete_job(
+async def delete_job(
     job_id: int,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a job (admin only)"""
     # Verify user is authenticated
-    user = AuthService.get_current_user(db, credentials.credentials)
+    user = await AsyncAuthService.get_current_user(db, credentials.credentials)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -200,7 +264,7 @@ def delete_job(
         )
     
     try:
-        success = JobService.delete_job(db, job_id)
+        success = await AsyncJobService.delete_job(db, job_id)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
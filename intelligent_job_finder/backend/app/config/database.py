@@ -1,28 +1,90 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from typing import Optional
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Database configuration
 DATABASE_URL = os.getenv(
     "DATABASE_URL", 
     "sqlite:///./job_finder.db"
 )
 
+def async_database_url(url: str) -> str:
+    """The same database through its asyncio driver: aiosqlite for SQLite, asyncpg for Postgres"""
+    url = make_url(url)
+    drivers = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+    backend = url.get_backend_name()
+    if backend not in drivers:
+        raise ValueError(f"No asyncio driver configured for {backend}")
+    return url.set(drivername=f"{backend}+{drivers[backend]}").render_as_string(hide_password=False)
+
+def resolve_async_database_url() -> Optional[str]:
+    """
+    ASYNC_DATABASE_URL, or DATABASE_URL through its asyncio driver. None when there is no known driver,
+    so a backend without one still serves the sync handlers.
+    """
+    url = os.getenv("ASYNC_DATABASE_URL")
+    if url:
+        return url
+    try:
+        return async_database_url(DATABASE_URL)
+    except ValueError as e:
+        logger.warning("Async database path disabled: %s; set ASYNC_DATABASE_URL to enable it", e)
+        return None
+
+# The async engine reaches the same database as the sync one unless ASYNC_DATABASE_URL says otherwise
+ASYNC_DATABASE_URL = resolve_async_database_url()
+
+# Connections each engine keeps open, and how many more it may open under load. Sync handlers can use at
+# most one per threadpool worker, while async handlers can have a statement in flight on every one of them.
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "5"))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+
+def pool_options(url: str) -> dict:
+    """Pool sizing for an engine; SQLite connections are pooled differently, so it keeps the defaults"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {"pool_size": DATABASE_POOL_SIZE, "max_overflow": DATABASE_MAX_OVERFLOW}
+
 # Create SQLAlchemy engine
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,
     pool_recycle=300,
-    echo=False  # Set to True for SQL query logging
+    echo=False,  # Set to True for SQL query logging
+    **pool_options(DATABASE_URL)
 )
 
+def create_async_database_engine(url: Optional[str]) -> Optional[AsyncEngine]:
+    """The engine for `async def` handlers, or None if there is no async URL or its driver is not installed"""
+    if url is None:
+        return None
+    try:
+        return create_async_engine(url, pool_pre_ping=True, pool_recycle=300, echo=False, **pool_options(url))
+    except ImportError as e:
+        logger.warning("Async database path disabled, its driver is not installed: %s", e)
+        return None
+
+# Async engine for `async def` handlers, which wait on the database without holding a threadpool worker
+async_engine = create_async_database_engine(ASYNC_DATABASE_URL)
+
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Objects stay loaded after commit, since an AsyncSession cannot lazily refresh them while they are serialized
+AsyncSessionLocal = (
+    async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine) if async_engine else None
+)
+
 # Create Base class
 Base = declarative_base()
 
@@ -34,6 +96,13 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Dependency to get an async database session"""
+    if AsyncSessionLocal is None:
+        raise RuntimeError("No async database is configured; set ASYNC_DATABASE_URL")
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def create_tables():
     """Create all tables in the database"""
     Base.metadata.create_all(bind=engine)
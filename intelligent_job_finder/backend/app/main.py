@@ -5,7 +5,9 @@ import uvicorn
 import os
 from dotenv import load_dotenv
 
-from .config.database import create_tables
+from .config.database import async_engine, create_tables, engine
+from .services.job_ingest import JobIngest
+from .services.search_index import SearchIndex
 from .api import auth, jobs
 
 load_dotenv()
@@ -40,6 +42,24 @@ async def startup_event():
         print("✅ Database tables created successfully")
     except Exception as e:
         print(f"❌ Failed to create database tables: {e}")
+    
+    try:
+        SearchIndex.create(engine)
+        print("✅ Job search index ready")
+    except Exception as e:
+        print(f"❌ Failed to create job search index, keyword search will scan: {e}")
+    
+    try:
+        JobIngest.create_index(engine)
+        print("✅ Job upsert index ready")
+    except Exception as e:
+        print(f"❌ Failed to create job upsert index, bulk ingest will fail: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close the async engine's connections"""
+    if async_engine is not None:
+        await async_engine.dispose()
 
 @app.get("/")
 async def root():
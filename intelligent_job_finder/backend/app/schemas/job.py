@@ -79,14 +79,33 @@ class JobSearch(BaseModel):
     sources: Optional[List[str]] = None
     limit: int = 20
     offset: int = 0
+    cursor: Optional[str] = None
+    include_total: Optional[bool] = None
 
 class JobSearchResponse(BaseModel):
     """Schema for job search response"""
     jobs: List[JobResponse]
-    total: int
+    total: Optional[int] = None
+    total_exact: bool = False
     limit: int
     offset: int
     has_more: bool
+    next_cursor: Optional[str] = None
+
+class BulkIngestResult(BaseModel):
+    """Outcome of one record in a bulk ingest"""
+    index: int
+    status: str
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkIngestResponse(BaseModel):
+    """Schema for bulk ingest response"""
+    created: int
+    updated: int
+    duplicate: int
+    failed: int
+    results: List[BulkIngestResult]
 
 class JobMatchRequest(BaseModel):
     """Schema for job matching request"""
@@ -3,6 +3,7 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import os
 from dotenv import load_dotenv
@@ -142,4 +143,21 @@ class AuthService:
         
         db.commit()
         db.refresh(user)
-        return user 
\ No newline at end of file
+        return user
+
+class AsyncAuthService:
+    """
+    AuthService lookups for async handlers, run through AsyncSession.run_sync.
+    Password hashing and checks stay in the sync AuthService: bcrypt is CPU-bound, so its handlers
+    belong in the threadpool rather than on the event loop.
+    """
+    
+    @staticmethod
+    async def get_current_user(db: AsyncSession, token: str) -> Optional[User]:
+        """Get current user from token"""
+        return await db.run_sync(AuthService.get_current_user, token)
+    
+    @staticmethod
+    async def update_user_profile(db: AsyncSession, user_id: int, update_data: dict) -> User:
+        """Update user profile"""
+        return await db.run_sync(AuthService.update_user_profile, user_id, update_data)
@@ -0,0 +1,288 @@
+import codecs
+import json
+import sqlite3
+from typing import Any, AsyncIterable, Dict, Iterable, List, Tuple
+from pydantic import ValidationError
+from sqlalchemy import false, func, literal_column, select, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..models.job import Job
+from ..schemas.job import JobCreate
+from .job_service import JobService
+
+# Records are validated as they arrive and upserted BATCH_SIZE at a time
+BATCH_SIZE = 500
+# A record still incomplete after this many characters is rejected rather than buffered further
+MAX_RECORD_CHARS = 1_000_000
+
+class RecordError(ValueError):
+    """A record that could not be parsed"""
+
+class RecordParser:
+    """
+    Incremental parser for NDJSON, or for a JSON array of objects, fed in chunks of any size.
+    The format is decided by the first character: '[' starts an array, anything else is one object per line.
+    feed() and close() return the records completed so far, with a RecordError in place of each bad one.
+    """
+
+    def __init__(self, max_record_chars: int = MAX_RECORD_CHARS):
+        self.max_record_chars = max_record_chars
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json = json.JSONDecoder()
+        self.buffer = ""
+        self.array = None
+        self.expect_comma = False
+        self.skip_line = False
+        self.finished = False
+
+    def feed(self, data: bytes) -> List[Any]:
+        try:
+            self.buffer += self.decoder.decode(data)
+        except UnicodeDecodeError as e:
+            return self._fail(f"Invalid UTF-8: {e}")
+        return self._drain(final=False)
+
+    def close(self) -> List[Any]:
+        try:
+            self.buffer += self.decoder.decode(b"", final=True)
+        except UnicodeDecodeError as e:
+            return self._fail(f"Invalid UTF-8: {e}")
+        records = self._drain(final=True)
+        if self.array and not self.finished:
+            records += self._fail("JSON array is not closed")
+        return records
+
+    def _fail(self, message: str) -> List[Any]:
+        # Nothing after a broken array element or encoding can be trusted, so parsing stops here
+        self.finished = True
+        self.buffer = ""
+        return [RecordError(message)]
+
+    def _drain(self, final: bool) -> List[Any]:
+        if self.finished:
+            return []
+        if self.array is None:
+            stripped = self.buffer.lstrip()
+            if not stripped:
+                return []
+            self.array = stripped.startswith("[")
+            self.buffer = stripped[1:] if self.array else stripped
+        return self._drain_array(final) if self.array else self._drain_lines(final)
+
+    def _drain_lines(self, final: bool) -> List[Any]:
+        lines = self.buffer.split("\n")
+        self.buffer = "" if final else lines.pop()
+        if self.skip_line and lines:
+            # The rest of a record already rejected as too long
+            lines.pop(0)
+            self.skip_line = False
+        records = [self._record(line) for line in lines if line.strip()]
+        if len(self.buffer) > self.max_record_chars or (self.skip_line and self.buffer):
+            if not self.skip_line:
+                records.append(RecordError(f"Record longer than {self.max_record_chars} characters"))
+            self.buffer = ""
+            self.skip_line = True
+        return records
+
+    def _drain_array(self, final: bool) -> List[Any]:
+        records = []
+        while True:
+            self.buffer = self.buffer.lstrip()
+            if not self.buffer:
+                return records
+            if self.buffer[0] == "]":
+                self.finished = True
+                return records
+            if self.expect_comma:
+                if self.buffer[0] != ",":
+                    return records + self._fail("Expected ',' or ']' between array elements")
+                self.buffer = self.buffer[1:]
+                self.expect_comma = False
+                continue
+            try:
+                value, end = self.json.raw_decode(self.buffer)
+            except json.JSONDecodeError as e:
+                # An element cut off by the end of the chunk; wait for the rest unless there is none
+                if final or len(self.buffer) > self.max_record_chars:
+                    return records + self._fail(f"Invalid JSON: {e}")
+                return records
+            self.buffer = self.buffer[end:]
+            self.expect_comma = True
+            records.append(value if isinstance(value, dict) else RecordError("Record is not a JSON object"))
+
+    def _record(self, line: str) -> Any:
+        try:
+            value = json.loads(line)
+        except json.JSONDecodeError as e:
+            return RecordError(f"Invalid JSON: {e}")
+        return value if isinstance(value, dict) else RecordError("Record is not a JSON object")
+
+class JobIngest:
+    """Bulk job ingestion: parse records as they stream in, validate them and upsert them in batches"""
+
+    @staticmethod
+    def create_index(engine: Engine) -> None:
+        """Create the unique (external_id, source) index that upserts resolve conflicts on, if it does not exist yet"""
+        jobs = Job.__tablename__
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{jobs}_external_id_source ON {jobs} (external_id, source)"
+            ))
+
+    @staticmethod
+    def upsert(db: Session, jobs: List[JobCreate]) -> List[Dict[str, Any]]:
+        """
+        Insert the jobs, or update the ones already stored under the same (external_id, source), in one statement
+        and one commit, and return the outcome of each: created, updated, or duplicate when a later job in the same
+        list has the same key and replaces it. A stored job keeps its is_active flag, so soft deletes stick.
+        """
+        latest = {(job.external_id, job.source): i for i, job in enumerate(jobs)}
+        rows = [jobs[i].dict() for i in sorted(latest.values())]
+        dialect = db.get_bind().dialect.name
+        # SQLite only has the RETURNING clause the upsert reports its rows with from 3.35
+        if dialect not in ("sqlite", "postgresql") or (dialect == "sqlite" and sqlite3.sqlite_version_info < (3, 35)):
+            stored = JobIngest._upsert_each(db, rows)
+        else:
+            insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            # Executed with every row as its parameters, so the statement is compiled once and cached, and
+            # SQLAlchemy still sends the rows as multi-row INSERTs
+            stmt = insert(Job.__table__)
+            updates = {column: stmt.excluded[column] for column in rows[0] if column not in ("external_id", "source")}
+            if hasattr(Job, "updated_at"):
+                updates["updated_at"] = func.now()
+            stmt = stmt.on_conflict_do_update(index_elements=["external_id", "source"], set_=updates)
+            if dialect == "postgresql":
+                # xmax is only zero on a row version this statement inserted, so Postgres says which rows were new
+                returned = db.execute(stmt.returning(
+                    Job.id, Job.external_id, Job.source, literal_column("xmax = 0").label("inserted")
+                ), rows).all()
+                stored = {(row.external_id, row.source): (row.id, row.inserted) for row in returned}
+            else:
+                # SQLite has no xmax, so the keys present before the insert are the ones it updates. A no-op
+                # write first takes the database's write lock, so no other writer can commit between the
+                # lookup and the insert; a plain SELECT would not start a write transaction
+                db.execute(update(Job).where(false()).values(id=Job.id))
+                existing = set(db.execute(
+                    select(Job.external_id, Job.source).where(tuple_(Job.external_id, Job.source).in_(list(latest)))
+                ).all())
+                returned = db.execute(stmt.returning(Job.id, Job.external_id, Job.source), rows).all()
+                stored = {
+                    (row.external_id, row.source): (row.id, (row.external_id, row.source) not in existing)
+                    for row in returned
+                }
+        db.commit()
+        JobService._jobs_changed()
+
+        outcomes = []
+        for i, job in enumerate(jobs):
+            key = (job.external_id, job.source)
+            job_id, inserted = stored[key]
+            if latest[key] != i:
+                outcomes.append({"status": "duplicate", "id": job_id, "error": f"Replaced by record {latest[key]}"})
+            else:
+                outcomes.append({"status": "created" if inserted else "updated", "id": job_id})
+        return outcomes
+
+    @staticmethod
+    def _upsert_each(db: Session, rows: List[Dict[str, Any]]) -> Dict[tuple, tuple]:
+        """The upsert for databases without ON CONFLICT: a lookup and an insert or update per row, in one commit"""
+        stored = {}
+        for row in rows:
+            job = db.query(Job).filter(Job.external_id == row["external_id"], Job.source == row["source"]).first()
+            inserted = job is None
+            if inserted:
+                job = Job(**row)
+                db.add(job)
+            else:
+                for field, value in row.items():
+                    setattr(job, field, value)
+            db.flush()
+            stored[(row["external_id"], row["source"])] = (job.id, inserted)
+        return stored
+
+    @staticmethod
+    def validate(record: Any) -> Tuple[Any, str]:
+        """A JobCreate for a parsed record, or None and why it is not valid"""
+        if isinstance(record, RecordError):
+            return None, str(record)
+        try:
+            return JobCreate(**record), None
+        except ValidationError as e:
+            return None, "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            )
+
+    @staticmethod
+    def _outcomes(db: Session, batch: List[Tuple[int, JobCreate]]) -> List[Dict[str, Any]]:
+        """Upsert a batch, and if the database rejects it, each record on its own so only the bad ones fail"""
+        if not batch:
+            return []
+        try:
+            upserted = JobIngest.upsert(db, [job for _, job in batch])
+        except Exception as e:
+            db.rollback()
+            if len(batch) == 1:
+                return [{"index": batch[0][0], "status": "error", "error": f"Database error: {e}"}]
+            return [outcome for record in batch for outcome in JobIngest._outcomes(db, [record])]
+        return [{"index": index, **outcome} for (index, _), outcome in zip(batch, upserted)]
+
+    @staticmethod
+    def _flush(db: Session, batch: "IngestBatch") -> List[Dict[str, Any]]:
+        """Write out a batch, returning its outcomes and its invalid records' errors in record order"""
+        jobs, errors = batch.take()
+        return sorted(errors + JobIngest._outcomes(db, jobs), key=lambda outcome: outcome["index"])
+
+    @staticmethod
+    def ingest(db: Session, chunks: Iterable[bytes], batch_size: int = BATCH_SIZE) -> List[Dict[str, Any]]:
+        """Ingest a stream of NDJSON or JSON array chunks, returning the outcome of each record in order"""
+        parser, batch, results = RecordParser(), IngestBatch(batch_size), []
+        for chunk in chunks:
+            for record in parser.feed(chunk):
+                if batch.add(record):
+                    results += JobIngest._flush(db, batch)
+        for record in parser.close():
+            if batch.add(record):
+                results += JobIngest._flush(db, batch)
+        return results + JobIngest._flush(db, batch)
+
+    @staticmethod
+    async def ingest_stream(
+        db: Session, chunks: AsyncIterable[bytes], batch_size: int = BATCH_SIZE
+    ) -> List[Dict[str, Any]]:
+        """ingest() for an async stream such as a request body, with each batch written in the threadpool"""
+        parser, batch, results = RecordParser(), IngestBatch(batch_size), []
+        async for chunk in chunks:
+            for record in parser.feed(chunk):
+                if batch.add(record):
+                    results += await run_in_threadpool(JobIngest._flush, db, batch)
+        for record in parser.close():
+            if batch.add(record):
+                results += await run_in_threadpool(JobIngest._flush, db, batch)
+        return results + await run_in_threadpool(JobIngest._flush, db, batch)
+
+class IngestBatch:
+    """The validated jobs waiting to be written, numbered in the order their records arrived, with the invalid ones"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.count = 0
+        self.jobs: List[Tuple[int, JobCreate]] = []
+        self.errors: List[Dict[str, Any]] = []
+
+    def add(self, record: Any) -> bool:
+        """Validate and add a parsed record, returning whether the batch is now full"""
+        job, error = JobIngest.validate(record)
+        if job is None:
+            self.errors.append({"index": self.count, "status": "error", "error": error})
+        else:
+            self.jobs.append((self.count, job))
+        self.count += 1
+        return len(self.jobs) + len(self.errors) >= self.size
+
+    def take(self) -> Tuple[List[Tuple[int, JobCreate]], List[Dict[str, Any]]]:
+        jobs, errors = self.jobs, self.errors
+        self.jobs, self.errors = [], []
+        return jobs, errors
@@ -1,11 +1,31 @@
 from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc, asc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, Query
+from sqlalchemy import and_, or_, desc, asc, func, tuple_
 from fastapi import HTTPException, status
+from datetime import datetime
+import base64
+import hashlib
 import json
+import threading
+import time
 
 from ..models.job import Job
 from ..schemas.job import JobCreate, JobUpdate, JobSearch
+from .search_cache import search_cache
+from .search_index import SearchIndex
+
+# Totals are counted up to COUNT_LIMIT matches and remembered for COUNT_CACHE_SECONDS
+COUNT_LIMIT = 10_000
+COUNT_CACHE_SECONDS = 60
+COUNT_CACHE_SIZE = 1024
+
+# Shared by the request handler threads, so only touched under the lock
+_count_cache: Dict[str, tuple] = {}
+_count_cache_lock = threading.Lock()
+
+class InvalidCursor(ValueError):
+    """A search cursor that is malformed or was issued for a different search"""
 
 class JobService:
     """Service for job-related operations"""
@@ -50,6 +70,7 @@ class JobService:
         
         db.add(db_job)
         db.commit()
+        JobService._jobs_changed()
         db.refresh(db_job)
         return db_job
     
@@ -72,24 +93,47 @@ class JobService:
         return query.offset(skip).limit(limit).all()
     
     @staticmethod
-    def search_jobs(db: Session, search_params: JobSearch) -> Dict[str, Any]:
-        """Search jobs with various filters"""
+    def search_jobs(db: Session, search_params: JobSearch, full_text: bool = True, cache: bool = True) -> Dict[str, Any]:
+        """
+        Search jobs with various filters, ranking keyword matches by relevance where the full-text index exists.
+        Pages follow search_params.cursor from the previous page, or search_params.offset.
+        Results come from the search cache when the same search was run since jobs last changed, unless cache is False.
+        """
+        if not cache:
+            return JobService._search(db, search_params, full_text)
+        digest = JobService._cache_digest(search_params, full_text)
+        generation = search_cache.current_generation()
+        cached = search_cache.get(digest, generation)
+        if cached is not None:
+            return JobService._cached_result(db, cached)
+        result = JobService._search(db, search_params, full_text)
+        search_cache.put(digest, JobService._cache_entry(result), generation)
+        return result
+    
+    @staticmethod
+    def _search(db: Session, search_params: JobSearch, full_text: bool) -> Dict[str, Any]:
+        """The search itself, without the cache"""
         query = db.query(Job).filter(Job.is_active == True)
+        relevance = None
         
         # Apply filters
         if search_params.keywords:
-            keywords = search_params.keywords.lower().split()
-            keyword_filters = []
-            for keyword in keywords:
-                keyword_filters.append(
-                    or_(
-                        Job.title.ilike(f"%{keyword}%"),
-                        Job.company.ilike(f"%{keyword}%"),
-                        Job.description.ilike(f"%{keyword}%"),
-                        Job.requirements.ilike(f"%{keyword}%")
+            ranked = SearchIndex.search(db, query, search_params.keywords) if full_text else None
+            if ranked is not None:
+                query, relevance = ranked
+            else:
+                keywords = search_params.keywords.lower().split()
+                keyword_filters = []
+                for keyword in keywords:
+                    keyword_filters.append(
+                        or_(
+                            Job.title.ilike(f"%{keyword}%"),
+                            Job.company.ilike(f"%{keyword}%"),
+                            Job.description.ilike(f"%{keyword}%"),
+                            Job.requirements.ilike(f"%{keyword}%")
+                        )
                     )
-                )
-            query = query.filter(or_(*keyword_filters))
+                query = query.filter(or_(*keyword_filters))
         
         if search_params.location:
             query = query.filter(Job.location.ilike(f"%{search_params.location}%"))
@@ -132,21 +176,197 @@ class JobService:
         if search_params.sources:
             query = query.filter(Job.source.in_(search_params.sources))
         
-        # Get total count
-        total = query.count()
+        search_key = JobService._search_key(search_params, relevance is not None)
+        total, total_exact = None, False
+        # Counted on the first page unless asked otherwise, as later pages already know the total
+        include_total = search_params.include_total
+        if include_total is None:
+            include_total = not search_params.cursor
+        if include_total:
+            total, total_exact = JobService._count(query, search_key)
+        
+        # Newest first after any relevance ranking, with the id breaking ties so pages never overlap
+        limit = search_params.limit
+        if relevance is not None:
+            query = query.add_columns(relevance.label("relevance"))
+        order = ([relevance.desc()] if relevance is not None else []) + [
+            Job.posted_date.desc().nulls_last(), Job.id.desc()
+        ]
+        if search_params.cursor:
+            position = JobService._decode_cursor(search_params.cursor, search_key, relevance is not None)
+            rows = JobService._page_after(query, relevance, position, order, limit + 1)
+        else:
+            rows = query.order_by(*order).offset(search_params.offset).limit(limit + 1).all()
         
-        # Apply pagination and ordering
-        jobs = query.order_by(desc(Job.posted_date)).offset(
-            search_params.offset
-        ).limit(search_params.limit).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        jobs = [row[0] for row in rows] if relevance is not None else rows
+        next_cursor = None
+        if has_more:
+            last = jobs[-1]
+            position = ([rows[-1][1]] if relevance is not None else []) + [
+                last.posted_date.isoformat() if last.posted_date else None, last.id
+            ]
+            next_cursor = JobService._encode_cursor(position, search_key)
         
         return {
             "jobs": jobs,
             "total": total,
+            "total_exact": total_exact,
+            "limit": limit,
+            "offset": search_params.offset,
+            "has_more": has_more,
+            "next_cursor": next_cursor
+        }
+    
+    @staticmethod
+    def _page_after(query: Query, relevance, position: list, order: list, limit: int) -> list:
+        """The rows that come after position in the search order"""
+        job_id = position[-1]
+        posted_date = datetime.fromisoformat(position[-2]) if position[-2] else None
+        if relevance is not None:
+            # Every match is ranked anyway, so a plain condition on all three keys does
+            if posted_date is None:
+                # Undated jobs come last, so only undated ones with a lower id follow
+                within = and_(Job.posted_date == None, Job.id < job_id)
+            else:
+                within = or_(
+                    Job.posted_date < posted_date,
+                    Job.posted_date == None,
+                    and_(Job.posted_date == posted_date, Job.id < job_id)
+                )
+            after = or_(relevance < position[0], and_(relevance == position[0], within))
+            return query.filter(after).order_by(*order).limit(limit).all()
+        if posted_date is None:
+            # Undated jobs come last, newest id first
+            return query.filter(Job.posted_date == None, Job.id < job_id).order_by(Job.id.desc()).limit(limit).all()
+        # A row comparison lets the database seek straight to the position in the posted_date index
+        rows = query.filter(tuple_(Job.posted_date, Job.id) < tuple_(posted_date, job_id)).order_by(*order).limit(limit).all()
+        if len(rows) < limit:
+            rows += query.filter(Job.posted_date == None).order_by(Job.id.desc()).limit(limit - len(rows)).all()
+        return rows
+    
+    @staticmethod
+    def _canonical_filters(search_params: JobSearch) -> Dict[str, Any]:
+        """
+        The filters in one form for every way of writing the same search: keywords lowercased and split as
+        both keyword searches do, skill and source lists sorted, and filters that are not applied left out.
+        Location and company are kept as given, as ILIKE patterns keep their spacing.
+        """
+        filters = {
+            "keywords": " ".join(search_params.keywords.lower().split()) if search_params.keywords else None,
+            "location": search_params.location or None,
+            "company": search_params.company or None,
+            "remote_only": bool(search_params.remote_only),
+            "salary_min": search_params.salary_min or None,
+            "salary_max": search_params.salary_max or None,
+            "job_type": search_params.job_type or None,
+            "experience_level": search_params.experience_level or None,
+            "skills": sorted(set(search_params.skills)) if search_params.skills else None,
+            "sources": sorted(set(search_params.sources)) if search_params.sources else None
+        }
+        return {name: value for name, value in filters.items() if value not in (None, False)}
+    
+    @staticmethod
+    def _search_key(search_params: JobSearch, ranked: bool) -> str:
+        """A digest of everything that decides which jobs match and their order, but not which page"""
+        canonical = json.dumps([JobService._canonical_filters(search_params), ranked], sort_keys=True)
+        return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+    
+    @staticmethod
+    def _cache_digest(search_params: JobSearch, full_text: bool) -> str:
+        """A digest of the search and the page of it asked for, which keys its cached result"""
+        include_total = search_params.include_total
+        if include_total is None:
+            include_total = not search_params.cursor
+        page = {
             "limit": search_params.limit,
+            "cursor": search_params.cursor,
             "offset": search_params.offset,
-            "has_more": (search_params.offset + search_params.limit) < total
+            "include_total": include_total
         }
+        canonical = json.dumps([JobService._canonical_filters(search_params), full_text, page], sort_keys=True)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+    
+    @staticmethod
+    def _cache_entry(result: Dict[str, Any]) -> Dict[str, Any]:
+        """What the search cache keeps of a result: the ids of its jobs in order and everything but the jobs"""
+        entry = {name: value for name, value in result.items() if name != "jobs"}
+        entry["ids"] = [job.id for job in result["jobs"]]
+        return entry
+    
+    @staticmethod
+    def _cached_result(db: Session, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """A result rebuilt from its cache entry, loading its jobs by primary key"""
+        jobs = {job.id: job for job in db.query(Job).filter(Job.id.in_(entry["ids"])).all()} if entry["ids"] else {}
+        result = {name: value for name, value in entry.items() if name != "ids"}
+        # Jobs are only ever soft deleted, but one removed from the database is left out rather than failing
+        result["jobs"] = [jobs[job_id] for job_id in entry["ids"] if job_id in jobs]
+        # As with remembered counts, a cached total may predate changes made outside this service
+        result["total_exact"] = False
+        return result
+    
+    @staticmethod
+    def _encode_cursor(position: list, search_key: str) -> str:
+        payload = json.dumps({"p": position, "s": search_key}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+    
+    @staticmethod
+    def _decode_cursor(cursor: str, search_key: str, ranked: bool) -> list:
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            position, cursor_key = payload["p"], payload["s"]
+        except (ValueError, TypeError, KeyError):
+            raise InvalidCursor("Invalid cursor")
+        if cursor_key != search_key:
+            raise InvalidCursor("Cursor belongs to a different search")
+        # Positions are [relevance, posted_date, id] for ranked searches and [posted_date, id] otherwise
+        if not isinstance(position, list) or len(position) != (3 if ranked else 2):
+            raise InvalidCursor("Invalid cursor")
+        *relevance, posted_date, job_id = position
+        if relevance and (isinstance(relevance[0], bool) or not isinstance(relevance[0], (int, float))):
+            raise InvalidCursor("Invalid cursor")
+        if isinstance(job_id, bool) or not isinstance(job_id, int):
+            raise InvalidCursor("Invalid cursor")
+        if posted_date is not None:
+            try:
+                datetime.fromisoformat(posted_date)
+            except (TypeError, ValueError):
+                raise InvalidCursor("Invalid cursor")
+        return position
+    
+    @staticmethod
+    def _count(query: Query, search_key: str) -> tuple:
+        """
+        The number of matches and whether that is exact: counted up to COUNT_LIMIT, after which
+        the total is reported as COUNT_LIMIT, and remembered for COUNT_CACHE_SECONDS.
+        A remembered total is never reported as exact, since other processes may have changed jobs since.
+        """
+        now = time.monotonic()
+        with _count_cache_lock:
+            cached = _count_cache.get(search_key)
+        if cached and cached[0] > now:
+            return cached[1], False
+        matches = query.order_by(None).with_entities(Job.id).limit(COUNT_LIMIT + 1).subquery()
+        counted = query.session.query(func.count()).select_from(matches).scalar()
+        total, exact = min(counted, COUNT_LIMIT), counted <= COUNT_LIMIT
+        with _count_cache_lock:
+            _count_cache.pop(search_key, None)
+            while len(_count_cache) >= COUNT_CACHE_SIZE:
+                _count_cache.pop(next(iter(_count_cache)))
+            _count_cache[search_key] = (now + COUNT_CACHE_SECONDS, total)
+        return total, exact
+    
+    @staticmethod
+    def _jobs_changed() -> None:
+        """
+        Forget remembered totals and supersede cached searches once this process changes jobs.
+        From async handlers this runs inside run_sync, so the Redis INCR is a short blocking call;
+        only writes, which are rare admin calls, make it.
+        """
+        with _count_cache_lock:
+            _count_cache.clear()
+        search_cache.bump()
     
     @staticmethod
     def update_job(db: Session, job_id: int, job_data: JobUpdate) -> Optional[Job]:
@@ -162,6 +382,7 @@ class JobService:
                 setattr(job, field, value)
         
         db.commit()
+        JobService._jobs_changed()
         db.refresh(job)
         return job
     
@@ -174,6 +395,7 @@ class JobService:
         
         job.is_active = False
         db.commit()
+        JobService._jobs_changed()
         return True
     
     @staticmethod
@@ -220,4 +442,68 @@ class JobService:
                 ),
                 Job.is_active == True
             )
-        ).order_by(desc(Job.posted_date)).all() 
\ No newline at end of file
+        ).order_by(desc(Job.posted_date)).all()
+
+class AsyncJobService:
+    """
+    JobService for async handlers. Each method runs the JobService query of the same name through
+    AsyncSession.run_sync, so the queries are written once and the database is awaited through the
+    async driver rather than blocking a thread.
+    """
+    
+    @staticmethod
+    async def create_job(db: AsyncSession, job_data: JobCreate) -> Job:
+        """Create a new job listing"""
+        return await db.run_sync(JobService.create_job, job_data)
+    
+    @staticmethod
+    async def get_job(db: AsyncSession, job_id: int) -> Optional[Job]:
+        """Get a job by ID"""
+        return await db.run_sync(JobService.get_job, job_id)
+    
+    @staticmethod
+    async def get_jobs(db: AsyncSession, skip: int = 0, limit: int = 100, active_only: bool = True) -> List[Job]:
+        """Get list of jobs with pagination"""
+        return await db.run_sync(JobService.get_jobs, skip, limit, active_only)
+    
+    @staticmethod
+    async def search_jobs(db: AsyncSession, search_params: JobSearch, full_text: bool = True) -> Dict[str, Any]:
+        """Search jobs with various filters, through the search cache's async Redis client"""
+        digest = JobService._cache_digest(search_params, full_text)
+        generation = await search_cache.current_generation_async()
+        cached = await search_cache.get_async(digest, generation)
+        if cached is not None:
+            return await db.run_sync(JobService._cached_result, cached)
+        result = await db.run_sync(JobService._search, search_params, full_text)
+        await search_cache.put_async(digest, JobService._cache_entry(result), generation)
+        return result
+    
+    @staticmethod
+    async def update_job(db: AsyncSession, job_id: int, job_data: JobUpdate) -> Optional[Job]:
+        """Update a job"""
+        return await db.run_sync(JobService.update_job, job_id, job_data)
+    
+    @staticmethod
+    async def delete_job(db: AsyncSession, job_id: int) -> bool:
+        """Delete a job (soft delete by setting is_active to False)"""
+        return await db.run_sync(JobService.delete_job, job_id)
+    
+    @staticmethod
+    async def get_jobs_by_company(db: AsyncSession, company: str) -> List[Job]:
+        """Get all jobs from a specific company"""
+        return await db.run_sync(JobService.get_jobs_by_company, company)
+    
+    @staticmethod
+    async def get_recent_jobs(db: AsyncSession, days: int = 7) -> List[Job]:
+        """Get jobs posted in the last N days"""
+        return await db.run_sync(JobService.get_recent_jobs, days)
+    
+    @staticmethod
+    async def get_jobs_by_location(db: AsyncSession, location: str) -> List[Job]:
+        """Get jobs in a specific location"""
+        return await db.run_sync(JobService.get_jobs_by_location, location)
+    
+    @staticmethod
+    async def get_remote_jobs(db: AsyncSession) -> List[Job]:
+        """Get all remote jobs"""
+        return await db.run_sync(JobService.get_remote_jobs)
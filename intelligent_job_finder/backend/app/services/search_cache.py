@@ -0,0 +1,227 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+
+try:
+    import redis
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis = redis_asyncio = None
+
+load_dotenv()
+
+# Results are kept for SEARCH_CACHE_SECONDS at most, in up to SEARCH_CACHE_SIZE entries per process
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_SECONDS = int(os.getenv("SEARCH_CACHE_SECONDS", "60"))
+# Redis calls give up after SEARCH_CACHE_REDIS_TIMEOUT seconds, and after one fails the Redis tier is
+# skipped for REDIS_RETRY_SECONDS, so an unreachable Redis costs a search at most one timeout
+SEARCH_CACHE_REDIS_TIMEOUT = float(os.getenv("SEARCH_CACHE_REDIS_TIMEOUT", "0.25"))
+REDIS_RETRY_SECONDS = 5.0
+# How long a process trusts the generation it last read from Redis before reading it again
+GENERATION_CHECK_SECONDS = 1.0
+
+KEY_PREFIX = "job_search"
+GENERATION_KEY = f"{KEY_PREFIX}:generation"
+
+class SearchCache:
+    """
+    Two-tier cache of search results: an LRU in this process in front of Redis, shared by every process.
+
+    Entries are keyed by the jobs generation and a digest of the search. Any change to jobs bumps the
+    generation, so every cached search is superseded at once and left to age out of both tiers.
+    Without Redis the cache is process-local, and other processes' writes are only seen once entries expire.
+    """
+
+    def __init__(self, client=None, async_client=None, size: int = SEARCH_CACHE_SIZE, ttl: int = SEARCH_CACHE_SECONDS):
+        self.size = size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.connect(client, async_client)
+
+    @classmethod
+    def from_env(cls) -> "SearchCache":
+        """A cache using the Redis at REDIS_URL, or process-local if it is not set or redis is not installed"""
+        url = os.getenv("REDIS_URL")
+        if not url or redis is None:
+            return cls()
+        timeouts = {"socket_timeout": SEARCH_CACHE_REDIS_TIMEOUT, "socket_connect_timeout": SEARCH_CACHE_REDIS_TIMEOUT}
+        return cls(redis.Redis.from_url(url, **timeouts), redis_asyncio.Redis.from_url(url, **timeouts))
+
+    def connect(self, client=None, async_client=None) -> None:
+        """Switch to these Redis clients, or to no Redis tier, starting empty"""
+        with self.lock:
+            self.client = client
+            self.async_client = async_client
+            self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+            self.generation = 0
+            self.generation_checked = float("-inf")
+            self.redis_down_until = float("-inf")
+            # A bump Redis missed, made by INCR once it is back so other processes see the change
+            self.bump_pending = False
+            self.local_hits = self.redis_hits = self.misses = self.redis_errors = 0
+
+    def key(self, digest: str, generation: int) -> str:
+        return f"{KEY_PREFIX}:{generation}:{digest}"
+
+    def _redis_up(self, client) -> bool:
+        return client is not None and time.monotonic() >= self.redis_down_until
+
+    def _stale_generation(self, client) -> bool:
+        return self._redis_up(client) and time.monotonic() - self.generation_checked > GENERATION_CHECK_SECONDS
+
+    def _set_generation(self, value: Optional[bytes]) -> int:
+        with self.lock:
+            self.generation = int(value or 0)
+            self.generation_checked = time.monotonic()
+            return self.generation
+
+    def _redis_failed(self) -> None:
+        with self.lock:
+            self.redis_errors += 1
+            # Serve from this process alone for a while rather than waiting on Redis for every search
+            self.redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+
+    def current_generation(self) -> int:
+        """The jobs generation, read again from Redis once GENERATION_CHECK_SECONDS have passed"""
+        if self._stale_generation(self.client):
+            try:
+                if self.bump_pending:
+                    generation = self._set_generation(self.client.incr(GENERATION_KEY))
+                    self.bump_pending = False
+                    return generation
+                return self._set_generation(self.client.get(GENERATION_KEY))
+            except redis.RedisError:
+                self._redis_failed()
+        return self.generation
+
+    async def current_generation_async(self) -> int:
+        """current_generation() through the async Redis client"""
+        if self._stale_generation(self.async_client):
+            try:
+                if self.bump_pending:
+                    generation = self._set_generation(await self.async_client.incr(GENERATION_KEY))
+                    self.bump_pending = False
+                    return generation
+                return self._set_generation(await self.async_client.get(GENERATION_KEY))
+            except redis.RedisError:
+                self._redis_failed()
+        return self.generation
+
+    def _local(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached and cached[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.local_hits += 1
+                return cached[1]
+            self.entries.pop(key, None)
+            return None
+
+    def _remember(self, key: str, value: Dict[str, Any]) -> None:
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def _found(self, key: str, raw: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        if raw is None:
+            with self.lock:
+                self.misses += 1
+            return None
+        value = json.loads(raw)
+        with self.lock:
+            self.redis_hits += 1
+        self._remember(key, value)
+        return value
+
+    def get(self, digest: str, generation: int) -> Optional[Dict[str, Any]]:
+        """The cached result for a search digest in a generation, or None"""
+        key = self.key(digest, generation)
+        value = self._local(key)
+        if value is not None:
+            return value
+        raw = None
+        if self._redis_up(self.client):
+            try:
+                raw = self.client.get(key)
+            except redis.RedisError:
+                self._redis_failed()
+        return self._found(key, raw)
+
+    async def get_async(self, digest: str, generation: int) -> Optional[Dict[str, Any]]:
+        """get() through the async Redis client"""
+        key = self.key(digest, generation)
+        value = self._local(key)
+        if value is not None:
+            return value
+        raw = None
+        if self._redis_up(self.async_client):
+            try:
+                raw = await self.async_client.get(key)
+            except redis.RedisError:
+                self._redis_failed()
+        return self._found(key, raw)
+
+    def put(self, digest: str, value: Dict[str, Any], generation: int) -> None:
+        """
+        Cache a result under the generation read before it was searched for, so a result that raced
+        a change to jobs is filed under the generation that change already superseded
+        """
+        key = self.key(digest, generation)
+        self._remember(key, value)
+        if self._redis_up(self.client):
+            try:
+                self.client.set(key, json.dumps(value), ex=self.ttl)
+            except redis.RedisError:
+                self._redis_failed()
+
+    async def put_async(self, digest: str, value: Dict[str, Any], generation: int) -> None:
+        """put() through the async Redis client"""
+        key = self.key(digest, generation)
+        self._remember(key, value)
+        if self._redis_up(self.async_client):
+            try:
+                await self.async_client.set(key, json.dumps(value), ex=self.ttl)
+            except redis.RedisError:
+                self._redis_failed()
+
+    def bump(self) -> None:
+        """Supersede every cached search, in this process at once and in the others through Redis"""
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+        if self.client is None:
+            return
+        # Tried even while Redis is backed off, as other processes only see the change through it
+        try:
+            self._set_generation(self.client.incr(GENERATION_KEY))
+            self.bump_pending = False
+        except redis.RedisError:
+            # Other processes keep serving their entries until Redis is back or they expire
+            self.bump_pending = True
+            self._redis_failed()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit counts and ratios for this process since it started"""
+        with self.lock:
+            hits = self.local_hits + self.redis_hits
+            lookups = hits + self.misses
+            return {
+                "lookups": lookups,
+                "local_hits": self.local_hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "local_hit_ratio": self.local_hits / lookups if lookups else 0.0,
+                "redis_errors": self.redis_errors,
+                "entries": len(self.entries),
+                "generation": self.generation,
+                "redis": self.client is not None
+            }
+
+search_cache = SearchCache.from_env()
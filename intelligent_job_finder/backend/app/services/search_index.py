@@ -0,0 +1,132 @@
+import re
+import sqlite3
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import Float, func, literal_column, select, table, column, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query, Session
+
+from ..models.job import Job
+
+# Columns indexed for keyword search, with their relevance weights
+SEARCH_COLUMNS = ("title", "company", "description", "requirements")
+SEARCH_WEIGHTS = (10.0, 5.0, 1.0, 1.0)
+POSTGRES_WEIGHT_CLASSES = ("A", "B", "C", "C")
+
+FTS_TABLE = "jobs_fts"
+SEARCH_VECTOR = "search_vector"
+
+WORD = re.compile(r"\w+")
+
+class SearchIndex:
+    """Full-text index over job titles, companies, descriptions and requirements"""
+
+    @staticmethod
+    def terms(keywords: Optional[str]) -> List[str]:
+        """The words in a keyword string, lowercased and without any query syntax"""
+        return WORD.findall((keywords or "").lower())
+
+    @staticmethod
+    def create(engine: Engine) -> None:
+        """
+        Create the indexes job search uses in the engine's database, if they do not exist yet.
+
+        SQLite gets an FTS5 table over jobs kept in sync by triggers, and Postgres a generated tsvector
+        column with a GIN index, so the database maintains the index on every insert, update and delete.
+        Other databases keep the ILIKE search. Both also get an index in the newest first order that
+        search results are paged through.
+        """
+        jobs = Job.__tablename__
+        columns = ", ".join(SEARCH_COLUMNS)
+        nulls_last = " NULLS LAST" if engine.dialect.name == "postgresql" else ""
+        with engine.begin() as conn:
+            if engine.dialect.name in ("sqlite", "postgresql"):
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{jobs}_active_posted_date ON {jobs} "
+                    f"(is_active, posted_date DESC{nulls_last}, id DESC)"
+                ))
+            if engine.dialect.name == "sqlite":
+                if SearchIndex._exists(conn, "sqlite"):
+                    return
+                new_values = ", ".join(f"new.{c}" for c in SEARCH_COLUMNS)
+                old_values = ", ".join(f"old.{c}" for c in SEARCH_COLUMNS)
+                remove = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+                add = f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});"
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({columns}, "
+                    f"content='{jobs}', content_rowid='id', tokenize='porter unicode61')"
+                ))
+                conn.execute(text(f"CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON {jobs} BEGIN {add} END"))
+                conn.execute(text(f"CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON {jobs} BEGIN {remove} END"))
+                conn.execute(text(
+                    f"CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF {columns} ON {jobs} BEGIN {remove} {add} END"
+                ))
+                # Index the jobs stored before the index existed
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            elif engine.dialect.name == "postgresql":
+                vector = " || ".join(
+                    f"setweight(to_tsvector('english', coalesce({c}, '')), '{weight}')"
+                    for c, weight in zip(SEARCH_COLUMNS, POSTGRES_WEIGHT_CLASSES)
+                )
+                conn.execute(text(
+                    f"ALTER TABLE {jobs} ADD COLUMN IF NOT EXISTS {SEARCH_VECTOR} tsvector "
+                    f"GENERATED ALWAYS AS ({vector}) STORED"
+                ))
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{jobs}_{SEARCH_VECTOR} ON {jobs} USING GIN ({SEARCH_VECTOR})"
+                ))
+
+    @staticmethod
+    def _exists(conn, dialect: str) -> bool:
+        if dialect == "sqlite":
+            found = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE}
+            )
+        elif dialect == "postgresql":
+            found = conn.execute(
+                text("SELECT 1 FROM information_schema.columns WHERE table_name = :table AND column_name = :column"),
+                {"table": Job.__tablename__, "column": SEARCH_VECTOR}
+            )
+        else:
+            return False
+        return found.first() is not None
+
+    @staticmethod
+    def available(db: Session) -> bool:
+        """Whether the session's database has the index"""
+        bind = db.get_bind()
+        # Only a positive answer is remembered, so an index created later is picked up
+        if not getattr(bind, "_has_search_index", False):
+            bind._has_search_index = SearchIndex._exists(db.connection(), bind.dialect.name)
+        return bind._has_search_index
+
+    @staticmethod
+    def search(db: Session, query: Query, keywords: Optional[str]) -> Optional[Tuple[Query, Any]]:
+        """
+        Narrow query to jobs matching any of the keywords, or words starting with them, and return it with
+        their relevance, higher for better matches: BM25 on SQLite and ts_rank_cd over the weighted tsvector
+        on Postgres. Returns None when there is nothing to search for or the database has no index.
+        """
+        terms = SearchIndex.terms(keywords)
+        if not terms or not SearchIndex.available(db):
+            return None
+        if db.get_bind().dialect.name == "sqlite":
+            fts = table(FTS_TABLE, column("rowid"))
+            fts_column = literal_column(FTS_TABLE)
+            matches = (
+                select(fts.c.rowid.label("job_id"), func.bm25(fts_column, *SEARCH_WEIGHTS).label("rank"))
+                .select_from(fts)
+                .where(fts_column.op("MATCH")(" OR ".join(f'"{term}"*' for term in terms)))
+                .cte("matches")
+            )
+            # Left to itself SQLite may loop over jobs and run the match once per job, as it does for the
+            # capped count, so the matches are computed once up front
+            if sqlite3.sqlite_version_info >= (3, 35):
+                matches = matches.prefix_with("MATERIALIZED")
+            # bm25 is lower for better matches
+            return query.join(matches, matches.c.job_id == Job.id), -matches.c.rank
+        vector = literal_column(f"{Job.__tablename__}.{SEARCH_VECTOR}")
+        tsquery = func.to_tsquery("english", " | ".join(f"{term}:*" for term in terms))
+        # ts_rank_cd is a real; as a double it survives the round trip through a cursor exactly, so the
+        # next page's comparison against it matches the rows it should
+        return query.filter(vector.op("@@")(tsquery)), func.ts_rank_cd(vector, tsquery).cast(Float)
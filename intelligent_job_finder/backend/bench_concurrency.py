@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Load test the sync and async database paths with many concurrent clients.
+
+Fills a fresh SQLite database (or the empty database at --database-url) with synthetic jobs, then serves
+the same two endpoints with uvicorn twice: once as sync `def` handlers on get_db and JobService, which
+FastAPI runs in its threadpool, and once as `async def` handlers on get_async_db and AsyncJobService.
+Each time --clients clients send keyword searches and job lookups (--searches sets the mix) back to back
+for --duration seconds, and the script reports requests per second, latency percentiles and errors.
+
+--db-latency-ms adds that much wait to every statement, as a database across the network would: the sync
+handlers sleep in their thread, the async ones await. Against a local database requests are mostly
+CPU-bound, so the two differ far less. Sync handlers are capped at the threadpool's 40 workers and async
+ones at the connection pool, so raise DATABASE_POOL_SIZE to compare them past that.
+
+Run with: python bench_concurrency.py --clients 500 --duration 30
+      or: python bench_concurrency.py --database-url postgresql://postgres@localhost/bench
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from bench_search import SEARCHES, percentile, synthetic_job
+
+
+def build_app(mode: str):
+    from fastapi import Depends, FastAPI, HTTPException
+    from app.config.database import get_async_db, get_db
+    from app.schemas.job import JobSearch
+    from app.services.job_service import AsyncJobService, JobService
+
+    app = FastAPI()
+    if mode == "sync":
+        @app.get("/jobs/")
+        def search_jobs(keywords: str, db=Depends(get_db)):
+            result = JobService.search_jobs(db, JobSearch(keywords=keywords, limit=20))
+            return {"jobs": [job.to_dict() for job in result["jobs"]], "total": result["total"]}
+
+        @app.get("/jobs/{job_id}")
+        def get_job(job_id: int, db=Depends(get_db)):
+            job = JobService.get_job(db, job_id)
+            if not job:
+                raise HTTPException(status_code=404, detail="Job not found")
+            return job.to_dict()
+    else:
+        @app.get("/jobs/")
+        async def search_jobs(keywords: str, db=Depends(get_async_db)):
+            result = await AsyncJobService.search_jobs(db, JobSearch(keywords=keywords, limit=20))
+            return {"jobs": [job.to_dict() for job in result["jobs"]], "total": result["total"]}
+
+        @app.get("/jobs/{job_id}")
+        async def get_job(job_id: int, db=Depends(get_async_db)):
+            job = await AsyncJobService.get_job(db, job_id)
+            if not job:
+                raise HTTPException(status_code=404, detail="Job not found")
+            return job.to_dict()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def add_latency(mode: str, latency: float) -> None:
+    """Make every statement wait latency seconds before it runs, in the way each engine waits on I/O"""
+    from sqlalchemy import event
+    from sqlalchemy.util import await_only
+    from app.config.database import async_engine, engine
+
+    if mode == "sync":
+        event.listen(engine, "before_cursor_execute", lambda *args: time.sleep(latency))
+    else:
+        # Statements from an AsyncSession run in a greenlet that can hand the wait to the event loop
+        event.listen(async_engine.sync_engine, "before_cursor_execute", lambda *args: await_only(asyncio.sleep(latency)))
+
+
+def serve(mode: str, port: int, latency: float) -> None:
+    import uvicorn
+
+    if latency:
+        add_latency(mode, latency)
+    uvicorn.run(build_app(mode), host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+async def request(reader, writer, path: str) -> int:
+    """One GET on a keep-alive connection, returning the status code"""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = next(
+        int(line.split(b":", 1)[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length:")
+    )
+    await reader.readexactly(length)
+    return status
+
+
+async def load(port: int, clients: int, duration: float, jobs: int, searches: float) -> dict:
+    # A bare HTTP/1.1 client, as httpx would spend more of the one machine's CPU than the server under test
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=1 << 20)
+        try:
+            while time.perf_counter() < deadline:
+                if random.random() < searches:
+                    path = f"/jobs/?keywords={random.choice(SEARCHES).replace(' ', '+')}"
+                else:
+                    path = f"/jobs/{random.randrange(1, jobs + 1)}"
+                start = time.perf_counter()
+                if await request(reader, writer, path) == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+        except (OSError, asyncio.IncompleteReadError):
+            errors += 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return {"latencies": latencies, "errors": errors, "elapsed": time.perf_counter() - start}
+
+
+async def wait_until_up(port: int) -> None:
+    for _ in range(100):
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            await asyncio.sleep(0.1)
+            continue
+        try:
+            if await request(reader, writer, "/health") == 200:
+                return
+        finally:
+            writer.close()
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load per handler type")
+    parser.add_argument("--jobs", type=int, default=50_000)
+    parser.add_argument("--searches", type=float, default=0.5, help="share of requests that are keyword searches")
+    parser.add_argument("--db-latency-ms", type=float, default=0, help="network wait added to every statement")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--database-url", help="an empty database to fill; a temporary SQLite file by default")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench_concurrency.db"
+
+    # Imported once DATABASE_URL is set, as the engines are created on import
+    from sqlalchemy import insert
+    from app.config.database import create_tables, engine
+    from app.models.job import Job
+    from app.services.search_index import SearchIndex
+
+    create_tables()
+    random.seed(42)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for batch_start in range(0, args.jobs, 10_000):
+            batch = range(batch_start, min(batch_start + 10_000, args.jobs))
+            conn.execute(insert(Job), [synthetic_job(i, now) for i in batch])
+    SearchIndex.create(engine)
+    engine.dispose()
+    print(
+        f"Loaded {args.jobs:,} jobs into {engine.url.get_backend_name()}; {args.clients} clients for "
+        f"{args.duration:.0f}s each, {args.searches:.0%} searches, {args.db_latency_ms:g}ms added per statement"
+    )
+
+    # Each server runs in a fresh process, so neither inherits the other's engines or threadpool
+    context = multiprocessing.get_context("spawn")
+    for mode in ("sync", "async"):
+        server = context.Process(target=serve, args=(mode, args.port, args.db_latency_ms / 1000), daemon=True)
+        server.start()
+        try:
+            asyncio.run(wait_until_up(args.port))
+            asyncio.run(load(args.port, 20, 2, args.jobs, args.searches))
+            result = asyncio.run(load(args.port, args.clients, args.duration, args.jobs, args.searches))
+        finally:
+            server.terminate()
+            server.join()
+        latencies = result["latencies"]
+        print(
+            f"{mode:>6} handlers: {len(latencies) / result['elapsed']:8.1f} req/s  "
+            f"p50 {percentile(latencies, 0.5) * 1000:7.1f}ms  p95 {percentile(latencies, 0.95) * 1000:7.1f}ms  "
+            f"p99 {percentile(latencies, 0.99) * 1000:7.1f}ms  errors {result['errors']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark job ingestion: one POST /jobs/ style create_job call per job against the bulk upsert.
+
+Loads the same synthetic jobs into a fresh SQLite database (or the empty database at --database-url)
+three ways and reports jobs per second: create_job one at a time, the bulk NDJSON ingest of all of
+them as new jobs, then the same NDJSON again so every record updates an existing job.
+
+Run with: python bench_ingest.py --jobs 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from bench_search import synthetic_job
+
+
+def ndjson_chunks(jobs: list, chunk_size: int = 1 << 20):
+    data = "".join(json.dumps(job, default=str) + "\n" for job in jobs).encode()
+    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--database-url", help="an empty database to fill; a temporary SQLite file by default")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{directory}/bench_ingest.db"
+
+    # Imported once DATABASE_URL is set, as the engine is created on import
+    from app.config.database import SessionLocal, create_tables, engine
+    from app.models.job import Job
+    from app.schemas.job import JobCreate
+    from app.services.job_ingest import JobIngest
+    from app.services.job_service import JobService
+    from app.services.search_index import SearchIndex
+
+    create_tables()
+    SearchIndex.create(engine)
+    JobIngest.create_index(engine)
+    random.seed(42)
+    now = datetime.utcnow()
+    jobs = [synthetic_job(i, now) for i in range(args.jobs)]
+    for job in jobs:
+        job.pop("is_active")
+
+    def report(label: str, count: int, elapsed: float) -> None:
+        print(f"{label:>26}: {count:>9,} jobs in {elapsed:7.1f}s  {count / elapsed:>9,.0f} jobs/s")
+
+    with SessionLocal() as db:
+        start = time.perf_counter()
+        for job in jobs:
+            JobService.create_job(db, JobCreate(**job))
+        report("create_job one at a time", len(jobs), time.perf_counter() - start)
+        db.query(Job).delete()
+        db.commit()
+
+        # Serializing is the client's work, so it is left out of the timings
+        chunks = ndjson_chunks(jobs)
+        for label, expected in (("bulk ingest, all new", "created"), ("bulk ingest, all updates", "updated")):
+            start = time.perf_counter()
+            results = JobIngest.ingest(db, chunks, batch_size=args.batch_size)
+            elapsed = time.perf_counter() - start
+            assert all(result["status"] == expected for result in results), f"expected every job {expected}"
+            report(label, len(results), elapsed)
+
+
+if __name__ == "__main__":
+    main()
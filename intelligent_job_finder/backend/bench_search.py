@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark job keyword search: the full-text index against the ILIKE scan, and through the search cache.
+
+Fills a fresh SQLite database (or the database at --database-url) with synthetic jobs, builds the
+search index, then runs the same keyword searches through JobService.search_jobs each way and
+reports p50 and p95 latency. The cached run repeats the searches, so all but the first of each hit.
+
+Run with: python bench_search.py --jobs 1000000 --queries 50
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+TITLES = ["Software Engineer", "Data Scientist", "Product Manager", "DevOps Engineer", "Frontend Developer",
+          "Backend Developer", "Machine Learning Engineer", "QA Analyst", "Site Reliability Engineer", "Designer"]
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises", "Cyberdyne"]
+LOCATIONS = ["New York", "San Francisco", "London", "Berlin", "Remote", "Toronto", "Austin", "Bangalore"]
+SKILLS = ("python java golang rust typescript react kubernetes docker postgres redis kafka spark airflow aws gcp "
+          "azure terraform linux microservices graphql django fastapi pandas pytorch tensorflow analytics testing "
+          "security mobile payments healthcare fintech startup scale distributed systems platform team mentor "
+          "design customers roadmap reliability observability").split()
+# Filler words make up most of a description, with a few skills mentioned in each, as in real postings
+FILLER = [f"{a}{b}{c}" for a in ("ba", "ke", "lo", "mi", "ru", "sa", "to", "ve") for b in ("dal", "ren", "vos", "tik", "mun")
+          for c in ("a", "e", "i", "o", "u", "an", "er", "is", "on", "ut")]
+SEARCHES = ["python", "rust kubernetes", "machine learning", "react typescript", "fintech payments",
+            "postgres", "site reliability", "pytorch", "data scientist", "terraform aws"]
+
+
+def synthetic_job(index: int, now: datetime) -> dict:
+    return {
+        "external_id": f"bench-{index}",
+        "source": "bench",
+        "title": random.choice(TITLES),
+        "company": random.choice(COMPANIES),
+        "location": random.choice(LOCATIONS),
+        "remote_option": random.choice(["Remote", "Hybrid", "On-site"]),
+        "salary_min": random.randrange(50, 150) * 1000,
+        "salary_max": random.randrange(150, 300) * 1000,
+        "description": " ".join(random.choices(FILLER, k=60) + random.choices(SKILLS, k=3)),
+        "requirements": " ".join(random.choices(FILLER, k=20) + random.choices(SKILLS, k=2)),
+        "posted_date": now - timedelta(minutes=index),
+        "is_active": True,
+    }
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=50, help="searches per path")
+    parser.add_argument("--database-url", help="an empty database to fill; a temporary SQLite file by default")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_search.db"
+
+    # Imported once DATABASE_URL is set, as the engine is created on import
+    from sqlalchemy import insert
+    from app.config.database import SessionLocal, create_tables, engine
+    from app.models.job import Job
+    from app.schemas.job import JobSearch
+    from app.services.job_service import JobService
+    from app.services.search_cache import search_cache
+    from app.services.search_index import SearchIndex
+
+    create_tables()
+    random.seed(42)
+    now = datetime.utcnow()
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for batch_start in range(0, args.jobs, 10_000):
+            batch = range(batch_start, min(batch_start + 10_000, args.jobs))
+            conn.execute(insert(Job), [synthetic_job(i, now) for i in batch])
+    print(f"Inserted {args.jobs:,} jobs in {time.perf_counter() - start:.1f}s")
+    start = time.perf_counter()
+    SearchIndex.create(engine)
+    print(f"Built the search index in {time.perf_counter() - start:.1f}s")
+
+    runs = (("ILIKE scan", False, False), ("full-text index", True, False), ("full-text, cached", True, True))
+    for label, full_text, cache in runs:
+        latencies = []
+        with SessionLocal() as db:
+            for i in range(args.queries):
+                params = JobSearch(keywords=SEARCHES[i % len(SEARCHES)], limit=20)
+                start = time.perf_counter()
+                result = JobService.search_jobs(db, params, full_text=full_text, cache=cache)
+                latencies.append(time.perf_counter() - start)
+        print(
+            f"{label:>17}: p50 {statistics.median(latencies) * 1000:8.1f}ms  "
+            f"p95 {percentile(latencies, 0.95) * 1000:8.1f}ms  (last search matched {result['total']:,} jobs)"
+        )
+    print(f"Search cache hit ratio {search_cache.stats()['hit_ratio']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Load jobs from an NDJSON file, or a file holding a JSON array, of JobCreate records.
+
+By default the file is streamed to the bulk ingest endpoint of a running API; with --direct it is
+upserted straight into the database at DATABASE_URL. Either way each record is created or updated on
+(external_id, source), and the records that failed are listed with their line or array position.
+
+Run with: python load_jobs.py jobs.ndjson --token $TOKEN
+      or: python load_jobs.py jobs.json --direct
+"""
+
+import argparse
+import sys
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHUNK_SIZE = 1 << 20
+
+
+def read_chunks(path: str):
+    stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+    with stream:
+        while chunk := stream.read(CHUNK_SIZE):
+            yield chunk
+
+
+def load_via_api(path: str, url: str, token: str) -> dict:
+    import httpx
+
+    response = httpx.post(
+        url,
+        content=read_chunks(path),
+        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/x-ndjson"},
+        timeout=None
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def load_direct(path: str, batch_size: int) -> dict:
+    # Imported here so DATABASE_URL is only read by --direct
+    from app.config.database import SessionLocal, create_tables, engine
+    from app.services.job_ingest import JobIngest
+
+    create_tables()
+    JobIngest.create_index(engine)
+    with SessionLocal() as db:
+        results = JobIngest.ingest(db, read_chunks(path), batch_size=batch_size)
+    counts = {"created": 0, "updated": 0, "duplicate": 0, "error": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return {
+        "created": counts["created"],
+        "updated": counts["updated"],
+        "duplicate": counts["duplicate"],
+        "failed": counts["error"],
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="the file to load, or - for stdin")
+    parser.add_argument("--url", default="http://localhost:8000/api/v1/jobs/bulk", help="the bulk ingest endpoint")
+    parser.add_argument("--token", help="an admin bearer token, for the API")
+    parser.add_argument("--direct", action="store_true", help="write to DATABASE_URL instead of calling the API")
+    parser.add_argument("--batch-size", type=int, default=500, help="records per upsert, with --direct")
+    parser.add_argument("--show-errors", type=int, default=20, help="how many failed records to list")
+    args = parser.parse_args()
+
+    if not args.direct and not args.token:
+        parser.error("--token is required unless loading with --direct")
+
+    start = time.perf_counter()
+    if args.direct:
+        summary = load_direct(args.path, args.batch_size)
+    else:
+        summary = load_via_api(args.path, args.url, args.token)
+    elapsed = time.perf_counter() - start
+
+    total = len(summary["results"])
+    print(
+        f"✅ {total:,} records in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f}/s): "
+        f"{summary['created']:,} created, {summary['updated']:,} updated, "
+        f"{summary['duplicate']:,} duplicate, {summary['failed']:,} failed"
+    )
+    errors = [result for result in summary["results"] if result["status"] == "error"]
+    for result in errors[:args.show_errors]:
+        print(f"❌ record {result['index']}: {result['error']}")
+    if len(errors) > args.show_errors:
+        print(f"   ... and {len(errors) - args.show_errors:,} more")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config.database import Base, async_database_url
+from app.models.job import Job
+from app.services import job_service
+from app.services.job_ingest import JobIngest
+from app.services.search_cache import search_cache
+from app.services.search_index import SearchIndex
+
+KEYWORDS = ["python", "rust", "golang", "java", "react"]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """
+    A fresh database with the job search and upsert indexes: SQLite, or the empty database at
+    TEST_DATABASE_URL to run the suite against Postgres
+    """
+    engine = create_engine(os.getenv("TEST_DATABASE_URL") or f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    SearchIndex.create(engine)
+    JobIngest.create_index(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    job_service._count_cache.clear()
+    search_cache.connect()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def run_async(engine):
+    """Run a coroutine function with an AsyncSession on the same database, the way async handlers get one"""
+    def run(fn):
+        async def main():
+            async_engine = create_async_engine(async_database_url(engine.url.render_as_string(hide_password=False)))
+            try:
+                async with async_sessionmaker(async_engine, expire_on_commit=False)() as session:
+                    return await fn(session)
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+    return run
+
+
+@pytest.fixture
+def jobs(engine):
+    """200 jobs with some undated, some inactive and many sharing a posted date, so paging has ties to break"""
+    posted = datetime(2024, 1, 1)
+    rows = [
+        {
+            "external_id": f"job-{i}",
+            "source": "test",
+            "title": f"{KEYWORDS[i % 5]} developer",
+            "company": "Acme",
+            "description": " ".join(KEYWORDS[: i % 5 + 1]),
+            "is_active": i % 13 != 0,
+            "posted_date": None if i % 7 == 0 else posted + timedelta(hours=i % 24),
+        }
+        for i in range(200)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Job), rows)
+    return rows
@@ -0,0 +1,144 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.exc import OperationalError
+
+from app.models.job import Job
+from app.schemas.job import JobSearch
+from app.services import job_ingest
+from app.services.job_ingest import JobIngest, RecordError, RecordParser
+from app.services.job_service import JobService
+
+
+def record(i, **fields):
+    return {"external_id": f"ext-{i}", "source": "feed", "title": f"Python developer {i}", "company": "Acme", **fields}
+
+
+def ndjson(records):
+    return "".join(json.dumps(r) + "\n" for r in records).encode()
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def parse(chunks):
+    parser = RecordParser()
+    records = [r for chunk in chunks for r in parser.feed(chunk)]
+    return records + parser.close()
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_ndjson_and_arrays_parse_across_any_chunking(size):
+    records = [record(i, description="naïve café ☕") for i in range(20)]
+    assert parse(chunked(ndjson(records), size)) == records
+    assert parse(chunked(json.dumps(records, indent=2).encode(), size)) == records
+
+
+def test_bad_lines_fail_alone():
+    parsed = parse([b'{"a": 1}\n{broken\n[1, 2]\n\n{"b": 2}'])
+    assert parsed[0] == {"a": 1}
+    assert isinstance(parsed[1], RecordError) and isinstance(parsed[2], RecordError)
+    assert parsed[3] == {"b": 2}
+
+
+@pytest.mark.parametrize("body", [b'[{"a": 1}, {"b": 2}', b'[{"a": 1} {"b": 2}]', b'[{"a": 1}, {"b": '])
+def test_broken_array_stops_parsing(body):
+    parsed = parse([body])
+    assert parsed[0] == {"a": 1}
+    assert isinstance(parsed[-1], RecordError)
+
+
+def test_oversized_record_is_rejected():
+    parser = RecordParser(max_record_chars=100)
+    parsed = parser.feed(b'{"a": "' + b"x" * 200)
+    parsed += parser.feed(b"x" * 200 + b'"}\n{"b": 2}\n')
+    assert isinstance(parsed[0], RecordError)
+    assert parsed[1:] == [{"b": 2}]
+
+
+def test_ingest_creates_then_updates(db):
+    first = JobIngest.ingest(db, chunked(ndjson([record(i) for i in range(25)]), 100), batch_size=10)
+    assert [r["status"] for r in first] == ["created"] * 25
+    assert [r["index"] for r in first] == list(range(25))
+
+    again = JobIngest.ingest(db, [ndjson([record(i, title="Rust developer") for i in range(20, 30)])])
+    assert [r["status"] for r in again] == ["updated"] * 5 + ["created"] * 5
+    assert [r["id"] for r in again[:5]] == [r["id"] for r in first[20:]]
+    assert db.query(Job).count() == 30
+    assert db.query(Job).filter(Job.title == "Rust developer").count() == 10
+
+
+def test_ingest_without_returning_upserts_row_by_row(db, monkeypatch):
+    monkeypatch.setattr(job_ingest.sqlite3, "sqlite_version_info", (3, 34, 1))
+    first = JobIngest.ingest(db, [ndjson([record(i) for i in range(3)])])
+    again = JobIngest.ingest(db, [ndjson([record(i, title="Rust developer") for i in range(2, 4)])])
+    assert [r["status"] for r in first + again] == ["created"] * 3 + ["updated", "created"]
+    assert again[0]["id"] == first[2]["id"]
+
+
+def test_sqlite_upsert_holds_the_write_lock_before_looking_up_keys(db, engine):
+    if engine.dialect.name != "sqlite":
+        pytest.skip("Postgres reports inserts from xmax rather than a lookup")
+    other = create_engine(engine.url, connect_args={"timeout": 0})
+    refused = []
+
+    def concurrent_insert(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT") and not refused:
+            # Another writer trying to commit the same key between the lookup and the insert
+            with pytest.raises(OperationalError, match="locked"):
+                with other.begin() as writer:
+                    writer.execute(insert(Job), [{**record(0), "title": "Someone else's"}])
+            refused.append(statement)
+
+    event.listen(engine, "before_cursor_execute", concurrent_insert)
+    try:
+        results = JobIngest.ingest(db, [ndjson([record(0)])])
+    finally:
+        event.remove(engine, "before_cursor_execute", concurrent_insert)
+        other.dispose()
+    assert refused
+    assert results[0]["status"] == "created"
+
+
+def test_invalid_records_are_reported_in_order(db):
+    body = ndjson([record(0), {"external_id": "x", "source": "feed"}, record(1, salary_min="lots")]) + b"nope\n"
+    results = JobIngest.ingest(db, [body], batch_size=2)
+    assert [r["status"] for r in results] == ["created", "error", "error", "error"]
+    assert "title" in results[1]["error"] and "salary_min" in results[2]["error"]
+    assert db.query(Job).count() == 1
+
+
+def test_repeated_key_in_one_batch_keeps_the_last(db):
+    results = JobIngest.ingest(db, [ndjson([record(0, title="old"), record(0, title="new")])])
+    assert [r["status"] for r in results] == ["duplicate", "created"]
+    assert results[0]["id"] == results[1]["id"]
+    assert db.query(Job).one().title == "new"
+
+
+def test_soft_deleted_jobs_stay_deleted(db):
+    job_id = JobIngest.ingest(db, [ndjson([record(0)])])[0]["id"]
+    JobService.delete_job(db, job_id)
+    JobIngest.ingest(db, [ndjson([record(0, title="Python lead")])])
+    db.expire_all()
+    job = db.get(Job, job_id)
+    assert job.title == "Python lead" and not job.is_active
+
+
+def test_ingest_clears_cached_totals(db):
+    JobIngest.ingest(db, [ndjson([record(i) for i in range(3)])])
+    assert JobService.search_jobs(db, JobSearch(keywords="python"))["total"] == 3
+    JobIngest.ingest(db, [ndjson([record(i) for i in range(3, 5)])])
+    assert JobService.search_jobs(db, JobSearch(keywords="python"))["total"] == 5
+
+
+def test_stream_matches_sync_ingest(db):
+    async def body():
+        for chunk in chunked(json.dumps([record(i) for i in range(12)]).encode(), 50):
+            yield chunk
+
+    results = asyncio.run(JobIngest.ingest_stream(db, body(), batch_size=5))
+    assert [r["status"] for r in results] == ["created"] * 12
+    assert db.query(Job).count() == 12
@@ -0,0 +1,109 @@
+import base64
+import json
+
+import pytest
+
+from app.schemas.job import JobCreate, JobSearch, JobUpdate
+from app.services import job_service
+from app.services.job_service import InvalidCursor, JobService
+
+
+def walk_offsets(db, **params):
+    ids, offset = [], 0
+    while True:
+        result = JobService.search_jobs(db, JobSearch(limit=7, offset=offset, **params))
+        ids += [job.id for job in result["jobs"]]
+        offset += 7
+        if not result["has_more"]:
+            return ids
+
+
+def walk_cursors(db, **params):
+    ids, cursor = [], None
+    # Bounded, so a cursor that stops advancing fails the test instead of hanging it
+    for _ in range(1000):
+        result = JobService.search_jobs(db, JobSearch(limit=7, cursor=cursor, **params))
+        ids += [job.id for job in result["jobs"]]
+        cursor = result["next_cursor"]
+        if not result["has_more"]:
+            assert cursor is None
+            return ids
+    pytest.fail("cursor pages never ended")
+
+
+def tamper(cursor, position):
+    payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    payload["p"] = position
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("keywords", [None, "python", "rust java"])
+def test_cursor_pages_match_offset_pages(db, jobs, keywords):
+    by_offset = walk_offsets(db, keywords=keywords)
+    by_cursor = walk_cursors(db, keywords=keywords)
+    assert by_cursor == by_offset
+    assert len(set(by_cursor)) == len(by_cursor)
+
+
+def test_every_active_job_is_paged_once(db, jobs):
+    active = sum(1 for job in jobs if job["is_active"])
+    assert len(walk_cursors(db)) == active
+
+
+def test_cursor_from_a_different_search_is_rejected(db, jobs):
+    cursor = JobService.search_jobs(db, JobSearch(keywords="python", limit=5))["next_cursor"]
+    with pytest.raises(InvalidCursor):
+        JobService.search_jobs(db, JobSearch(keywords="rust", cursor=cursor))
+
+
+@pytest.mark.parametrize("cursor", ["garbage!", "e30", base64.urlsafe_b64encode(b"[1, 2]").decode()])
+def test_malformed_cursor_is_rejected(db, jobs, cursor):
+    with pytest.raises(InvalidCursor):
+        JobService.search_jobs(db, JobSearch(cursor=cursor))
+
+
+@pytest.mark.parametrize("position", [[], [1], ["2024-01-01T00:00:00", "7"], ["not a date", 7], [True, 7], "x"])
+def test_tampered_position_is_rejected(db, jobs, position):
+    cursor = JobService.search_jobs(db, JobSearch(limit=5))["next_cursor"]
+    with pytest.raises(InvalidCursor):
+        JobService.search_jobs(db, JobSearch(cursor=tamper(cursor, position)))
+
+
+def test_tampered_ranked_position_is_rejected(db, jobs):
+    cursor = JobService.search_jobs(db, JobSearch(keywords="python", limit=5))["next_cursor"]
+    with pytest.raises(InvalidCursor):
+        JobService.search_jobs(db, JobSearch(keywords="python", cursor=tamper(cursor, ["2024-01-01T00:00:00", 7])))
+
+
+def test_total_is_counted_on_the_first_page_only(db, jobs):
+    first = JobService.search_jobs(db, JobSearch(limit=5))
+    assert first["total"] == sum(1 for job in jobs if job["is_active"])
+    assert first["total_exact"]
+    second = JobService.search_jobs(db, JobSearch(limit=5, cursor=first["next_cursor"]))
+    assert second["total"] is None
+    assert not second["total_exact"]
+
+
+def test_total_is_capped(db, jobs, monkeypatch):
+    monkeypatch.setattr(job_service, "COUNT_LIMIT", 50)
+    result = JobService.search_jobs(db, JobSearch(limit=5))
+    assert result["total"] == 50
+    assert not result["total_exact"]
+
+
+def test_cached_total_is_not_exact_and_cleared_by_writes(db, jobs):
+    fresh = JobService.search_jobs(db, JobSearch(keywords="python", limit=5))
+    cached = JobService.search_jobs(db, JobSearch(keywords="python", limit=5))
+    assert cached["total"] == fresh["total"]
+    assert fresh["total_exact"] and not cached["total_exact"]
+
+    job = JobService.create_job(db, JobCreate(external_id="new", source="test", title="Python engineer", company="Acme"))
+    after_create = JobService.search_jobs(db, JobSearch(keywords="python", limit=5))
+    assert after_create["total"] == fresh["total"] + 1
+    assert after_create["total_exact"]
+
+    JobService.update_job(db, job.id, JobUpdate(title="Cobol engineer"))
+    assert JobService.search_jobs(db, JobSearch(keywords="python", limit=5))["total"] == fresh["total"]
+
+    JobService.delete_job(db, fresh["jobs"][0].id)
+    assert JobService.search_jobs(db, JobSearch(keywords="python", limit=5))["total"] == fresh["total"] - 1
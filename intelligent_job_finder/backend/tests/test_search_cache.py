@@ -0,0 +1,194 @@
+import fakeredis
+import redis
+
+from app.schemas.job import JobCreate, JobSearch, JobUpdate
+from app.services import search_cache as search_cache_module
+from app.services.job_ingest import JobIngest
+from app.services.job_service import AsyncJobService, JobService
+from app.services.search_cache import SearchCache, search_cache
+
+
+def ids(result):
+    return [job.id for job in result["jobs"]]
+
+
+def test_lru_evicts_least_recently_used():
+    cache = SearchCache(size=2)
+    cache.put("a", {"ids": [1]}, 0)
+    cache.put("b", {"ids": [2]}, 0)
+    assert cache.get("a", 0) == {"ids": [1]}
+    cache.put("c", {"ids": [3]}, 0)
+    assert cache.get("b", 0) is None
+    assert cache.get("a", 0) == {"ids": [1]}
+    assert cache.get("c", 0) == {"ids": [3]}
+
+
+def test_entries_expire(monkeypatch):
+    cache = SearchCache(ttl=60)
+    now = [1000.0]
+    monkeypatch.setattr(search_cache_module.time, "monotonic", lambda: now[0])
+    cache.put("a", {"ids": [1]}, 0)
+    now[0] += 59
+    assert cache.get("a", 0) is not None
+    now[0] += 2
+    assert cache.get("a", 0) is None
+
+
+def test_hit_returns_the_same_page(db, jobs):
+    params = JobSearch(keywords="python", limit=7)
+    fresh = JobService.search_jobs(db, params)
+    cached = JobService.search_jobs(db, params)
+    assert ids(cached) == ids(fresh)
+    assert cached["total"] == fresh["total"]
+    assert cached["next_cursor"] == fresh["next_cursor"]
+    assert search_cache.stats()["local_hits"] == 1
+    second = JobService.search_jobs(db, JobSearch(keywords="python", limit=7, cursor=cached["next_cursor"]))
+    assert ids(second) == ids(JobService.search_jobs(db, JobSearch(keywords="python", limit=7, cursor=fresh["next_cursor"]), cache=False))
+
+
+def test_equivalent_searches_share_an_entry(db, jobs):
+    JobService.search_jobs(db, JobSearch(keywords="Python  Rust", sources=["test", "other"], remote_only=False))
+    JobService.search_jobs(db, JobSearch(keywords="python rust", sources=["other", "test", "test"]))
+    JobService.search_jobs(db, JobSearch(keywords="python rust", sources=["other", "test"], limit=5))
+    stats = search_cache.stats()
+    assert (stats["local_hits"], stats["misses"]) == (1, 2)
+
+
+def test_uncached_search_skips_the_cache(db, jobs):
+    JobService.search_jobs(db, JobSearch(keywords="python"), cache=False)
+    JobService.search_jobs(db, JobSearch(keywords="python"), cache=False)
+    assert search_cache.stats()["lookups"] == 0
+
+
+def test_writes_supersede_cached_searches(db, jobs):
+    params = JobSearch(keywords="python", limit=5)
+    fresh = JobService.search_jobs(db, params)
+
+    job = JobService.create_job(db, JobCreate(external_id="new", source="test", title="Python engineer", company="Acme"))
+    assert JobService.search_jobs(db, params)["total"] == fresh["total"] + 1
+
+    JobService.update_job(db, job.id, JobUpdate(title="Cobol engineer"))
+    assert JobService.search_jobs(db, params)["total"] == fresh["total"]
+
+    JobService.delete_job(db, fresh["jobs"][0].id)
+    assert fresh["jobs"][0].id not in ids(JobService.search_jobs(db, params))
+
+    JobIngest.upsert(db, [JobCreate(external_id="bulk", source="test", title="Python lead", company="Acme")])
+    assert JobService.search_jobs(db, params)["total"] == fresh["total"]
+    assert search_cache.stats()["local_hits"] == 0
+    assert search_cache.stats()["generation"] == 4
+
+
+def test_hit_ratio():
+    cache = SearchCache()
+    assert cache.stats()["hit_ratio"] == 0.0
+    cache.put("a", {"ids": []}, 0)
+    for _ in range(3):
+        cache.get("a", 0)
+    cache.get("b", 0)
+    stats = cache.stats()
+    assert (stats["lookups"], stats["local_hits"], stats["misses"]) == (4, 3, 1)
+    assert stats["hit_ratio"] == stats["local_hit_ratio"] == 0.75
+
+
+def test_redis_tier_is_shared_between_processes(monkeypatch):
+    monkeypatch.setattr(search_cache_module, "GENERATION_CHECK_SECONDS", 0)
+    server = fakeredis.FakeServer()
+    first = SearchCache(fakeredis.FakeRedis(server=server))
+    second = SearchCache(fakeredis.FakeRedis(server=server))
+
+    generation = first.current_generation()
+    first.put("a", {"ids": [1, 2]}, generation)
+    assert second.get("a", second.current_generation()) == {"ids": [1, 2]}
+    assert second.get("a", second.current_generation()) == {"ids": [1, 2]}
+    assert (second.stats()["redis_hits"], second.stats()["local_hits"]) == (1, 1)
+
+    first.bump()
+    assert second.current_generation() == first.current_generation() == 1
+    assert second.get("a", second.current_generation()) is None
+
+
+def test_generation_is_read_at_most_once_per_interval():
+    server = fakeredis.FakeServer()
+    first = SearchCache(fakeredis.FakeRedis(server=server))
+    second = SearchCache(fakeredis.FakeRedis(server=server))
+    assert second.current_generation() == 0
+    first.bump()
+    assert second.current_generation() == 0
+
+
+def test_async_search_uses_redis(db, jobs, run_async):
+    search_cache.connect(fakeredis.FakeRedis(), fakeredis.FakeAsyncRedis())
+    params = JobSearch(keywords="rust", limit=5)
+
+    async def search(session):
+        return await AsyncJobService.search_jobs(session, params), await AsyncJobService.search_jobs(session, params)
+
+    fresh, cached = run_async(search)
+    assert ids(cached) == ids(fresh) == ids(JobService.search_jobs(db, params, cache=False))
+    stats = search_cache.stats()
+    assert (stats["misses"], stats["local_hits"]) == (1, 1)
+    assert stats["redis"]
+
+
+class BrokenRedis:
+    def __init__(self):
+        self.calls = 0
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            self.calls += 1
+            raise redis.ConnectionError("Redis is down")
+        return fail
+
+
+def test_redis_errors_fall_back_to_the_local_tier(db, jobs):
+    search_cache.connect(BrokenRedis())
+    params = JobSearch(keywords="java", limit=5)
+    fresh = JobService.search_jobs(db, params)
+    assert ids(JobService.search_jobs(db, params)) == ids(fresh)
+    JobService.create_job(db, JobCreate(external_id="new", source="test", title="Java engineer", company="Acme"))
+    assert JobService.search_jobs(db, params)["total"] == fresh["total"] + 1
+    assert search_cache.stats()["redis_errors"] > 0
+
+
+def test_redis_is_skipped_for_a_while_after_an_error(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search_cache_module.time, "monotonic", lambda: now[0])
+    broken = BrokenRedis()
+    cache = SearchCache(broken)
+    cache.get("a", cache.current_generation())
+    cache.put("a", {"ids": [1]}, 0)
+    cache.get("b", cache.current_generation())
+    assert broken.calls == 1
+
+    now[0] += search_cache_module.REDIS_RETRY_SECONDS
+    cache.get("b", cache.current_generation())
+    assert broken.calls == 2
+
+
+def test_bump_missed_by_redis_is_made_once_it_is_back(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search_cache_module.time, "monotonic", lambda: now[0])
+    server = fakeredis.FakeServer()
+    first = SearchCache(fakeredis.FakeRedis(server=server))
+    second = SearchCache(fakeredis.FakeRedis(server=server))
+    first.put("a", {"ids": [1]}, first.current_generation())
+
+    server.connected = False
+    first.bump()
+    server.connected = True
+    assert second.current_generation() == 0
+
+    now[0] += search_cache_module.REDIS_RETRY_SECONDS
+    assert first.current_generation() == 1
+    now[0] += search_cache_module.GENERATION_CHECK_SECONDS + 1
+    assert second.get("a", second.current_generation()) is None
+
+
+def test_redis_clients_time_out(monkeypatch):
+    monkeypatch.setenv("REDIS_URL", "redis://localhost:6379")
+    cache = SearchCache.from_env()
+    for client in (cache.client, cache.async_client):
+        options = client.connection_pool.connection_kwargs
+        assert options["socket_timeout"] == options["socket_connect_timeout"] == search_cache_module.SEARCH_CACHE_REDIS_TIMEOUT